@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+# Route the catalog and payment endpoints to their async views
+os.environ.setdefault("ASYNC_VIEWS", "True")
 
 application = get_asgi_application()
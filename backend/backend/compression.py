@@ -0,0 +1,116 @@
+# backend/compression.py
+"""
+gzip and brotli content coding, shared by the API and the React build.
+
+Build files are compressed once at the highest levels. API responses are
+compressed per request (or once per cache entry) at levels that keep most
+of the ratio for a fraction of the CPU; those compressions are counted
+(backend/counters.py), so compression_stats() reports ratio and CPU time
+across workers. Bodies under COMPRESS_MIN_SIZE are left alone.
+"""
+import gzip
+import time
+
+from django.conf import settings
+
+from backend import counters
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Preferred first
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# collectstatic and the in-memory React build: smallest output
+STATIC_LEVELS = {'br': 11, 'gzip': 9}
+
+# Request time
+DYNAMIC_LEVELS = {'br': 4, 'gzip': 6}
+
+# An encoding is kept only when it saves at least this much
+MAX_RATIO = 0.95
+
+# Where API compression happens: per response (middleware) or once per response cache entry
+COMPRESSION_SOURCES = ('live', 'cached')
+
+COMPRESSION_COUNTERS = ('responses', 'bytes_in', 'bytes_out', 'cpu_us')
+
+
+def encode(data, encoding, levels=DYNAMIC_LEVELS):
+    if encoding == 'br':
+        return brotli.compress(data, quality=levels['br'])
+    return gzip.compress(data, compresslevel=levels['gzip'], mtime=0)
+
+
+def compress(data, levels=STATIC_LEVELS, encodings=ENCODINGS):
+    """The encodings of `data` that are meaningfully smaller than it, by encoding name"""
+    if len(data) < settings.COMPRESS_MIN_SIZE:
+        return {}
+    variants = {encoding: encode(data, encoding, levels) for encoding in encodings}
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data) * MAX_RATIO}
+
+
+def compress_response_body(data, source, encodings=ENCODINGS):
+    """compress() at request-time levels, counting ratio and CPU time under `source`"""
+    if len(data) < settings.COMPRESS_MIN_SIZE:
+        return {}
+    variants = {}
+    for encoding in encodings:
+        started = time.thread_time()
+        body = encode(data, encoding)
+        _count(source, encoding, len(data), len(body), time.thread_time() - started)
+        if len(body) < len(data) * MAX_RATIO:
+            variants[encoding] = body
+    return variants
+
+
+def accepted_encodings(request):
+    """Content codings the client accepts (ignoring q-values other than 0)"""
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        name, _, params = part.partition(';')
+        quality = params.strip().replace(' ', '')
+        if quality.startswith('q=') and not quality[2:].strip('0.'):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def pick_encoding(request, available):
+    """Preferred encoding among `available` the client accepts, or None for the identity"""
+    accepted = accepted_encodings(request)
+    for encoding in ENCODINGS:
+        if encoding in available and (encoding in accepted or '*' in accepted):
+            return encoding
+    return None
+
+
+def _count(source, encoding, bytes_in, bytes_out, cpu_seconds):
+    deltas = {'responses': 1, 'bytes_in': bytes_in, 'bytes_out': bytes_out, 'cpu_us': int(cpu_seconds * 1_000_000)}
+    counters.count({f'compression:{source}:{encoding}:{counter}': delta for counter, delta in deltas.items()})
+
+
+def compression_stats():
+    """Responses compressed, bytes in and out, ratio and CPU time, per source and encoding"""
+    keys = [
+        f'compression:{source}:{encoding}:{counter}'
+        for source in COMPRESSION_SOURCES for encoding in ENCODINGS for counter in COMPRESSION_COUNTERS
+    ]
+    found = counters.read(keys)
+    stats = {}
+    for source in COMPRESSION_SOURCES:
+        stats[source] = {}
+        for encoding in ENCODINGS:
+            counts = {counter: found.get(f'compression:{source}:{encoding}:{counter}', 0) for counter in COMPRESSION_COUNTERS}
+            responses = counts['responses']
+            stats[source][encoding] = {
+                'responses': responses,
+                'bytes_in': counts['bytes_in'],
+                'bytes_out': counts['bytes_out'],
+                'ratio': round(counts['bytes_out'] / counts['bytes_in'], 4) if counts['bytes_in'] else None,
+                'cpu_ms': round(counts['cpu_us'] / 1000, 1),
+                'cpu_ms_per_response': round(counts['cpu_us'] / 1000 / responses, 3) if responses else None,
+            }
+    return stats
@@ -0,0 +1,64 @@
+# backend/counters.py
+"""
+Statistics counters that cost nothing per request.
+
+Increments accumulate in process memory and are added to the cache at most
+once every COUNTER_FLUSH_INTERVAL seconds, with one incr per counter that
+changed, so a request does no cache writes for its statistics. Reading
+counters first adds this process's pending increments; other workers'
+last few seconds show up on their next flush.
+"""
+import atexit
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+_pending = Counter()
+_lock = threading.Lock()
+_flushed_at = time.monotonic()
+
+
+def count(deltas):
+    """Add `deltas` ({cache key: amount}) to this process's pending counts, flushing them when due"""
+    with _lock:
+        _pending.update(deltas)
+        due = time.monotonic() - _flushed_at >= settings.COUNTER_FLUSH_INTERVAL
+    if due:
+        flush()
+
+
+def flush():
+    """Add this process's pending counts to the totals in the cache"""
+    global _flushed_at
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _flushed_at = time.monotonic()
+    for key, delta in pending.items():
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # First count since the key was created or evicted
+            if not cache.add(key, delta, None):
+                cache.incr(key, delta)
+
+
+def read(keys):
+    """Current totals of `keys`, by key; counters never incremented are left out"""
+    flush()
+    return cache.get_many(keys)
+
+
+def _forget_parent_counts():
+    # A forked worker starts from zero; the parent still flushes what it counted
+    global _lock
+    _lock = threading.Lock()
+    _pending.clear()
+
+
+os.register_at_fork(after_in_child=_forget_parent_counts)
+atexit.register(flush)
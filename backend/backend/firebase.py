@@ -1,22 +1,45 @@
+# backend/firebase.py
+"""
+Firebase Admin app and Firestore client, created on first use.
 
+Importing firebase_admin pulls in the Google client libraries and gRPC,
+so it is deferred until a request actually needs Firestore rather than
+paid by every worker boot, management command and test run.
+"""
 import os
+import threading
 from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore, auth
 
 load_dotenv()
 
-cred = credentials.Certificate({
-    "type": "service_account",
-    "project_id": os.getenv("FIREBASE_PROJECT_ID"),
-    "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
-    "private_key": os.getenv("FIREBASE_PRIVATE_KEY").replace('\\n', '\n'),
-    "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
-    "client_id": os.getenv("FIREBASE_CLIENT_ID"),
-    "auth_uri": os.getenv("FIREBASE_AUTH_URI"),
-    "token_uri": os.getenv("FIREBASE_TOKEN_URI"),
-    "auth_provider_x509_cert_url": os.getenv("FIREBASE_AUTH_PROVIDER_X509_CERT_URL"),
-    "client_x509_cert_url": os.getenv("FIREBASE_CLIENT_X509_CERT_URL")
-})
-firebase_admin.initialize_app(cred)
-db = firestore.client()
\ No newline at end of file
+_lock = threading.Lock()
+_db = None
+
+
+def _credentials():
+    from firebase_admin import credentials
+    return credentials.Certificate({
+        "type": "service_account",
+        "project_id": os.getenv("FIREBASE_PROJECT_ID"),
+        "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
+        "private_key": os.getenv("FIREBASE_PRIVATE_KEY").replace('\\n', '\n'),
+        "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
+        "client_id": os.getenv("FIREBASE_CLIENT_ID"),
+        "auth_uri": os.getenv("FIREBASE_AUTH_URI"),
+        "token_uri": os.getenv("FIREBASE_TOKEN_URI"),
+        "auth_provider_x509_cert_url": os.getenv("FIREBASE_AUTH_PROVIDER_X509_CERT_URL"),
+        "client_x509_cert_url": os.getenv("FIREBASE_CLIENT_X509_CERT_URL")
+    })
+
+
+def get_db():
+    """Firestore client, initializing the Firebase app on the first call"""
+    global _db
+    if _db is None:
+        with _lock:
+            if _db is None:
+                import firebase_admin
+                from firebase_admin import firestore
+                firebase_admin.initialize_app(_credentials())
+                _db = firestore.client()
+    return _db
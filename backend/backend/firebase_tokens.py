@@ -0,0 +1,166 @@
+# backend/firebase_tokens.py
+"""
+Local verification of Firebase ID tokens, with per-process caches.
+
+Tokens are checked against Google's published signing certificates, which
+are fetched once and kept for as long as their Cache-Control header allows,
+so verification costs no network round trip. A verified token's claims are
+cached under a hash of the token until it expires, and user roles are kept
+in a TTL + LRU cache in front of Firestore.
+"""
+import hashlib
+import re
+import threading
+import time
+
+import jwt
+import requests
+from cachetools import TLRUCache, TTLCache
+from cryptography.x509 import load_pem_x509_certificate
+from django.conf import settings
+
+FIREBASE_CERTS_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+
+# Used when the certificate response carries no max-age
+DEFAULT_KEYS_MAX_AGE = 60 * 60
+
+# A token signed with an unknown key triggers a refetch at most this often
+MIN_KEYS_REFRESH_INTERVAL = 60
+
+CLOCK_SKEW = 5  # seconds
+
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class InvalidIdToken(ValueError):
+    pass
+
+
+class _SigningKeys:
+    """Google's current token signing keys by key id, refreshed when their cache lifetime runs out"""
+
+    def __init__(self):
+        self._keys = {}
+        self._expires = 0
+        self._fetched = 0
+        self._lock = threading.Lock()
+
+    def _fetch(self):
+        response = requests.get(FIREBASE_CERTS_URL, timeout=10)
+        response.raise_for_status()
+        match = MAX_AGE_RE.search(response.headers.get('Cache-Control', ''))
+        max_age = int(match.group(1)) if match else DEFAULT_KEYS_MAX_AGE
+        self._keys = {
+            kid: load_pem_x509_certificate(pem.encode()).public_key()
+            for kid, pem in response.json().items()
+        }
+        self._fetched = time.time()
+        self._expires = self._fetched + max_age
+
+    def __len__(self):
+        return len(self._keys)
+
+    def get(self, kid):
+        now = time.time()
+        with self._lock:
+            stale = now >= self._expires
+            # Keys rotate; an unknown kid may be newer than our copy
+            unknown = kid not in self._keys and now - self._fetched >= MIN_KEYS_REFRESH_INTERVAL
+            if stale or unknown:
+                try:
+                    self._fetch()
+                except (requests.RequestException, ValueError):
+                    # Keep verifying with the keys we have until Google answers again
+                    if not self._keys:
+                        raise InvalidIdToken('Signing keys unavailable')
+                    self._fetched = now
+            return self._keys.get(kid)
+
+
+signing_keys = _SigningKeys()
+
+_token_lock = threading.Lock()
+# Entries expire with the token they were verified from
+_verified_tokens = TLRUCache(
+    maxsize=getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000),
+    ttu=lambda key, claims, now: claims['exp'],
+    timer=time.time,
+)
+
+_role_lock = threading.Lock()
+_user_roles = TTLCache(
+    maxsize=getattr(settings, 'USER_ROLE_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'USER_ROLE_CACHE_TTL', 300),
+)
+
+
+def _token_key(id_token):
+    return hashlib.sha256(id_token.encode()).hexdigest()
+
+
+def _decode(id_token):
+    project_id = settings.FIREBASE_PROJECT_ID
+    try:
+        header = jwt.get_unverified_header(id_token)
+    except jwt.InvalidTokenError as e:
+        raise InvalidIdToken(str(e))
+    if header.get('alg') != 'RS256':
+        raise InvalidIdToken('Unexpected signing algorithm')
+
+    key = signing_keys.get(header.get('kid'))
+    if key is None:
+        raise InvalidIdToken('Unknown signing key')
+
+    try:
+        claims = jwt.decode(
+            id_token,
+            key,
+            algorithms=['RS256'],
+            audience=project_id,
+            issuer=f'https://securetoken.google.com/{project_id}',
+            leeway=CLOCK_SKEW,
+            options={'require': ['exp', 'iat', 'sub']},
+        )
+    except jwt.InvalidTokenError as e:
+        raise InvalidIdToken(str(e))
+
+    if not claims['sub'] or len(claims['sub']) > 128:
+        raise InvalidIdToken('Invalid subject')
+    if claims.get('auth_time', 0) > time.time() + CLOCK_SKEW:
+        raise InvalidIdToken('Token authenticated in the future')
+    claims['uid'] = claims['sub']
+    return claims
+
+
+def verify_id_token(id_token):
+    """Claims of a valid Firebase ID token, from cache when it was verified before"""
+    key = _token_key(id_token)
+    with _token_lock:
+        claims = _verified_tokens.get(key)
+    if claims is not None:
+        return claims
+
+    claims = _decode(id_token)
+    with _token_lock:
+        _verified_tokens[key] = claims
+    return claims
+
+
+def cached_user_role(uid, load):
+    """Role of `uid`, calling `load(uid)` only when it is not cached; nothing is cached when `load` raises"""
+    with _role_lock:
+        role = _user_roles.get(uid)
+    if role is None:
+        role = load(uid)
+        with _role_lock:
+            _user_roles[uid] = role
+    return role
+
+
+def invalidate_user_role(uid=None):
+    """Forget one user's cached role, or every role when `uid` is None"""
+    with _role_lock:
+        if uid is None:
+            _user_roles.clear()
+        else:
+            _user_roles.pop(uid, None)
@@ -0,0 +1,193 @@
+# backend/frontend.py
+"""
+Serving of the React build without the template engine.
+
+`index.html` and the other files at the root of the build (favicon,
+manifest, ...) are read once and kept in memory together with their gzip
+and brotli encodings. Files under STATIC_URL are compressed on disk by
+`collectstatic` (PrecompressedStaticFilesStorage) and indexed on first use;
+each request gets the smallest encoding the client accepts, handed to the
+server as an open file so gunicorn can send it with sendfile(). Files with
+a content hash in their name are cached by browsers for a year; everything
+else is revalidated against its ETag.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from functools import cache
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import StaticFilesStorage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_http_methods
+
+from backend.compression import ENCODINGS, compress, pick_encoding
+
+# Formats worth compressing; images and fonts are compressed already
+COMPRESSIBLE_EXTENSIONS = ('.js', '.css', '.html', '.json', '.map', '.svg', '.txt', '.ico', '.xml', '.webmanifest')
+
+# Precompressed files sit next to the original with these suffixes
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# Webpack names built files like main.8c2b0c1e.js or logo.6ce24c58023cc2f8fd88fe9d219db6c6.svg
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{8,32}\.')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def is_compressible(name):
+    return name.lower().endswith(COMPRESSIBLE_EXTENSIONS)
+
+
+class PrecompressedStaticFilesStorage(StaticFilesStorage):
+    """Static files storage that writes .br and .gz siblings of text assets during collectstatic"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        for name in paths:
+            if not is_compressible(name):
+                continue
+            path = self.path(name)
+            with open(path, 'rb') as f:
+                variants = compress(f.read())
+            for encoding, suffix in SUFFIXES.items():
+                if encoding in variants:
+                    with open(path + suffix, 'wb') as f:
+                        f.write(variants[encoding])
+                elif os.path.exists(path + suffix):
+                    # Left over from an older version of the file
+                    os.remove(path + suffix)
+            yield name, name, True
+
+
+def _content_type(name):
+    content_type, _ = mimetypes.guess_type(name)
+    if content_type is None:
+        return 'application/octet-stream'
+    if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+        return f'{content_type}; charset=utf-8'
+    return content_type
+
+
+@cache
+def root_files():
+    """Files at the root of the build, by name: (content type, {encoding: body}, etag)"""
+    build_dir = settings.FRONTEND_BUILD_DIR
+    if not os.path.isdir(build_dir):
+        return {}
+
+    files = {}
+    for entry in os.scandir(build_dir):
+        if not entry.is_file():
+            continue
+        with open(entry.path, 'rb') as f:
+            data = f.read()
+        bodies = {None: data}
+        if is_compressible(entry.name):
+            bodies.update(compress(data))
+        etag = f'"{hashlib.sha1(data).hexdigest()[:20]}"'
+        files[entry.name] = (_content_type(entry.name), bodies, etag)
+    return files
+
+
+@cache
+def static_files():
+    """Collected static files by URL path: (content type, {encoding: (path, size)}, etag, mtime, immutable)"""
+    files = {}
+    suffixes = tuple(SUFFIXES.values())
+    for directory, _, names in os.walk(settings.STATIC_ROOT):
+        for name in names:
+            if name.endswith(suffixes):
+                continue
+            path = os.path.join(directory, name)
+            stat = os.stat(path)
+            variants = {None: (path, stat.st_size)}
+            for encoding in ENCODINGS:
+                suffix = SUFFIXES[encoding]
+                if os.path.exists(path + suffix):
+                    variants[encoding] = (path + suffix, os.path.getsize(path + suffix))
+            url_path = os.path.relpath(path, settings.STATIC_ROOT).replace(os.sep, '/')
+            files[url_path] = (
+                _content_type(name),
+                variants,
+                f'"{stat.st_size:x}-{int(stat.st_mtime):x}"',
+                int(stat.st_mtime),
+                bool(HASHED_NAME_RE.search(name)),
+            )
+    return files
+
+
+@receiver(setting_changed)
+def _reload(setting, **kwargs):
+    if setting in ('FRONTEND_BUILD_DIR', 'STATIC_ROOT'):
+        root_files.cache_clear()
+        static_files.cache_clear()
+
+
+def _etag_for(etag, encoding):
+    # Each encoding is its own representation
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+
+def _finish(response, encoding, cache_control, vary):
+    if encoding is not None:
+        response['Content-Encoding'] = encoding
+    response['Cache-Control'] = cache_control
+    if vary:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+@require_http_methods(['GET', 'HEAD'])
+def static_file(request, path):
+    """A collected static file, precompressed when possible and sent straight from disk"""
+    entry = static_files().get(path)
+    if entry is None:
+        raise Http404('Static file not found')
+    content_type, variants, etag, mtime, immutable = entry
+    encoding = pick_encoding(request, variants)
+    etag = _etag_for(etag, encoding)
+    cache_control = IMMUTABLE if immutable else 'no-cache'
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=mtime)
+    if not_modified is None:
+        file_path, size = variants[encoding]
+        response = FileResponse(open(file_path, 'rb'), content_type=content_type)
+        # FileResponse names the (possibly .br) file; the browser should just use it
+        del response['Content-Disposition']
+        response['Content-Length'] = size
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(mtime)
+    else:
+        response = not_modified
+    return _finish(response, encoding, cache_control, len(variants) > 1)
+
+
+@require_http_methods(['GET', 'HEAD'])
+def spa_shell(request, path=''):
+    """A file from the root of the build, or index.html for any app route"""
+    files = root_files()
+    entry = files.get(path)
+    if entry is None:
+        if path.startswith(settings.STATIC_URL.lstrip('/')):
+            # A missing asset must not be answered with the app's HTML
+            raise Http404('Static file not found')
+        entry = files.get('index.html')
+        if entry is None:
+            return HttpResponse('Frontend build not found; run npm run build', status=404, content_type='text/plain')
+
+    content_type, bodies, etag = entry
+    encoding = pick_encoding(request, bodies)
+    etag = _etag_for(etag, encoding)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(bodies[encoding], content_type=content_type)
+        response['ETag'] = etag
+    return _finish(response, encoding, 'no-cache', len(bodies) > 1)
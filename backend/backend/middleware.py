@@ -1,31 +1,98 @@
 # backend/middleware.py
-from django.http import JsonResponse
-from backend.firebase import db
+import logging
+from inspect import iscoroutinefunction
 
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.functional import SimpleLazyObject
+from backend.compression import ENCODINGS, compress_response_body, pick_encoding
+from backend.firebase import get_db
+from backend.firebase_tokens import InvalidIdToken, cached_user_role, verify_id_token
+
+logger = logging.getLogger(__name__)
+
+@sync_and_async_middleware
 def check_user_role(get_response):
+    if iscoroutinefunction(get_response):
+        # Under ASGI the chain stays async, so async views never hop to a thread here
+        async def middleware(request):
+            request.user_role = SimpleLazyObject(lambda: resolve_user_role(request))
+            return await get_response(request)
+
+        return middleware
+
     def middleware(request):
-        if 'Authorization' in request.headers:
-            id_token = request.headers['Authorization'].split(' ').pop()
-            decoded_token = auth.verify_id_token(id_token)
-            uid = decoded_token['uid']
-            # Retrieve user role from Firestore or your database
-            user_role = get_user_role_from_db(uid)
-            request.user_role = user_role
-        else:
-            request.user_role = None
+        # Resolved on first access, so views that never look at the role (catalog reads)
+        # pay nothing for an Authorization header
+        request.user_role = SimpleLazyObject(lambda: resolve_user_role(request))
 
         response = get_response(request)
         return response
 
     return middleware
 
-def get_user_role_from_db(uid):
+def resolve_user_role(request):
+    """Role of the caller's Firebase user, or None when there is no valid token"""
+    if 'Authorization' not in request.headers:
+        return None
+    id_token = request.headers['Authorization'].split(' ').pop()
     try:
-        user_doc = db.collection('roles').document(uid).get()
-        if user_doc.exists:
-            return user_doc.to_dict().get('role', 'user')  # Default to 'user' if role not found
-        else:
-            return 'user'  # Default to 'user' if document does not exist
-    except Exception as e:
-        print(f"Error retrieving user role: {e}")
-        return 'user'  # Default to 'user' in case of error
\ No newline at end of file
+        decoded_token = verify_id_token(id_token)
+    except InvalidIdToken:
+        return None
+    try:
+        return cached_user_role(decoded_token['uid'], get_user_role_from_db)
+    except Exception:
+        # Not cached, so the next request asks Firestore again
+        logger.warning('Error retrieving user role', exc_info=True)
+        return 'user'  # Default to 'user' in case of error
+
+def get_user_role_from_db(uid):
+    user_doc = get_db().collection('roles').document(uid).get()
+    if user_doc.exists:
+        return user_doc.to_dict().get('role', 'user')  # Default to 'user' if role not found
+    else:
+        return 'user'  # Default to 'user' if document does not exist
+
+@sync_and_async_middleware
+def compress_api_responses(get_response):
+    """gzip or brotli for JSON API responses above COMPRESS_MIN_SIZE, in the encoding the client prefers"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return compress_api_response(request, await get_response(request))
+
+        return middleware
+
+    def middleware(request):
+        return compress_api_response(request, get_response(request))
+
+    return middleware
+
+def compress_api_response(request, response):
+    if (
+        not request.path.startswith('/api/')
+        or response.streaming
+        or response.has_header('Content-Encoding')
+        or not response.get('Content-Type', '').startswith('application/json')
+        or len(response.content) < settings.COMPRESS_MIN_SIZE
+    ):
+        return response
+
+    patch_vary_headers(response, ('Accept-Encoding',))
+    encoding = pick_encoding(request, ENCODINGS)
+    if encoding is None:
+        return response
+    # Only the encoding this client takes; cached responses arrive already encoded
+    body = compress_response_body(response.content, 'live', encodings=(encoding,)).get(encoding)
+    if body is None:
+        return response
+
+    response.content = body
+    response['Content-Encoding'] = encoding
+    response['Content-Length'] = str(len(body))
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        # The bytes changed, as GZipMiddleware does
+        response['ETag'] = 'W/' + etag
+    return response
@@ -71,12 +71,18 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     'backend.middleware.check_user_role',
+    'backend.middleware.compress_api_responses',
 ]
 
 
 # Firebase and Firestore settings
 FIREBASE_PROJECT_ID = os.getenv('FIREBASE_PROJECT_ID')
 
+# Verified ID tokens are cached until they expire; roles for USER_ROLE_CACHE_TTL seconds
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10000))
+USER_ROLE_CACHE_SIZE = int(os.getenv('USER_ROLE_CACHE_SIZE', 10000))
+USER_ROLE_CACHE_TTL = int(os.getenv('USER_ROLE_CACHE_TTL', 300))
+
 ROOT_URLCONF = "backend.urls"
 
 # Static files (CSS, JavaScript, Images)
@@ -85,18 +91,25 @@ ROOT_URLCONF = "backend.urls"
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# React build: index.html and the root files are served from memory by backend.frontend
+FRONTEND_BUILD_DIR = os.path.join(BASE_DIR, '../e-commerce/build')
+
 # Add React build files to static files
 STATICFILES_DIRS = [
-    os.path.join(BASE_DIR, '../e-commerce/build/static'),
+    os.path.join(FRONTEND_BUILD_DIR, 'static'),
 ]
 
+# collectstatic writes .br and .gz copies next to text assets
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'backend.frontend.PrecompressedStaticFilesStorage'},
+}
+
 # Serve React app
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
-        "DIRS": [
-            os.path.join(BASE_DIR, '../e-commerce/build'),  # React build directory
-        ],
+        "DIRS": [],
         "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
@@ -161,20 +174,65 @@ USE_TZ = True
 # This is handled above in the static files section
 
 # Caching Configuration
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-        'TIMEOUT': 300,  # 5 minutes
-        'OPTIONS': {
-            'MAX_ENTRIES': 1000,
+if DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+            'TIMEOUT': 300,  # 5 minutes
+            'OPTIONS': {
+                'MAX_ENTRIES': 1000,
+            }
+        }
+    }
+else:
+    # One cache per host shared by all gunicorn workers, no cache server needed
+    CACHES = {
+        'default': {
+            'BACKEND': 'backend.shared_cache.SharedMemoryCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', ''),  # empty = /dev/shm/e-store-cache-<uid>/cache.sqlite3 (mode 0700)
+            'TIMEOUT': 300,  # 5 minutes
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000)),
+            }
         }
     }
+
+# API JSON is rendered with one shared encoder; same bytes as DRF's JSONRenderer
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'products.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 # Cache time to live is 15 minutes
 CACHE_TTL = 60 * 15
 
+# JSON API responses and React build files at least this large are sent gzip or brotli compressed
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+
+# Seconds between a worker's flushes of its response cache and compression counters to the cache
+COUNTER_FLUSH_INTERVAL = float(os.getenv('COUNTER_FLUSH_INTERVAL', 5))
+
+# Above this many planner-estimated rows, ?count=estimated skips the exact count
+PRODUCT_COUNT_ESTIMATE_THRESHOLD = int(os.getenv('PRODUCT_COUNT_ESTIMATE_THRESHOLD', 10000))
+
+# Threads per web process that deliver queued email; 0 leaves it to `manage.py run_email_outbox`
+EMAIL_OUTBOX_THREADS = int(os.getenv('EMAIL_OUTBOX_THREADS', 1))
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@yourstore.com')
+
+# Threads per web process that process stored Stripe webhook events; 0 leaves it to `manage.py process_stripe_events`
+STRIPE_EVENT_THREADS = int(os.getenv('STRIPE_EVENT_THREADS', 1))
+
+# Serve the catalog and payment endpoints from products.async_views; asgi.py turns this on
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False').lower() == 'true'
+
+# Stripe API endpoint override for a local stand-in (stripe-mock, `manage.py stripe_stub`); empty = Stripe
+STRIPE_API_BASE = os.getenv('STRIPE_API_BASE', '')
+# Keep-alive connections to the Stripe API per worker process
+STRIPE_HTTP_POOL_SIZE = int(os.getenv('STRIPE_HTTP_POOL_SIZE', 10))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
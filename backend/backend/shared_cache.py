@@ -0,0 +1,306 @@
+# backend/shared_cache.py
+"""
+Host-local cache shared by every worker process.
+
+Entries live in a single SQLite database, by default on the /dev/shm tmpfs,
+so all gunicorn workers on a box read and invalidate the same data without a
+cache server. SQLite memory-maps the file and handles cross-process locking;
+WAL mode lets readers proceed while a writer holds the lock.
+
+Values are pickled, so whoever can write the file can run code in every
+worker: the default file sits in a directory private to the user running
+the app (mode 0700), and a file or directory owned by anyone else is
+refused.
+
+Eviction is approximately LRU: reads refresh an entry's access time at most
+once per ACCESS_RESOLUTION seconds, and once MAX_ENTRIES is exceeded the
+least recently used 1/CULL_FREQUENCY of entries are dropped. The entry
+count is only checked on every CULL_INTERVAL-th write of a connection, so
+the cache can briefly overshoot MAX_ENTRIES.
+
+A write that cannot get the database lock within BUSY_TIMEOUT seconds is
+logged and skipped, as if the entry had been evicted: a busy cache must not
+fail the request that uses it.
+"""
+import logging
+import os
+import pickle
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+ACCESS_RESOLUTION = 10  # seconds
+
+MMAP_SIZE = 64 * 1024 * 1024
+
+# Writes per connection between two entry counts
+CULL_INTERVAL = 50
+
+# Seconds a write waits for another connection's lock before it is skipped
+BUSY_TIMEOUT = 5
+
+logger = logging.getLogger(__name__)
+
+
+def _is_locked(error):
+    return isinstance(error, sqlite3.OperationalError) and any(
+        reason in str(error) for reason in ('locked', 'busy')
+    )
+
+
+def default_location():
+    """Cache file in a per-user directory on shared memory when the host has it, else in the temp directory"""
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, f'e-store-cache-{os.getuid()}', 'cache.sqlite3')
+
+
+def _check_owned(path, private=False):
+    """Refuse a path that is a symlink or belongs to another user (or, if `private`, is open to others)"""
+    info = os.lstat(path)
+    if stat.S_ISLNK(info.st_mode) or info.st_uid != os.getuid():
+        raise ImproperlyConfigured(f'Cache path {path} is not owned by this user; refusing to load pickles from it')
+    if private and info.st_mode & 0o077:
+        raise ImproperlyConfigured(f'Cache directory {path} is accessible to other users; expected mode 0700')
+
+
+def prepare_location(path, private_directory=False):
+    """Create the cache file (and, for the default location, its private directory) safely"""
+    directory = os.path.dirname(path)
+    if private_directory:
+        try:
+            os.mkdir(directory, 0o700)
+        except FileExistsError:
+            pass
+        _check_owned(directory, private=True)
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600))
+    except FileExistsError:
+        _check_owned(path)
+
+
+class SharedMemoryCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location or default_location()
+        self._private_directory = not location
+        self._cull_interval = params.get('OPTIONS', {}).get('CULL_INTERVAL', CULL_INTERVAL)
+        self._busy_timeout = params.get('OPTIONS', {}).get('BUSY_TIMEOUT', BUSY_TIMEOUT)
+        self._local = threading.local()
+
+    # Connections are per thread and per process; a forked worker opens its own
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        prepare_location(self._path, self._private_directory)
+        conn = sqlite3.connect(self._path, timeout=self._busy_timeout, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, accessed REAL NOT NULL'
+            ') WITHOUT ROWID'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        self._local.writes = 0
+        return conn
+
+    def _expiry(self, timeout):
+        # Absolute expiry time, or None for entries that never expire
+        return self.get_backend_timeout(timeout)
+
+    def _fetch(self, conn, key, now):
+        row = conn.execute('SELECT value, expires, accessed FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires, accessed = row
+        if expires is not None and expires <= now:
+            self._housekeep(conn, 'DELETE FROM cache WHERE key = ? AND expires <= ?', (key, now))
+            return None
+        if now - accessed > ACCESS_RESOLUTION:
+            self._housekeep(conn, 'UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return row
+
+    def _housekeep(self, conn, sql, params):
+        # Bookkeeping done by reads; when another worker holds the lock it waits for a later read
+        try:
+            conn.execute(sql, params)
+        except sqlite3.OperationalError as e:
+            if not _is_locked(e):
+                raise
+
+    def _begin(self, conn, operation, key):
+        """Take the write lock; False (and logged) when another connection held it past the busy timeout"""
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError as e:
+            if not _is_locked(e):
+                raise
+            logger.warning('Skipped cache %s of %s: %s', operation, key, e)
+            return False
+        return True
+
+    def _write(self, conn, key, value, timeout, now):
+        conn.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._expiry(timeout), now),
+        )
+
+    def _cull(self, conn, now):
+        # Counting is a full scan under the write lock, so only a sample of writes pays for it
+        self._local.writes += 1
+        if (self._local.writes - 1) % self._cull_interval:
+            return
+        count, = conn.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count <= self._max_entries:
+            return
+        count -= conn.execute('DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?', (now,)).rowcount
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            conn.execute('DELETE FROM cache')
+            return
+        conn.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (count // self._cull_frequency,),
+        )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        now = time.time()
+        if not self._begin(conn, 'add', key):
+            return False
+        try:
+            if self._fetch(conn, key, now) is not None:
+                added = False
+            else:
+                self._write(conn, key, value, timeout, now)
+                self._cull(conn, now)
+                added = True
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return added
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._fetch(self._connection(), key, time.time())
+        return default if row is None else pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        now = time.time()
+        if not self._begin(conn, 'set', key):
+            return
+        try:
+            self._write(conn, key, value, timeout, now)
+            self._cull(conn, now)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        try:
+            cursor = self._connection().execute(
+                'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self._expiry(timeout), now, key, now),
+            )
+        except sqlite3.OperationalError as e:
+            if not _is_locked(e):
+                raise
+            logger.warning('Skipped cache touch of %s: %s', key, e)
+            return False
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._fetch(self._connection(), key, time.time()) is not None
+
+    def incr(self, key, delta=1, version=None):
+        # Read-modify-write under the database write lock, so increments from different workers never collide
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        now = time.time()
+        if not self._begin(conn, 'incr', key):
+            # Answer from the stored value; the increment is lost
+            row = self._fetch(conn, key, now)
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            return pickle.loads(row[0]) + delta
+        try:
+            row = self._fetch(conn, key, now)
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            new_value = pickle.loads(row[0]) + delta
+            conn.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(new_value, pickle.HIGHEST_PROTOCOL), key),
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return new_value
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+        now = time.time()
+        placeholders = ','.join('?' * len(key_map))
+        rows = self._connection().execute(
+            f'SELECT key, value, expires FROM cache WHERE key IN ({placeholders})', list(key_map)
+        ).fetchall()
+        return {
+            key_map[key]: pickle.loads(value)
+            for key, value, expires in rows
+            if expires is None or expires > now
+        }
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        conn = self._connection()
+        now = time.time()
+        if not self._begin(conn, 'set_many', ', '.join(data)):
+            return list(data)
+        try:
+            for key, value in data.items():
+                self._write(conn, self.make_and_validate_key(key, version=version), value, timeout, now)
+            self._cull(conn, now)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            placeholders = ','.join('?' * len(keys))
+            self._connection().execute(f'DELETE FROM cache WHERE key IN ({placeholders})', keys)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Connections are reused across requests; nothing to release per request
+        pass
@@ -0,0 +1,57 @@
+# backend/startup.py
+"""
+Measure what a fresh process imports on its way to serving requests.
+
+The boot is replayed in a subprocess under `python -X importtime`, so the
+numbers reflect a cold interpreter rather than whatever this process has
+already loaded.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+# What a gunicorn worker does before its first request: load settings and apps,
+# build the middleware chain and resolve the URLconf (which imports every view)
+BOOT_SCRIPT = '''
+import json, sys
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+get_wsgi_application()
+get_resolver().url_patterns
+print(json.dumps(sorted(sys.modules)))
+'''
+
+# Integrations that must only be imported on first use
+DEFERRED_MODULES = ('firebase_admin', 'google.cloud.firestore', 'grpc', 'stripe')
+
+
+def profile_boot():
+    """
+    Boot the project in a fresh interpreter.
+
+    Returns (wall seconds, imports, loaded module names) where imports is a
+    list of (module, self microseconds, cumulative microseconds).
+    """
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    env['PYTHONPATH'] = os.pathsep.join(path for path in sys.path if path)
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+        capture_output=True, text=True, env=env,
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f'Boot failed:\n{result.stderr[-2000:]}')
+
+    imports = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        imports.append((module.strip(), int(self_us), int(cumulative_us)))
+    modules = json.loads(result.stdout.strip().splitlines()[-1])
+    return elapsed, imports, modules
@@ -19,38 +19,51 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import path, include, re_path
-from django.views.generic import TemplateView
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
-from products.views import (
-    product_list, product_detail, categories, brands, add_review,
-    create_payment_intent, send_order_confirmation, webhook
-)
+from backend.frontend import spa_shell, static_file
+from products import async_views, views
+
+# ASGI: the hot read paths and the Stripe calls run on the event loop
+module = async_views if settings.ASYNC_VIEWS else views
 
 router = DefaultRouter()
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('server-status/', views.server_status, name='server_status'),
     path('api/', include(router.urls)),
     
     # Product endpoints
-    path('api/products/', product_list, name='product_list'),
-    path('api/products/<int:pk>/', product_detail, name='product_detail'),
-    path('api/categories/', categories, name='categories'),
-    path('api/brands/', brands, name='brands'),
-    path('api/products/<int:product_id>/reviews/', add_review, name='add_review'),
+    path('api/products/', module.product_list, name='product_list'),
+    path('api/products/facets/', views.product_facets, name='product_facets'),
+    path('api/products/export/', views.product_export, name='product_export'),
+    path('api/products/batch/', views.product_batch, name='product_batch'),
+    path('api/products/bulk/', views.product_bulk, name='product_bulk'),
+    path('api/products/<int:pk>/', module.product_detail, name='product_detail'),
+    path('api/categories/', module.categories, name='categories'),
+    path('api/brands/', module.brands, name='brands'),
+    path('api/products/<int:product_id>/reviews/', views.add_review, name='add_review'),
+    path('api/cache-stats/', views.response_cache_stats, name='response_cache_stats'),
+    path('api/compression-stats/', views.response_compression_stats, name='response_compression_stats'),
     
     # Payment endpoints
-    path('api/create-payment-intent/', create_payment_intent, name='create_payment_intent'),
-    path('api/send-order-confirmation/', send_order_confirmation, name='send_order_confirmation'),
-    path('api/webhook/', webhook, name='webhook'),
+    path('api/create-payment-intent/', module.create_payment_intent, name='create_payment_intent'),
+    path('api/send-order-confirmation/', module.send_order_confirmation, name='send_order_confirmation'),
+    path('api/email-outbox/', views.email_outbox_stats, name='email_outbox_stats'),
+    path('api/webhook/', module.webhook, name='webhook'),
 ]
 
 # Serve static files FIRST (before React catch-all)
-urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+if settings.DEBUG:
+    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+else:
+    urlpatterns += [
+        re_path(rf'^{settings.STATIC_URL.lstrip("/")}(?P<path>.+)$', static_file, name='static_file'),
+    ]
 
-# Serve React app for all other routes (LAST)
+# Serve React app for all other routes (LAST), from memory
 urlpatterns += [
-    re_path(r'^.*', TemplateView.as_view(template_name='index.html')),
+    re_path(r'^(?P<path>.*)$', spa_shell, name='spa_shell'),
 ]
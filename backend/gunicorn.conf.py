@@ -0,0 +1,24 @@
+# gunicorn.conf.py
+"""
+Gunicorn settings shared by the WSGI and ASGI profiles of railway-start.sh.
+
+The app is loaded and warmed once in the master before any worker exists, so
+workers start with the catalog cache filled and the code already in memory,
+shared copy-on-write. The listening socket is bound first; requests arriving
+meanwhile wait in the backlog instead of reaching a cold worker.
+"""
+preload_app = True
+
+
+def when_ready(server):
+    from products.warmup import prepare_fork, run_warmup
+    run_warmup()
+    prepare_fork()
+
+
+def post_fork(server, worker):
+    from products.warmup import warm_connections
+    try:
+        warm_connections()
+    except Exception as e:
+        server.log.warning('Worker %s could not open its database connection: %s', worker.pid, e)
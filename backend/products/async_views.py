@@ -0,0 +1,163 @@
+# backend/products/async_views.py
+"""
+Async versions of the catalog and payment views, served when the app runs
+under ASGI (ASYNC_VIEWS). They produce the same JSON as the DRF views in
+views.py and share their response cache, but wait on the database and
+Stripe without holding a worker thread. Cache calls run in a thread, since
+the shared cache can wait on another worker's write lock.
+"""
+import json
+import os
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .caching import CATALOG_NAMESPACE, DICTIONARY_NAMESPACE, JsonDataResponse, cache_response, product_namespaces
+from .counts import acount_products
+from .dictionary import abrand_list, acategory_list
+from .fast_serializers import aserialize_products, product_values
+from .filters import filter_products, filter_signature
+from .listing import listing_page, listing_sort_field, order_listing, page_bounds, page_links, wants_cursor
+from .models import Product
+from .outbox import aenqueue_email
+from .pagination import InvalidCursor, MAX_CURSOR_PAGE_SIZE, apaginate_by_cursor
+from .payments import acreate_payment_intent, stripe_api
+from .serializers import sparse_fields
+from .stripe_events import record_event
+from .views import render_order_confirmation
+
+@require_http_methods(["GET"])
+@cache_response('product_list', (CATALOG_NAMESPACE,))
+async def product_list(request):
+    """Get all products with optional filtering"""
+    products = filter_products(request.GET)
+    sort_field = listing_sort_field(request.GET)
+    
+    fields = sparse_fields(request.GET)
+    products = product_values(products, fields, extra_columns=(sort_field,))
+    page, page_size = listing_page(request.GET)
+    
+    if wants_cursor(request.GET):
+        page_size = max(1, min(page_size, MAX_CURSOR_PAGE_SIZE))
+        try:
+            page_products, next_cursor, previous_cursor = await apaginate_by_cursor(
+                products, sort_field, request.GET.get('order', 'desc') == 'desc', request.GET.get('cursor'), page_size
+            )
+        except InvalidCursor as e:
+            return JsonDataResponse({'error': str(e)}, status=400)
+        
+        return JsonDataResponse({
+            'next': next_cursor,
+            'previous': previous_cursor,
+            'results': await aserialize_products(page_products, fields)
+        })
+    
+    products = order_listing(products, sort_field, request.GET)
+    total_count, count_is_estimate = await acount_products(
+        products, filter_signature(request.GET), estimate=request.GET.get('count') == 'estimated'
+    )
+    start, end = page_bounds(page, page_size)
+    
+    return JsonDataResponse({
+        'count': total_count,
+        'count_is_estimate': count_is_estimate,
+        **page_links(page, page_size, end, total_count),
+        'results': await aserialize_products(products[start:end], fields)
+    })
+
+@require_http_methods(["GET"])
+@cache_response('product_detail', product_namespaces)
+async def product_detail(request, pk):
+    """Get a specific product by ID"""
+    products = await aserialize_products(product_values(Product.objects.filter(pk=pk, is_active=True)))
+    if not products:
+        return JsonDataResponse({'error': 'Product not found'}, status=404)
+    return JsonDataResponse(products[0])
+
+@require_http_methods(["GET"])
+@cache_response('categories', (DICTIONARY_NAMESPACE,))
+async def categories(request):
+    """Get all available categories"""
+    return JsonDataResponse(await acategory_list(with_counts=request.GET.get('counts') == 'true'))
+
+@require_http_methods(["GET"])
+@cache_response('brands', (DICTIONARY_NAMESPACE,))
+async def brands(request):
+    """Get all available brands, optionally filtered by category"""
+    return JsonDataResponse(
+        await abrand_list(request.GET.get('category'), with_counts=request.GET.get('counts') == 'true')
+    )
+
+# Payment Processing Endpoints
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def create_payment_intent(request):
+    """Create a Stripe payment intent"""
+    try:
+        data = json.loads(request.body)
+        amount = data.get('amount')
+        currency = data.get('currency', 'usd')
+        
+        if not amount:
+            return JsonResponse({'error': 'Amount is required'}, status=400)
+        
+        intent = await acreate_payment_intent(
+            amount,
+            currency,
+            checkout_id=request.headers.get('Idempotency-Key') or data.get('checkoutId'),
+            cart_items=data.get('cartItems') or [],
+        )
+        
+        return JsonResponse({
+            'client_secret': intent['client_secret']
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def send_order_confirmation(request):
+    """Queue the order confirmation email; the outbox workers send it"""
+    try:
+        data = json.loads(request.body)
+        order_id = data.get('orderId')
+        order_data = data.get('orderData') or {}
+        user_email = data.get('userEmail')
+        
+        if not user_email:
+            return JsonResponse({'error': 'User email is required'}, status=400)
+        
+        await aenqueue_email(
+            subject=f'Order Confirmation - Order #{order_id}',
+            recipients=[user_email],
+            html_body=render_order_confirmation(order_id, order_data),
+        )
+        
+        return JsonResponse({'success': True})
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def webhook(request):
+    """Verify and store a Stripe event; the event workers process it after we acknowledge"""
+    stripe = stripe_api()
+    payload = request.body
+    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
+    
+    try:
+        stripe.Webhook.construct_event(
+            payload, sig_header, os.getenv('STRIPE_WEBHOOK_SECRET')
+        )
+    except ValueError:
+        return JsonResponse({'error': 'Invalid payload'}, status=400)
+    except stripe.error.SignatureVerificationError:
+        return JsonResponse({'error': 'Invalid signature'}, status=400)
+    
+    # Deduplication needs a transaction, which the async ORM cannot open
+    created = await sync_to_async(record_event)(json.loads(payload))
+    
+    return JsonResponse({'success': True, 'duplicate': not created})
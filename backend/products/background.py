@@ -0,0 +1,64 @@
+# backend/products/background.py
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+
+class BackgroundWorker:
+    """
+    Runs a queue-draining task on a small in-process thread pool.
+
+    `task()` processes whatever is due and returns when the next piece of
+    work falls due (or None). The worker re-arms a single timer for that
+    moment, so retries happen even if nothing new is queued. The pool size
+    comes from the `threads_setting` setting; 0 disables in-process work,
+    leaving it to a dedicated management command.
+    """
+
+    def __init__(self, name, task, threads_setting):
+        self.name = name
+        self.task = task
+        self.threads_setting = threads_setting
+        self._executor = None
+        self._timer = None
+        self._timer_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def threads(self):
+        return getattr(settings, self.threads_setting, 0)
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix=self.name)
+            return self._executor
+
+    def _schedule(self, at):
+        # One timer per process, keeping the earliest time asked for
+        with self._lock:
+            if self._timer is not None and self._timer.is_alive() and self._timer_at <= at:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(max((at - timezone.now()).total_seconds(), 1), self.kick)
+            self._timer.daemon = True
+            self._timer_at = at
+            self._timer.start()
+
+    def _run(self):
+        try:
+            next_due = self.task()
+            if next_due is not None:
+                self._schedule(next_due)
+        finally:
+            connections.close_all()
+
+    def kick(self):
+        """Have the pool drain whatever is due, if in-process work is enabled"""
+        if self.threads > 0:
+            self._pool().submit(self._run)
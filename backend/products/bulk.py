@@ -0,0 +1,275 @@
+# backend/products/bulk.py
+
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .caching import invalidate_products
+from .dictionary import DICTIONARY_TRIGGER_FIELDS, rebuild_dictionary
+from .models import Dimension, Product, Review
+from .ratings import apply_rating_delta, review_contribution
+from .search import SEARCH_FIELDS, index_products
+from .serializers import ProductSerializer
+
+# Items accepted per request across create, update and delete
+MAX_BULK_ITEMS = 500
+
+# Bulk-created products are numbered from this database sequence, which starts
+# above the random range Product.generate_unique_id draws from (migration 0023)
+PRODUCT_ID_SEQUENCE = 'products_product_bulk_id_seq'
+FIRST_SEQUENCE_ID = 100000
+
+NESTED_FIELDS = ('reviews', 'dimensions')
+
+DIMENSION_FIELDS = ('width', 'height', 'depth')
+
+REVIEW_UPDATE_FIELDS = [
+    'rating', 'comment', 'reviewer_name', 'reviewer_id', 'status', 'is_verified_purchase',
+]
+
+
+def is_product_id(value):
+    """Whether a value from a JSON body is a product ID (JSON true is not ID 1)"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def allocate_product_ids(count):
+    """Reserve `count` new product IDs"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s) FROM generate_series(1, %s)', [PRODUCT_ID_SEQUENCE, count])
+            return [row[0] for row in cursor.fetchall()]
+    # No sequences elsewhere (SQLite in development): continue after the highest ID handed out so far.
+    # A concurrent bulk create that read the same maximum fails on the primary key instead of sharing IDs
+    highest = Product.objects.filter(id__gte=FIRST_SEQUENCE_ID).aggregate(highest=Max('id'))['highest']
+    start = FIRST_SEQUENCE_ID if highest is None else highest + 1
+    return list(range(start, start + count))
+
+
+def _review_key(data):
+    # Reviews carry no client-visible key, so match on who wrote them and when
+    return (data['reviewer_email'], data.get('date'))
+
+
+def diff_reviews(product_id, stored, incoming):
+    """
+    Work out the review writes that turn `stored` into `incoming`.
+
+    Returns (to_create, to_update, to_delete, rating_delta) where rating_delta
+    is the (count, sum) change in approved reviews from the creates and updates.
+    Deleted reviews are left out of it: deleting them through the ORM fires
+    the Review signal handlers, which take their contribution off.
+    """
+    by_key = {(review.reviewer_email, review.date): review for review in stored}
+    by_email = defaultdict(list)
+    for review in stored:
+        by_email[review.reviewer_email].append(review)
+
+    to_create, to_update, kept = [], [], set()
+    count_delta = sum_delta = 0
+    for data in incoming:
+        email, date = _review_key(data)
+        review = by_key.get((email, date)) if date else next(
+            (review for review in by_email[email] if review.pk not in kept), None
+        )
+        if review is None or review.pk in kept:
+            review = Review(product_id=product_id, **data)
+            to_create.append(review)
+            count, total = review_contribution(review.status, review.rating)
+        else:
+            kept.add(review.pk)
+            before = review_contribution(review.status, review.rating)
+            changed = False
+            for field in REVIEW_UPDATE_FIELDS:
+                if field in data and getattr(review, field) != data[field]:
+                    setattr(review, field, data[field])
+                    changed = True
+            if changed:
+                to_update.append(review)
+            after = review_contribution(review.status, review.rating)
+            count, total = after[0] - before[0], after[1] - before[1]
+        count_delta += count
+        sum_delta += total
+
+    to_delete = [review for review in stored if review.pk not in kept]
+    return to_create, to_update, to_delete, (count_delta, sum_delta)
+
+
+class BulkWrite:
+    """
+    One bulk request: validate every item, then apply the valid ones in one transaction.
+
+    `results` mirrors the request, one entry per item in the order given.
+    """
+
+    def __init__(self, create=(), update=(), delete=()):
+        self.create_items = list(create)
+        self.update_items = list(update)
+        self.delete_ids = list(delete)
+        self.results = {'create': [], 'update': [], 'delete': []}
+        self.touched_ids = set()
+        self.reindex = []
+        self.dictionary_changed = False
+
+    def validate(self):
+        """
+        Run the serializers over every item, recording failures; returns the valid creates and updates.
+
+        Locks the rows being updated, so call it inside the transaction that applies them.
+        """
+        creates = []
+        for index, item in enumerate(self.create_items):
+            serializer = ProductSerializer(data=item)
+            if serializer.is_valid():
+                creates.append((index, serializer.validated_data))
+            else:
+                self.results['create'].append({'index': index, 'status': 'invalid', 'errors': serializer.errors})
+
+        ids = [item['id'] for item in self.update_items if isinstance(item, dict) and is_product_id(item.get('id'))]
+        # Locked until run() commits, so a concurrent write cannot land between this read and our UPDATE
+        instances = Product.objects.select_for_update().in_bulk(ids)
+        # Partial dimension updates are merged with the stored sizes
+        dimension_ids = [
+            item['id'] for item in self.update_items
+            if isinstance(item, dict) and item.get('dimensions') and is_product_id(item.get('id')) and item['id'] in instances
+        ]
+        stored_dimensions = {}
+        if dimension_ids:
+            stored_dimensions = {dimension.product_id: dimension for dimension in Dimension.objects.filter(product_id__in=dimension_ids)}
+        updates = []
+        for index, item in enumerate(self.update_items):
+            product_id = item.get('id') if isinstance(item, dict) else None
+            instance = instances.get(product_id) if is_product_id(product_id) else None
+            if instance is None:
+                self.results['update'].append({'index': index, 'id': product_id, 'status': 'not_found'})
+                continue
+            serializer = ProductSerializer(instance, data=item, partial=True)
+            if not serializer.is_valid():
+                self.results['update'].append({'index': index, 'id': instance.id, 'status': 'invalid', 'errors': serializer.errors})
+                continue
+            data = serializer.validated_data
+            if data.get('dimensions'):
+                stored = stored_dimensions.get(instance.id)
+                dimensions = {name: getattr(stored, name) for name in DIMENSION_FIELDS} if stored else {}
+                dimensions.update(data['dimensions'])
+                missing = [name for name in DIMENSION_FIELDS if name not in dimensions]
+                if missing:
+                    # Nothing stored to fill the gaps from
+                    errors = {'dimensions': {name: ['This field is required.'] for name in missing}}
+                    self.results['update'].append({'index': index, 'id': instance.id, 'status': 'invalid', 'errors': errors})
+                    continue
+                data['dimensions'] = dimensions
+            updates.append((index, instance, data))
+        return creates, updates
+
+    def run(self):
+        with transaction.atomic():
+            creates, updates = self.validate()
+            self.apply_creates(creates)
+            self.apply_updates(updates)
+            self.apply_deletes()
+            self.refresh_derived_data()
+        for kind in self.results:
+            self.results[kind].sort(key=lambda result: result['index'])
+        return self.results
+
+    def apply_creates(self, creates):
+        if not creates:
+            return
+        products, dimensions, reviews = [], [], []
+        for (index, data), product_id in zip(creates, allocate_product_ids(len(creates))):
+            fields = {name: value for name, value in data.items() if name not in NESTED_FIELDS}
+            product = Product(id=product_id, **fields)
+            if data.get('dimensions'):
+                dimensions.append(Dimension(product_id=product_id, **data['dimensions']))
+            for review_data in data.get('reviews', []):
+                review = Review(product_id=product_id, **review_data)
+                reviews.append(review)
+                count, total = review_contribution(review.status, review.rating)
+                product.review_count += count
+                product.rating_sum += total
+            if product.review_count:
+                # New products start with their totals, saving an UPDATE each
+                product.rating = round(product.rating_sum / product.review_count, 1)
+            products.append(product)
+            self.results['create'].append({'index': index, 'id': product_id, 'status': 'created'})
+
+        Product.objects.bulk_create(products)
+        Dimension.objects.bulk_create(dimensions)
+        Review.objects.bulk_create(reviews)
+
+        self.touched_ids.update(product.id for product in products)
+        self.reindex.extend(products)
+        self.dictionary_changed = True
+
+    def apply_updates(self, updates):
+        if not updates:
+            return
+        now = timezone.now()
+        # Each row is written with only the fields its own item changed
+        by_fields = defaultdict(dict)
+        dimensions = []
+        review_updates = [
+            (instance, data['reviews']) for index, instance, data in updates if 'reviews' in data
+        ]
+        stored_reviews = defaultdict(list)
+        for review in Review.objects.filter(product__in=[instance for instance, _ in review_updates]):
+            stored_reviews[review.product_id].append(review)
+
+        for index, instance, data in updates:
+            fields = {name: value for name, value in data.items() if name not in NESTED_FIELDS}
+            for name, value in fields.items():
+                setattr(instance, name, value)
+            instance.updated_at = now
+            by_fields[frozenset(fields) | {'updated_at'}][instance.id] = instance
+            if data.get('dimensions'):
+                dimensions.append(Dimension(product_id=instance.id, **data['dimensions']))
+            if set(fields) & set(SEARCH_FIELDS):
+                self.reindex.append(instance)
+            if set(fields) & set(DICTIONARY_TRIGGER_FIELDS):
+                self.dictionary_changed = True
+            self.results['update'].append({'index': index, 'id': instance.id, 'status': 'updated'})
+
+        for fields, instances in by_fields.items():
+            Product.objects.bulk_update(instances.values(), sorted(fields))
+        Dimension.objects.bulk_create(
+            dimensions,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['width', 'height', 'depth'],
+        )
+
+        to_create, to_update, to_delete = [], [], []
+        for instance, incoming in review_updates:
+            created, updated, deleted, (count_delta, sum_delta) = diff_reviews(
+                instance.id, stored_reviews[instance.id], incoming
+            )
+            to_create += created
+            to_update += updated
+            to_delete += deleted
+            apply_rating_delta(instance.id, count_delta, sum_delta)
+        Review.objects.bulk_create(to_create)
+        Review.objects.bulk_update(to_update, REVIEW_UPDATE_FIELDS)
+        Review.objects.filter(pk__in=[review.pk for review in to_delete]).delete()
+
+        self.touched_ids.update(instance.id for _, instance, _ in updates)
+
+    def apply_deletes(self):
+        if not self.delete_ids:
+            return
+        existing = set(Product.objects.filter(id__in=self.delete_ids).values_list('id', flat=True))
+        Product.objects.filter(id__in=existing).delete()
+        for index, product_id in enumerate(self.delete_ids):
+            status = 'deleted' if product_id in existing else 'not_found'
+            self.results['delete'].append({'index': index, 'id': product_id, 'status': status})
+        self.touched_ids.update(existing)
+
+    def refresh_derived_data(self):
+        # Bulk writes skip model signals, so refresh the derived data they would have maintained
+        index_products(self.reindex)
+        if self.dictionary_changed:
+            rebuild_dictionary()
+        if self.touched_ids:
+            invalidate_products(list(self.touched_ids))
@@ -0,0 +1,294 @@
+# backend/products/caching.py
+
+import hashlib
+import json
+import math
+import time
+from functools import wraps
+from inspect import iscoroutinefunction
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from backend import counters
+from backend.compression import compress_response_body, pick_encoding
+from .models import Product
+from .renderers import render_json
+
+# Namespaces: bumping one orphans every cache entry built under its previous version
+CATALOG_NAMESPACE = 'catalog'            # product_list pages
+DICTIONARY_NAMESPACE = 'dictionaries'    # categories and brands
+COUNTS_NAMESPACE = 'counts'              # listing counts and facets
+BULK_NAMESPACE = 'bulk'                  # every product, for bulk writes that skip model signals
+
+CACHED_ENDPOINTS = ('product_list', 'product_detail', 'categories', 'brands')
+
+CACHE_OUTCOMES = ('hits', 'misses', 'not_modified')
+
+# Past this many products a bulk write retires the whole catalog cache instead of per-product entries
+PER_PRODUCT_INVALIDATION_LIMIT = 500
+
+
+def product_namespace(product_id):
+    """Namespace for everything rendered from a single product"""
+    return f'product:{product_id}'
+
+
+def product_namespaces(pk):
+    """Namespaces a product detail response depends on"""
+    return (product_namespace(pk), BULK_NAMESPACE)
+
+
+def _version_key(namespace):
+    return f'cache_version:{namespace}'
+
+
+def _modified_key(namespace):
+    return f'cache_modified:{namespace}'
+
+
+def _initial_version():
+    # Time-based, so a namespace whose version key was evicted never reuses an old version (or ETag)
+    return int(time.time() * 1000)
+
+
+def namespace_state(*namespaces):
+    """Current version and last write time (or None if unknown) of each namespace"""
+    version_keys = [_version_key(namespace) for namespace in namespaces]
+    modified_keys = [_modified_key(namespace) for namespace in namespaces]
+    found = cache.get_many(version_keys + modified_keys)
+    versions = []
+    for key in version_keys:
+        version = found.get(key)
+        if version is None:
+            cache.add(key, _initial_version(), None)
+            version = cache.get(key, 0)
+        versions.append(version)
+    return versions, [found.get(key) for key in modified_keys]
+
+
+def namespace_versions(*namespaces):
+    """Current version of each namespace"""
+    return namespace_state(*namespaces)[0]
+
+
+def bump_namespaces(*namespaces):
+    """Invalidate every entry cached under the given namespaces"""
+    now = time.time()
+    for namespace in namespaces:
+        key = _version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+        cache.set(_modified_key(namespace), now, None)
+
+
+def invalidate_catalog():
+    """Retire every cached catalog response and aggregate after writes that bypass model signals"""
+    bump_namespaces(CATALOG_NAMESPACE, DICTIONARY_NAMESPACE, COUNTS_NAMESPACE, BULK_NAMESPACE)
+
+
+def invalidate_products(product_ids):
+    """Retire cached responses and aggregates touching the given products after a bulk write"""
+    if len(product_ids) > PER_PRODUCT_INVALIDATION_LIMIT:
+        invalidate_catalog()
+        return
+    bump_namespaces(
+        CATALOG_NAMESPACE, DICTIONARY_NAMESPACE, COUNTS_NAMESPACE,
+        *(product_namespace(product_id) for product_id in product_ids),
+    )
+
+
+def _last_modified(namespaces, modified):
+    """Latest write time across namespaces, seeded from Product.updated_at when never recorded"""
+    if any(timestamp is None for timestamp in modified):
+        latest = Product.objects.aggregate(latest=Max('updated_at'))['latest']
+        seed = latest.timestamp() if latest else time.time()
+        for namespace, timestamp in zip(namespaces, modified):
+            if timestamp is None:
+                cache.add(_modified_key(namespace), seed, None)
+        modified = [seed if timestamp is None else timestamp for timestamp in modified]
+    return max(modified)
+
+
+def _http_last_modified(timestamp):
+    """
+    A write time as a whole-second Last-Modified, or None while that second is still running.
+
+    Rounded up, so the header never predates the write. Until the second is
+    over another write can land in it, which a client revalidating with
+    If-Modified-Since alone would miss, so only the ETag is sent until then.
+    """
+    last_modified = math.ceil(timestamp)
+    return last_modified if last_modified <= time.time() else None
+
+
+def _record(endpoint, outcome):
+    counters.count({f'response_cache:{endpoint}:{outcome}': 1})
+
+
+def cache_stats():
+    """Hit, miss and 304 counters of the response cache, per endpoint"""
+    keys = [f'response_cache:{endpoint}:{outcome}' for endpoint in CACHED_ENDPOINTS for outcome in CACHE_OUTCOMES]
+    found = counters.read(keys)
+    stats = {}
+    for endpoint in CACHED_ENDPOINTS:
+        hits = found.get(f'response_cache:{endpoint}:hits', 0)
+        misses = found.get(f'response_cache:{endpoint}:misses', 0)
+        total = hits + misses
+        stats[endpoint] = {
+            'hits': hits,
+            'misses': misses,
+            'not_modified': found.get(f'response_cache:{endpoint}:not_modified', 0),
+            'hit_rate': round(hits / total, 4) if total else None,
+        }
+    return stats
+
+
+def _response_digest(endpoint, versions, params, kwargs=None):
+    """Digest of one endpoint response: namespace versions plus normalized query parameters"""
+    query = urlencode(sorted((name, value) for name, values in params.lists() for value in values))
+    if kwargs:
+        query += '|' + urlencode(sorted(kwargs.items()))
+    raw = f'{endpoint}|{".".join(str(version) for version in versions)}|{query}'
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _validators(endpoint, namespaces, request, kwargs):
+    """Namespaces, response digest and recorded write times of one request, from the cache alone"""
+    scope = namespaces(**kwargs) if callable(namespaces) else namespaces
+    versions, modified = namespace_state(*scope)
+    return scope, _response_digest(endpoint, versions, request.GET, kwargs), modified
+
+
+def _lookup(endpoint, request, digest, last_modified):
+    """(304 response, cache key, cached entry) of one request; only one of the response and key is set"""
+    not_modified = get_conditional_response(request, etag=f'"{digest}"', last_modified=last_modified)
+    if not_modified is not None:
+        _record(endpoint, 'not_modified')
+        return not_modified, None, None
+
+    key = f'response_body:{endpoint}:{digest}'
+    entry = cache.get(key)
+    _record(endpoint, 'misses' if entry is None else 'hits')
+    return None, key, entry
+
+
+def _encoded_entry(body):
+    """What the cache keeps of a response: its JSON bytes and their gzip and brotli encodings"""
+    entry = {None: body}
+    entry.update(compress_response_body(body, 'cached'))
+    return entry
+
+
+def _entry_response(request, entry):
+    """A response sent straight from a cache entry, in the encoding the client prefers"""
+    renderer = getattr(request, 'accepted_renderer', None)
+    if renderer is not None and renderer.format != 'json':
+        # DRF's browsable API
+        return Response(json.loads(entry[None]))
+
+    encoding = pick_encoding(request, entry)
+    response = HttpResponse(entry[encoding], content_type='application/json')
+    if encoding is not None:
+        response['Content-Encoding'] = encoding
+    if len(entry[None]) >= settings.COMPRESS_MIN_SIZE:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def _add_validators(response, digest, last_modified):
+    if response.status_code == 200:
+        # Encoded bodies are a different representation of the same data
+        response['ETag'] = f'W/"{digest}"' if response.has_header('Content-Encoding') else f'"{digest}"'
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Stored copies must be revalidated, which is what makes the 304 path pay off
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+class JsonDataResponse(HttpResponse):
+    """
+    JSON response that keeps its data, the async views' stand-in for DRF's Response.
+
+    Rendered by the API's JSON renderer, so both serving paths send the same
+    bytes and share cache entries.
+    """
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(render_json(data), **kwargs)
+        self.data = data
+
+
+def cache_response(endpoint, namespaces):
+    """
+    Cache a GET view's successful JSON response until one of its namespaces is bumped.
+
+    The body is stored rendered, with its gzip and brotli encodings, so a hit
+    skips both serialization and compression. The same namespace versions
+    yield an ETag and Last-Modified, so conditional requests for unchanged
+    data get a 304 before the view or cache is touched. `namespaces` is a
+    tuple, or a callable receiving the view's URL kwargs. Async views return
+    a JsonDataResponse.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # The shared cache can wait up to its busy timeout for another worker's write
+                # lock, so it is called from a thread rather than on the event loop
+                scope, digest, modified = await sync_to_async(_validators, thread_sensitive=False)(
+                    endpoint, namespaces, request, kwargs
+                )
+                if None in modified:
+                    # Only seeding Last-Modified needs the database
+                    last_modified = _http_last_modified(await sync_to_async(_last_modified)(scope, modified))
+                else:
+                    last_modified = _http_last_modified(max(modified))
+
+                not_modified, key, entry = await sync_to_async(_lookup, thread_sensitive=False)(
+                    endpoint, request, digest, last_modified
+                )
+                if not_modified is not None:
+                    return not_modified
+                if entry is not None:
+                    response = _entry_response(request, entry)
+                else:
+                    response = await view(request, *args, **kwargs)
+                    if response.status_code == 200:
+                        entry = _encoded_entry(response.content)
+                        await cache.aset(key, entry, settings.CACHE_TTL)
+                        response = _entry_response(request, entry)
+                return _add_validators(response, digest, last_modified)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            scope, digest, modified = _validators(endpoint, namespaces, request, kwargs)
+            last_modified = _http_last_modified(_last_modified(scope, modified))
+
+            not_modified, key, entry = _lookup(endpoint, request, digest, last_modified)
+            if not_modified is not None:
+                return not_modified
+            if entry is not None:
+                response = _entry_response(request, entry)
+            else:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    # Rendered as DRF renders it for JSON clients
+                    entry = _encoded_entry(render_json(response.data))
+                    cache.set(key, entry, settings.CACHE_TTL)
+                    response = _entry_response(request, entry)
+            return _add_validators(response, digest, last_modified)
+        return wrapper
+    return decorator
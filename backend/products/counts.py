@@ -0,0 +1,77 @@
+# backend/products/counts.py
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from .caching import COUNTS_NAMESPACE, bump_namespaces, namespace_versions
+
+def invalidate_product_counts():
+    """Drop every cached listing count and facet by moving to a new key namespace"""
+    bump_namespaces(COUNTS_NAMESPACE)
+
+
+def listing_cache_key(kind, signature):
+    """Cache key for an aggregate over one filter signature, dropped on the next product write"""
+    version, = namespace_versions(COUNTS_NAMESPACE)
+    return f'products:{kind}:{version}:{signature}'
+
+
+def estimate_count(queryset):
+    """Row estimate from the Postgres planner, or None when the backend has no cheap estimate"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def count_products(queryset, signature, estimate=False):
+    """
+    Count a filtered product queryset, returning `(count, is_estimate)`.
+
+    Exact counts are cached per filter signature until the next product write.
+    With `estimate=True`, large result sets use the planner's row estimate
+    instead of scanning; small ones still get an exact (cached) count.
+    """
+    key = listing_cache_key('count', signature)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached, False
+
+    if estimate:
+        estimated = estimate_count(queryset)
+        if estimated is not None and estimated >= settings.PRODUCT_COUNT_ESTIMATE_THRESHOLD:
+            return estimated, True
+
+    total = queryset.count()
+    cache.set(key, total, settings.CACHE_TTL)
+    return total, False
+
+
+async def acount_products(queryset, signature, estimate=False):
+    """Async version of count_products; only the count itself leaves the event loop"""
+    # The shared cache can wait on another worker's write lock, so it is called from a thread
+    key = await sync_to_async(listing_cache_key, thread_sensitive=False)('count', signature)
+    cached = await cache.aget(key)
+    if cached is not None:
+        return cached, False
+
+    if estimate:
+        estimated = await sync_to_async(estimate_count)(queryset)
+        if estimated is not None and estimated >= settings.PRODUCT_COUNT_ESTIMATE_THRESHOLD:
+            return estimated, True
+
+    total = await queryset.acount()
+    await cache.aset(key, total, settings.CACHE_TTL)
+    return total, False
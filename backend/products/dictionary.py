@@ -0,0 +1,83 @@
+# backend/products/dictionary.py
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import CategoryBrand, Product
+
+DICTIONARY_FIELDS = ('category', 'brand')
+
+# Saving any of these can move a product between pairs, or in and out of the dictionary
+DICTIONARY_TRIGGER_FIELDS = DICTIONARY_FIELDS + ('is_active',)
+
+
+def adjust_category_brand(category, brand, delta):
+    """Add `delta` products to a (category, brand) pair, dropping pairs that reach zero"""
+    updated = CategoryBrand.objects.filter(category=category, brand=brand).update(
+        product_count=F('product_count') + delta
+    )
+    if not updated and delta > 0:
+        try:
+            with transaction.atomic():
+                CategoryBrand.objects.create(category=category, brand=brand, product_count=delta)
+        except IntegrityError:
+            # Another writer created the pair first
+            CategoryBrand.objects.filter(category=category, brand=brand).update(
+                product_count=F('product_count') + delta
+            )
+    elif delta < 0:
+        CategoryBrand.objects.filter(category=category, brand=brand, product_count__lte=0).delete()
+
+
+def rebuild_dictionary():
+    """Recompute every pair from the product table, e.g. after bulk writes that skip signals"""
+    rows = Product.objects.filter(is_active=True).values('category', 'brand').annotate(count=Count('id')).order_by()
+    with transaction.atomic():
+        CategoryBrand.objects.all().delete()
+        CategoryBrand.objects.bulk_create([
+            CategoryBrand(category=row['category'], brand=row['brand'], product_count=row['count'])
+            for row in rows
+        ])
+
+
+def _category_rows(with_counts):
+    if with_counts:
+        return CategoryBrand.objects.values('category').annotate(count=Sum('product_count')).order_by('category')
+    return CategoryBrand.objects.values_list('category', flat=True).distinct().order_by('category')
+
+
+def _brand_rows(category, with_counts):
+    pairs = CategoryBrand.objects.exclude(brand='')
+    if category:
+        pairs = pairs.filter(category=category)
+    if with_counts:
+        return pairs.values('brand').annotate(count=Sum('product_count')).order_by('brand')
+    return pairs.values_list('brand', flat=True).distinct().order_by('brand')
+
+
+def _counted(rows, field):
+    return [{'value': row[field], 'count': row['count']} for row in rows]
+
+
+def category_list(with_counts=False):
+    """All categories in use, alphabetically"""
+    rows = list(_category_rows(with_counts))
+    return _counted(rows, 'category') if with_counts else rows
+
+
+def brand_list(category=None, with_counts=False):
+    """Non-empty brands in use, alphabetically, optionally within one category"""
+    rows = list(_brand_rows(category, with_counts))
+    return _counted(rows, 'brand') if with_counts else rows
+
+
+async def acategory_list(with_counts=False):
+    """Async version of category_list"""
+    rows = [row async for row in _category_rows(with_counts)]
+    return _counted(rows, 'category') if with_counts else rows
+
+
+async def abrand_list(category=None, with_counts=False):
+    """Async version of brand_list"""
+    rows = [row async for row in _brand_rows(category, with_counts)]
+    return _counted(rows, 'brand') if with_counts else rows
@@ -0,0 +1,104 @@
+# backend/products/exports.py
+
+import csv
+import json
+from decimal import Decimal
+
+from .models import Dimension, Product
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Rows fetched per round trip; on Postgres each chunk is read from a server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+
+# Product columns in the dump; internal bookkeeping (content_hash, rating_sum) stays out
+EXPORT_PRODUCT_FIELDS = [
+    'id', 'title', 'description', 'category', 'brand', 'sku', 'price', 'discount_percentage',
+    'rating', 'stock', 'weight', 'warranty_information', 'shipping_information',
+    'availability_status', 'return_policy', 'minimum_order_quantity', 'thumbnail', 'images',
+    'created_at', 'updated_at',
+]
+
+DIMENSION_FIELDS = [field.name for field in Dimension._meta.concrete_fields if field.name not in ('id', 'product')]
+
+# Review summaries come from the maintained rating totals, so they cost no extra query
+REVIEW_SUMMARY_FIELDS = ['review_count', 'average_rating']
+
+
+def export_columns(include_reviews=False):
+    """Flat column names of an export row, in output order"""
+    columns = EXPORT_PRODUCT_FIELDS + [f'dimensions_{name}' for name in DIMENSION_FIELDS]
+    if include_reviews:
+        columns += REVIEW_SUMMARY_FIELDS
+    return columns
+
+
+def export_queryset(include_inactive=False):
+    """Products to dump, with dimensions joined in and only the exported columns loaded"""
+    products = Product.objects.all() if include_inactive else Product.objects.filter(is_active=True)
+    columns = EXPORT_PRODUCT_FIELDS + ['review_count', 'rating_sum']
+    columns += [f'dimensions__{name}' for name in DIMENSION_FIELDS]
+    return products.select_related('dimensions').only(*columns).order_by('id')
+
+
+def iter_export_rows(products, include_reviews=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield one flat dict per product without holding more than a chunk in memory"""
+    for product in products.iterator(chunk_size=chunk_size):
+        row = {name: getattr(product, name) for name in EXPORT_PRODUCT_FIELDS}
+        dimensions = getattr(product, 'dimensions', None)
+        for name in DIMENSION_FIELDS:
+            row[f'dimensions_{name}'] = getattr(dimensions, name) if dimensions else None
+        if include_reviews:
+            row['review_count'] = product.review_count
+            row['average_rating'] = round(product.rating_sum / product.review_count, 2) if product.review_count else None
+        yield row
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, default=_json_default) + '\n'
+
+
+class _LineBuffer:
+    """File-like object that hands back whatever csv.writer writes to it"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(rows, columns):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_cell(row[name]) for name in columns])
+
+
+def iter_export(fmt='ndjson', include_reviews=False, include_inactive=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """Encoded lines of a full catalog dump in `fmt`"""
+    rows = iter_export_rows(export_queryset(include_inactive), include_reviews, chunk_size)
+    if fmt == 'csv':
+        return iter_csv(rows, export_columns(include_reviews))
+    return iter_ndjson(rows)
@@ -0,0 +1,104 @@
+# backend/products/facets.py
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Min, Q
+
+from .counts import listing_cache_key
+from .filters import filter_products, filter_signature
+
+PRICE_BUCKET_COUNT = 8
+
+RATING_BUCKETS = range(0, 6)
+
+CENT = Decimal('0.01')
+
+
+def _price(value):
+    return str(Decimal(value).quantize(CENT)) if value is not None else None
+
+
+def _price_step(low, high):
+    """Smallest 1/2/5 x 10^n step that covers the price range in PRICE_BUCKET_COUNT buckets"""
+    span = high - low
+    if span <= 0:
+        return Decimal(1)
+    raw = span / PRICE_BUCKET_COUNT
+    magnitude = Decimal(10) ** (raw.adjusted())
+    for multiplier in (1, 2, 5, 10):
+        step = magnitude * multiplier
+        if step >= raw:
+            return step
+    return magnitude * 10
+
+
+def _price_buckets(products, low, high):
+    if low is None:
+        return []
+    low, high = Decimal(low).quantize(CENT), Decimal(high).quantize(CENT)
+
+    step = _price_step(low, high)
+    start = (low // step) * step
+    edges = []
+    while not edges or edges[-1][1] <= high:
+        lower = start + step * len(edges)
+        edges.append((lower, lower + step))
+
+    counts = products.aggregate(**{
+        f'bucket_{i}': Count('id', filter=Q(price__gte=lower, price__lt=upper))
+        for i, (lower, upper) in enumerate(edges)
+    })
+    return [
+        {'min': _price(lower), 'max': _price(upper), 'count': counts[f'bucket_{i}']}
+        for i, (lower, upper) in enumerate(edges)
+    ]
+
+
+def compute_facets(products):
+    """Category, brand, price, rating, stock and discount breakdowns of a filtered queryset"""
+    products = products.order_by()
+
+    rating_filters = {
+        f'rating_{stars}': Count('id', filter=Q(rating__gte=stars, rating__lt=stars + 1))
+        for stars in RATING_BUCKETS
+    }
+    totals = products.aggregate(
+        count=Count('id'),
+        in_stock=Count('id', filter=Q(stock__gt=0)),
+        discounted=Count('id', filter=Q(discount_percentage__gt=0)),
+        min_price=Min('price'),
+        max_price=Max('price'),
+        **rating_filters,
+    )
+
+    categories = products.values('category').annotate(count=Count('id')).order_by('-count', 'category')
+    brands = (
+        products.exclude(brand='').values('brand')
+        .annotate(count=Count('id')).order_by('-count', 'brand')
+    )
+
+    return {
+        'count': totals['count'],
+        'categories': [{'value': row['category'], 'count': row['count']} for row in categories],
+        'brands': [{'value': row['brand'], 'count': row['count']} for row in brands],
+        'price': {
+            'min': _price(totals['min_price']),
+            'max': _price(totals['max_price']),
+            'buckets': _price_buckets(products, totals['min_price'], totals['max_price']),
+        },
+        'ratings': [{'rating': stars, 'count': totals[f'rating_{stars}']} for stars in RATING_BUCKETS],
+        'in_stock': totals['in_stock'],
+        'discounted': totals['discounted'],
+    }
+
+
+def get_facets(params):
+    """Facets for the product_list filters in `params`, cached per filter signature"""
+    key = listing_cache_key('facets', filter_signature(params))
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(filter_products(params))
+        cache.set(key, facets, settings.CACHE_TTL)
+    return facets
@@ -0,0 +1,186 @@
+# backend/products/fast_serializers.py
+"""
+Read-only fast path for product JSON.
+
+ProductSerializer instantiates a model per product and walks every value
+through its field objects. Catalog reads only need the output, so the
+columns to select and a converter per field are worked out once from the
+serializer itself, and the same dicts are built straight from values()
+rows: one query for the products (dimensions joined in) and one for their
+reviews. tests.py checks the output against ProductSerializer.
+"""
+import decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, fields as drf_fields
+from rest_framework.settings import api_settings
+
+from .models import Product, Review
+from .serializers import ProductListSerializer
+
+# Row keys each product's rendered relations are put under
+_REVIEWS = '__reviews'
+_DIMENSIONS = '__dimensions'
+
+
+def _decimal_converter(field):
+    # DecimalField.to_representation without building a context and quantum per value
+    quantum = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        return '{:f}'.format(value.quantize(quantum, rounding=rounding, context=context))
+    return convert
+
+
+def _datetime_converter(field, tz):
+    # DateTimeField.to_representation with the current time zone looked up once per call, not per value
+    def convert(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def _converter(field, tz):
+    """What turns a database value into `field`'s output, or None when that is the value itself"""
+    method = type(field).to_representation
+    # What the database driver returns is already the representation
+    if method in (drf_fields.ReadOnlyField.to_representation, drf_fields.IntegerField.to_representation,
+                  drf_fields.CharField.to_representation, drf_fields.BooleanField.to_representation):
+        return None
+    if method is drf_fields.FloatField.to_representation:
+        return float
+    if method is drf_fields.JSONField.to_representation and not field.binary:
+        return None
+    if (
+        method is drf_fields.DecimalField.to_representation
+        and field.decimal_places is not None
+        and getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        and not field.localize
+        and not field.normalize_output
+    ):
+        return _decimal_converter(field)
+    if (
+        method is drf_fields.DateTimeField.to_representation
+        and tz is not None
+        and not hasattr(field, 'timezone')
+        and str(getattr(field, 'format', api_settings.DATETIME_FORMAT)).lower() == ISO_8601
+    ):
+        return _datetime_converter(field, tz)
+    return field.to_representation
+
+
+def _slots(fields, tz):
+    """(output name, row column, converter) per field, in the serializer's order"""
+    return tuple((name, field.source, _converter(field, tz)) for name, field in fields.items())
+
+
+class ProductPlan:
+    """What product_values selects and serialize_products builds for one set of sparse fields and time zone"""
+
+    def __init__(self, fields, tz):
+        serializer_fields = ProductListSerializer(fields=fields).fields
+        self.product_slots = []
+        self.columns = []
+        self.review_slots = self.dimension_slots = None
+        for name, field in serializer_fields.items():
+            if name == 'reviews':
+                self.review_slots = _slots(field.child.fields, tz)
+                self.product_slots.append((name, _REVIEWS, None))
+            elif name == 'dimensions':
+                self.dimension_slots = tuple(
+                    (dimension_name, f'dimensions__{column}', convert)
+                    for dimension_name, column, convert in _slots(field.fields, tz)
+                )
+                self.columns += ['dimensions__id'] + [column for _, column, _ in self.dimension_slots]
+                self.product_slots.append((name, _DIMENSIONS, None))
+            else:
+                self.columns.append(field.source)
+                self.product_slots.append((name, field.source, _converter(field, tz)))
+        if 'id' not in self.columns:
+            # Reviews are matched up by product
+            self.columns.append('id')
+        self.review_columns = [column for _, column, _ in self.review_slots or ()] + ['product_id']
+
+
+# Plans are keyed by client-chosen field sets, so only the most used ones are kept
+PLAN_CACHE_SIZE = 64
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _plan(fields, tz):
+    return ProductPlan(fields, tz)
+
+
+def product_plan(fields=None):
+    """The (cached) plan for a sparse_fields() result in the current time zone"""
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+    return _plan(None if fields is None else frozenset(fields), tz)
+
+
+def _convert(row, slots):
+    item = {}
+    for name, column, convert in slots:
+        value = row[column]
+        if value is not None and convert is not None:
+            value = convert(value)
+        item[name] = value
+    return item
+
+
+def _build(plan, rows, review_rows):
+    reviews = {}
+    for review_row in review_rows:
+        reviews.setdefault(review_row['product_id'], []).append(_convert(review_row, plan.review_slots))
+
+    results = []
+    for row in rows:
+        if plan.review_slots is not None:
+            row[_REVIEWS] = reviews.get(row['id'], [])
+        if plan.dimension_slots is not None:
+            # A product without a Dimension row renders dimensions as null
+            row[_DIMENSIONS] = None if row['dimensions__id'] is None else _convert(row, plan.dimension_slots)
+        results.append(_convert(row, plan.product_slots))
+    return results
+
+
+def _review_queryset(plan, rows):
+    # Same ordering as the reviews ProductSerializer reads (Review.Meta.ordering)
+    return Review.objects.filter(product_id__in=[row['id'] for row in rows]).values(*plan.review_columns)
+
+
+def product_values(queryset, fields=None, extra_columns=()):
+    """`queryset` as values() rows holding what serialize_products needs for `fields`, plus `extra_columns`"""
+    columns = list(product_plan(fields).columns)
+    concrete = {f.name for f in Product._meta.concrete_fields}
+    columns += [name for name in extra_columns if name in concrete and name not in columns]
+    return queryset.prefetch_related(None).values(*columns)
+
+
+def serialize_products(rows, fields=None):
+    """
+    ProductListSerializer(products, many=True, fields=fields).data, from
+    product_values() rows (a queryset or a list).
+    """
+    rows = list(rows)
+    plan = product_plan(fields)
+    review_rows = _review_queryset(plan, rows) if plan.review_slots is not None and rows else ()
+    return _build(plan, rows, review_rows)
+
+
+async def aserialize_products(rows, fields=None):
+    """Async version of serialize_products"""
+    if not isinstance(rows, list):
+        rows = [row async for row in rows]
+    plan = product_plan(fields)
+    review_rows = []
+    if plan.review_slots is not None and rows:
+        review_rows = [row async for row in _review_queryset(plan, rows)]
+    return _build(plan, rows, review_rows)
@@ -0,0 +1,86 @@
+# backend/products/feeds.py
+
+import csv
+import hashlib
+import io
+import json
+from itertools import islice
+
+FEED_FORMATS = ('json', 'jsonl', 'csv')
+
+# CSV cells holding nested feed data, JSON-encoded
+CSV_JSON_COLUMNS = ('images', 'tags', 'dimensions', 'reviews', 'meta')
+
+# CSV cells converted back to the numbers the JSON feed carries
+CSV_NUMBER_COLUMNS = {
+    'id': int,
+    'price': float,
+    'discountPercentage': float,
+    'rating': float,
+    'stock': int,
+    'weight': float,
+    'minimumOrderQuantity': int,
+}
+
+
+def feed_format(path, default='json'):
+    """Guess a feed format from its file extension"""
+    for name in FEED_FORMATS:
+        if path and path.lower().endswith(f'.{name}'):
+            return name
+    return default
+
+
+def content_hash(item):
+    """Fingerprint of one feed product, stable across key order and whitespace"""
+    canonical = json.dumps(item, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _csv_item(row):
+    item = {}
+    for column, value in row.items():
+        if column in CSV_JSON_COLUMNS:
+            item[column] = json.loads(value) if value else ([] if column != 'dimensions' else None)
+        elif column in CSV_NUMBER_COLUMNS:
+            item[column] = CSV_NUMBER_COLUMNS[column](value) if value != '' else 0
+        else:
+            item[column] = value
+    return item
+
+
+def iter_feed(lines, fmt):
+    """
+    Yield feed products one at a time from an iterable of text lines.
+
+    JSONL and CSV are parsed row by row, so memory stays flat however large
+    the feed is. A JSON document (a list, or an object with a "products"
+    list) has to be loaded whole.
+    """
+    if fmt == 'jsonl':
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    elif fmt == 'csv':
+        for row in csv.DictReader(lines):
+            yield _csv_item(row)
+    else:
+        data = json.loads(''.join(lines))
+        if isinstance(data, dict):
+            data = data.get('products', [])
+        if not isinstance(data, list):
+            raise ValueError('Feed must be a list of products or an object with a "products" list')
+        yield from data
+
+
+def iter_response_lines(response):
+    """Decoded text lines of a streamed requests response"""
+    response.raw.decode_content = True
+    return io.TextIOWrapper(response.raw, encoding=response.encoding or 'utf-8', newline='')
+
+
+def batches(items, size):
+    """Split an iterable into lists of at most `size` items without materializing it"""
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
@@ -0,0 +1,107 @@
+# backend/products/filters.py
+
+import hashlib
+import json
+
+from .models import Product
+from .search import search_products
+
+# Query parameters that narrow the product set, as opposed to ordering or paging
+PRODUCT_FILTER_PARAMS = (
+    'category', 'title', 'brand', 'min_price', 'max_price',
+    'min_rating', 'max_rating', 'in_stock', 'has_discount', 'search',
+)
+
+# Query parameters accepted for full-text search; `q` is the short form of `search`
+SEARCH_PARAMS = ('search', 'q')
+
+# Filters matched case-insensitively, so their values can be case-folded in signatures
+CASE_INSENSITIVE_PARAMS = ('title', 'search')
+
+# Flags that only take effect when set to 'true'
+FLAG_PARAMS = ('in_stock', 'has_discount')
+
+
+def search_query(params):
+    """The full-text search query in `params`, from ?search= or ?q="""
+    for name in SEARCH_PARAMS:
+        if params.get(name):
+            return params[name]
+    return None
+
+
+def filter_products(params, products=None):
+    """Apply the product_list filter parameters to a Product queryset"""
+    if products is None:
+        # Products retired by the feed sync are never listed
+        products = Product.objects.filter(is_active=True)
+    
+    category = params.get('category')
+    if category:
+        products = products.filter(category=category)
+    
+    # Add title filter
+    title = params.get('title')
+    if title:
+        products = products.filter(title__icontains=title)
+    
+    # Add brand filter
+    brand = params.get('brand')
+    if brand:
+        products = products.filter(brand=brand)
+    
+    min_price = params.get('min_price')
+    if min_price:
+        products = products.filter(price__gte=min_price)
+    
+    max_price = params.get('max_price')
+    if max_price:
+        products = products.filter(price__lte=max_price)
+    
+    # Add rating filters
+    min_rating = params.get('min_rating')
+    if min_rating:
+        products = products.filter(rating__gte=min_rating)
+    
+    max_rating = params.get('max_rating')
+    if max_rating:
+        products = products.filter(rating__lte=max_rating)
+    
+    # Add stock filter
+    in_stock = params.get('in_stock')
+    if in_stock == 'true':
+        products = products.filter(stock__gt=0)
+    
+    # Add discount filter
+    has_discount = params.get('has_discount')
+    if has_discount == 'true':
+        products = products.filter(discount_percentage__gt=0)
+    
+    # Full-text search over title, brand, category and description
+    search = search_query(params)
+    if search:
+        products = search_products(products, search)
+    
+    return products
+
+
+def normalized_filters(params):
+    """Return the effective filters in `params` as a sorted list of (name, value) pairs"""
+    filters = []
+    for name in PRODUCT_FILTER_PARAMS:
+        value = search_query(params) if name == 'search' else params.get(name)
+        if not value:
+            continue
+        if name in FLAG_PARAMS:
+            if value != 'true':
+                continue
+        elif name in CASE_INSENSITIVE_PARAMS:
+            value = value.lower()
+        filters.append((name, value))
+    return filters
+
+
+def filter_signature(params):
+    """Stable key for the filter set in `params`, independent of parameter order and paging"""
+    raw = json.dumps(normalized_filters(params), separators=(',', ':'))
+    return hashlib.sha1(raw.encode()).hexdigest()
@@ -0,0 +1,55 @@
+# backend/products/listing.py
+
+from .filters import search_query
+from .search import search_rank
+
+# ?sort= values product_list accepts; anything else falls back to id
+SORT_FIELDS = ('id', 'price', 'rating', 'created_at', 'title')
+
+DEFAULT_PAGE_SIZE = 12
+
+
+def listing_sort_field(params):
+    """Column a product listing is ordered by"""
+    sort_by = params.get('sort', 'id')
+    if sort_by in SORT_FIELDS:
+        return sort_by
+    if sort_by == 'relevance' and search_query(params):
+        return 'search_rank'
+    return 'id'
+
+
+def listing_page(params):
+    """Requested (page, page_size), falling back to the first page"""
+    try:
+        return int(params.get('page', '1')), int(params.get('page_size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return 1, DEFAULT_PAGE_SIZE
+
+
+def wants_cursor(params):
+    """Whether the client asked for keyset pagination instead of page numbers"""
+    return params.get('cursor') is not None or params.get('pagination') == 'cursor'
+
+
+def order_listing(products, sort_field, params):
+    """Apply the listing order; relevance is always best match first"""
+    if sort_field == 'search_rank':
+        return products.annotate(search_rank=search_rank(search_query(params))).order_by('-search_rank', '-id')
+    if params.get('order', 'desc') == 'desc':
+        sort_field = f'-{sort_field}'
+    return products.order_by(sort_field)
+
+
+def page_bounds(page, page_size):
+    """Slice (start, end) of a page"""
+    start = (page - 1) * page_size
+    return start, start + page_size
+
+
+def page_links(page, page_size, end, total_count):
+    """next and previous links of a numbered page"""
+    return {
+        'next': f'?page={page + 1}&page_size={page_size}' if end < total_count else None,
+        'previous': f'?page={page - 1}&page_size={page_size}' if page > 1 else None,
+    }
@@ -0,0 +1,140 @@
+# products/management/commands/benchmark_servers.py
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from products.models import Product
+
+# The two deployment profiles of railway-start.sh (SERVER_MODE=wsgi / asgi)
+SERVER_COMMANDS = {
+    'wsgi': ['gunicorn', 'backend.wsgi:application'],
+    'asgi': ['gunicorn', 'backend.asgi:application', '-k', 'uvicorn_worker.UvicornWorker'],
+}
+
+STARTUP_TIMEOUT = 60  # seconds
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else 0.0
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the WSGI and ASGI deployments side by side at a fixed concurrency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests kept in flight at once')
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per endpoint and server')
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes per server, as in production')
+        parser.add_argument('--port', type=int, default=8765, help='Port the server under test listens on')
+        parser.add_argument('--stripe-latency', type=float, default=0.2, help='Seconds the local Stripe stand-in takes to answer')
+        parser.add_argument('--servers', nargs='+', choices=list(SERVER_COMMANDS), default=list(SERVER_COMMANDS), help='Deployments to measure')
+
+    def handle(self, *args, **options):
+        product_id = Product.objects.filter(is_active=True).values_list('id', flat=True).first()
+        if product_id is None:
+            raise CommandError('No products to read; run populate_products first')
+
+        endpoints = [
+            ('GET', '/api/products/'),
+            ('GET', f'/api/products/{product_id}/'),
+            ('GET', '/api/categories/'),
+            ('GET', '/api/brands/'),
+            ('POST', '/api/create-payment-intent/'),
+        ]
+
+        stripe_port = options['port'] + 1
+        stripe_stub = subprocess.Popen(
+            [sys.executable, 'manage.py', 'stripe_stub', '--port', str(stripe_port), '--latency', str(options['stripe_latency'])],
+            cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        env = {**os.environ, 'STRIPE_API_BASE': f'http://127.0.0.1:{stripe_port}'}
+        results = {}
+        try:
+            for server in options['servers']:
+                results[server] = self.measure(server, endpoints, env, options)
+        finally:
+            stripe_stub.terminate()
+            stripe_stub.wait()
+
+        servers = options['servers']
+        header = f"{'endpoint':<36}" + ''.join(f"{server + ' req/s':>12}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}" for server in servers)
+        self.stdout.write(header)
+        for method, path in endpoints:
+            row = f'{method + " " + path:<36}'
+            for server in servers:
+                rate, p50, p99, errors = results[server][path]
+                row += f'{rate:>12.0f}{p50 * 1000:>9.1f}{p99 * 1000:>9.1f}{errors:>8}'
+            self.stdout.write(row)
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['requests']} requests per endpoint at concurrency {options['concurrency']}, "
+            f"{options['workers']} workers per server, Stripe latency {options['stripe_latency']}s"
+        ))
+
+    def measure(self, server, endpoints, env, options):
+        base_url = f"http://127.0.0.1:{options['port']}"
+        command = SERVER_COMMANDS[server] + [
+            '--bind', f"127.0.0.1:{options['port']}", '--workers', str(options['workers']), '--timeout', '120',
+        ]
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            self.wait_until_up(process, base_url)
+            return {
+                path: asyncio.run(self.load(base_url, method, path, options['requests'], options['concurrency']))
+                for method, path in endpoints
+            }
+        finally:
+            process.terminate()
+            process.wait()
+
+    def wait_until_up(self, process, base_url):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'Server exited with status {process.returncode}')
+            try:
+                if httpx.get(f'{base_url}/api/categories/', timeout=2).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        raise CommandError('Server did not come up')
+
+    async def load(self, base_url, method, path, total, concurrency):
+        """Keep `concurrency` requests in flight until `total` are done: (req/s, p50, p99, errors)"""
+        latencies = []
+        errors = 0
+        remaining = iter(range(total))
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+            async def request():
+                if method == 'GET':
+                    return await client.get(path)
+                # A fresh checkout each time, so every request reaches Stripe
+                return await client.post(path, json={'amount': 1999}, headers={'Idempotency-Key': uuid.uuid4().hex})
+
+            async def user():
+                nonlocal errors
+                for _ in remaining:
+                    started = time.perf_counter()
+                    try:
+                        response = await request()
+                        if response.status_code >= 400:
+                            errors += 1
+                    except httpx.HTTPError:
+                        errors += 1
+                    latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(user() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+
+        return total / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99), errors
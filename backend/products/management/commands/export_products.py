@@ -0,0 +1,37 @@
+# products/management/commands/export_products.py
+from django.core.management.base import BaseCommand
+from products.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, iter_export
+
+class Command(BaseCommand):
+    help = 'Stream the whole catalog to a file or stdout as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson', help='Output format')
+        parser.add_argument('--output', help='File to write; stdout when omitted')
+        parser.add_argument('--reviews', action='store_true', help='Add review count and average rating columns')
+        parser.add_argument('--include-inactive', action='store_true', help='Also export products retired from the feed')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Products fetched per database round trip')
+
+    def handle(self, *args, **options):
+        lines = iter_export(
+            options['format'],
+            include_reviews=options['reviews'],
+            include_inactive=options['include_inactive'],
+            chunk_size=options['chunk_size'],
+        )
+
+        exported_count = 0
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                for line in lines:
+                    output.write(line)
+                    exported_count += 1
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
+                exported_count += 1
+
+        if options['format'] == 'csv':
+            exported_count -= 1  # header row
+        # Keep the summary off stdout, which may be carrying the dump itself
+        self.stderr.write(self.style.SUCCESS(f'Exported {exported_count} products'))
@@ -1,72 +1,244 @@
 # products/management/commands/populate_products.py
 
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
 import requests
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Case, FloatField, Value, When
+from django.utils import timezone
+from products.caching import invalidate_catalog, invalidate_products
+from products.dictionary import rebuild_dictionary
+from products.feeds import FEED_FORMATS, batches, content_hash, feed_format, iter_feed, iter_response_lines
 from products.models import Product, Review, Dimension
-from datetime import datetime
+from products.ratings import apply_rating_delta
+from products.search import index_products
+
+DEFAULT_URL = 'https://dummyjson.com/products?limit=0'
+
+# Product columns refreshed when a feed row matches an existing product. rating is left out:
+# once a product has approved reviews it is derived from their totals (products/ratings.py),
+# so the feed rating is only refreshed for products without any (see refresh_feed_ratings)
+PRODUCT_UPDATE_FIELDS = [
+    'title', 'category', 'price', 'thumbnail', 'images', 'description', 'availability_status',
+    'discount_percentage', 'warranty_information', 'stock', 'weight', 'brand', 'sku',
+    'shipping_information', 'minimum_order_quantity', 'return_policy', 'content_hash', 'is_active',
+    'updated_at',
+]
+
+
+def product_from_item(item, fingerprint):
+    return Product(
+        id=item['id'],
+        title=item['title'],
+        category=item['category'],
+        price=item['price'],
+        rating=item.get('rating', 0.0),
+        thumbnail=item['thumbnail'],
+        images=item['images'],
+        description=item['description'],
+        availability_status=item['availabilityStatus'],
+        discount_percentage=item['discountPercentage'],
+        warranty_information=item['warrantyInformation'],
+        stock=item['stock'],
+        weight=item['weight'],
+        brand=item.get('brand', ''),
+        sku=item['sku'],
+        shipping_information=item['shippingInformation'],
+        minimum_order_quantity=item['minimumOrderQuantity'],
+        return_policy=item['returnPolicy'],
+        content_hash=fingerprint,
+        is_active=True,
+    )
+
+
+def parse_review_date(value):
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=dt_timezone.utc)
+
 
 class Command(BaseCommand):
-    help = 'Populate the database with products from the dummy JSON URL'
-
-    def handle(self, *args, **kwargs):
-        url = 'https://dummyjson.com/products?limit=0'
-        response = requests.get(url)
-        data = response.json()
-
-        products = data.get('products', [])
-
-        for item in products:
-            # Create or update Product
-            product, created = Product.objects.update_or_create(
-                title=item['title'],
-                category=item['category'],
-                defaults={
-                    'id': item['id'],
-                    'price': item['price'],
-                    'thumbnail': item['thumbnail'],
-                    'images': item['images'],
-                    'description': item['description'],
-                    'availability_status': item['availabilityStatus'],
-                    'discount_percentage': item['discountPercentage'],
-                    'warranty_information': item['warrantyInformation'],
-                    'stock': item['stock'],
-                    'weight': item['weight'],
-                    'rating': item['rating'],
-                    'brand': item.get('brand', ''),
-                    'sku': item['sku'],
-                    'shipping_information': item['shippingInformation'],
-                    'minimum_order_quantity': item['minimumOrderQuantity'],
-                    'return_policy': item['returnPolicy'],
-                }
-            )
+    help = 'Populate the database with products from the dummy JSON URL, a local feed file or stdin'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=DEFAULT_URL, help='Feed URL to download')
+        parser.add_argument('--file', help="Read the feed from a local file instead ('-' for stdin)")
+        parser.add_argument('--format', choices=FEED_FORMATS, help='Feed format; guessed from the file or URL extension when omitted')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Products written per transaction')
+        parser.add_argument(
+            '--delta', action='store_true',
+            help='Only write products whose content changed since the last import and retire products missing from the feed',
+        )
+
+    def iter_items(self, options):
+        source = options['file'] or options['url']
+        fmt = options['format'] or feed_format(source)
+        if options['file'] == '-':
+            yield from iter_feed(sys.stdin, fmt)
+        elif options['file']:
+            with open(options['file'], newline='') as feed:
+                yield from iter_feed(feed, fmt)
+        else:
+            with requests.get(options['url'], stream=True) as response:
+                response.raise_for_status()
+                yield from iter_feed(iter_response_lines(response), fmt)
+
+    def handle(self, *args, **options):
+        delta = options['delta']
+        totals = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'removed': 0, 'reviews_created': 0, 'reviews_updated': 0}
+        seen_ids = set()
+        changed_ids = []
+
+        try:
+            for batch in batches(self.iter_items(options), options['batch_size']):
+                batch_totals, written_ids = self.upsert_batch(batch, delta)
+                for key, value in batch_totals.items():
+                    totals[key] += value
+                seen_ids.update(item['id'] for item in batch)
+                changed_ids.extend(written_ids)
+                self.stdout.write(f"Processed {len(seen_ids)} products")
+        except ValueError as e:
+            raise CommandError(f'Invalid feed: {e}')
 
-            # Create or update Dimensions
-            dimensions_data = item.get('dimensions', {})
-            if dimensions_data:
-                dimension, dim_created = Dimension.objects.update_or_create(
-                    product=product,
-                    defaults={
-                        'width': dimensions_data.get('width', 0),
-                        'height': dimensions_data.get('height', 0),
-                        'depth': dimensions_data.get('depth', 0),
-                    }
-                )
-
-            # Create or update Reviews
-            reviews_data = item.get('reviews', [])
-            for review_data in reviews_data:
-                review_date = datetime.strptime(review_data['date'], '%Y-%m-%dT%H:%M:%S.%fZ')
-                review, review_created = Review.objects.update_or_create(
-                    product=product,
-                    rating=review_data['rating'],
-                    comment=review_data['comment'],
-                    date=review_date,
-                    reviewer_name=review_data['reviewerName'],
-                    reviewer_email=review_data['reviewerEmail'],
-                )
-
-            if created:
-                self.stdout.write(self.style.SUCCESS(f"Created product: {product.title}"))
+        if delta:
+            if seen_ids:
+                removed_ids = self.retire_missing(seen_ids)
+                totals['removed'] = len(removed_ids)
+                changed_ids.extend(removed_ids)
             else:
-                self.stdout.write(self.style.WARNING(f"Updated product: {product.title}"))
+                self.stdout.write(self.style.WARNING('Feed is empty; not retiring any products'))
+
+        # Bulk writes skip model signals, so refresh the derived data they would have maintained
+        if not delta:
+            rebuild_dictionary()
+            invalidate_catalog()
+        elif changed_ids:
+            rebuild_dictionary()
+            invalidate_products(changed_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Inserted {totals['inserted']}, updated {totals['updated']}, unchanged {totals['unchanged']} "
+            f"and removed {totals['removed']} products; "
+            f"created {totals['reviews_created']} and updated {totals['reviews_updated']} reviews"
+        ))
+
+    @transaction.atomic
+    def upsert_batch(self, items, delta=False):
+        # A feed can repeat an id; the last occurrence wins, as it did with row-by-row upserts
+        items = list({item['id']: item for item in items}.values())
+        fingerprints = {item['id']: content_hash(item) for item in items}
+        stored = {
+            product_id: (fingerprint, is_active)
+            for product_id, fingerprint, is_active in Product.objects.filter(id__in=fingerprints)
+            .values_list('id', 'content_hash', 'is_active')
+        }
+
+        unchanged = 0
+        if delta:
+            changed_items = [item for item in items if stored.get(item['id']) != (fingerprints[item['id']], True)]
+            unchanged = len(items) - len(changed_items)
+            items = changed_items
+
+        products = [product_from_item(item, fingerprints[item['id']]) for item in items]
+        Product.objects.bulk_create(
+            products,
+            update_conflicts=True,
+            unique_fields=['id'],
+            update_fields=PRODUCT_UPDATE_FIELDS,
+        )
+        self.refresh_feed_ratings([item for item in items if item['id'] in stored])
+
+        dimensions = [
+            Dimension(
+                product_id=item['id'],
+                width=item['dimensions'].get('width', 0),
+                height=item['dimensions'].get('height', 0),
+                depth=item['dimensions'].get('depth', 0),
+            )
+            for item in items if item.get('dimensions')
+        ]
+        Dimension.objects.bulk_create(
+            dimensions,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['width', 'height', 'depth'],
+        )
+
+        reviews_created, reviews_updated = self.upsert_reviews(items)
+        index_products(products)
+
+        updated = sum(1 for item in items if item['id'] in stored)
+        return {
+            'inserted': len(items) - updated,
+            'updated': updated,
+            'unchanged': unchanged,
+            'reviews_created': reviews_created,
+            'reviews_updated': reviews_updated,
+        }, [item['id'] for item in items]
+
+    def refresh_feed_ratings(self, items):
+        """Take the feed rating for existing products that have no approved reviews, in one UPDATE"""
+        if not items:
+            return
+        Product.objects.filter(id__in=[item['id'] for item in items], review_count=0).update(
+            rating=Case(
+                *(When(id=item['id'], then=Value(float(item.get('rating', 0.0)))) for item in items),
+                output_field=FloatField(),
+            ),
+        )
+
+    def retire_missing(self, seen_ids):
+        """Mark active feed products absent from the feed inactive; returns their ids"""
+        # Only imported rows carry a content hash; products created through the API are not the feed's to retire
+        feed_products = Product.objects.filter(is_active=True).exclude(content_hash='')
+        missing = [
+            product_id
+            for product_id in feed_products.values_list('id', flat=True).iterator()
+            if product_id not in seen_ids
+        ]
+        now = timezone.now()
+        for chunk in batches(missing, 1000):
+            Product.objects.filter(id__in=chunk).update(is_active=False, updated_at=now)
+        return missing
+
+    def upsert_reviews(self, items):
+        """Match feed reviews to stored ones by (product, reviewer email, date) in one query"""
+        existing = {
+            (review.product_id, review.reviewer_email, review.date): review
+            for review in Review.objects.filter(product_id__in=[item['id'] for item in items])
+            .only('id', 'product_id', 'reviewer_email', 'date', 'rating', 'comment', 'reviewer_name', 'status')
+        }
+
+        to_create, to_update = [], []
+        rating_deltas = defaultdict(int)
+        for item in items:
+            for review_data in item.get('reviews', []):
+                key = (item['id'], review_data['reviewerEmail'], parse_review_date(review_data['date']))
+                review = existing.get(key)
+                if review is None:
+                    review = Review(
+                        product_id=item['id'],
+                        rating=review_data['rating'],
+                        comment=review_data['comment'],
+                        date=key[2],
+                        reviewer_name=review_data['reviewerName'],
+                        reviewer_email=review_data['reviewerEmail'],
+                    )
+                    existing[key] = review
+                    to_create.append(review)
+                elif (review.rating, review.comment, review.reviewer_name) != (
+                    review_data['rating'], review_data['comment'], review_data['reviewerName']
+                ):
+                    if review.status == 'approved':
+                        rating_deltas[review.product_id] += review_data['rating'] - review.rating
+                    review.rating = review_data['rating']
+                    review.comment = review_data['comment']
+                    review.reviewer_name = review_data['reviewerName']
+                    to_update.append(review)
 
+        Review.objects.bulk_create(to_create)
+        Review.objects.bulk_update(to_update, ['rating', 'comment', 'reviewer_name'])
+        for product_id, sum_delta in rating_deltas.items():
+            apply_rating_delta(product_id, 0, sum_delta)
+        return len(to_create), len(to_update)
@@ -0,0 +1,30 @@
+# products/management/commands/process_stripe_events.py
+import time
+
+from django.core.management.base import BaseCommand
+from products.stripe_events import EVENT_BATCH_SIZE, process_pending
+
+class Command(BaseCommand):
+    help = 'Process stored Stripe webhook events, once or as a long-running worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process what is due now and exit')
+        parser.add_argument('--batch-size', type=int, default=EVENT_BATCH_SIZE, help='Events claimed per batch')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to wait when nothing is due')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            processed, failed = process_pending(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} events, {failed} failed'))
+            return
+
+        self.stdout.write('Processing Stripe events; Ctrl+C to stop')
+        try:
+            while True:
+                processed, failed = process_pending(options['batch_size'])
+                if processed or failed:
+                    self.stdout.write(f'Processed {processed} events, {failed} failed')
+                else:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('Stripe event worker stopped'))
@@ -0,0 +1,28 @@
+# products/management/commands/profile_imports.py
+from django.core.management.base import BaseCommand, CommandError
+from backend.startup import DEFERRED_MODULES, profile_boot
+
+class Command(BaseCommand):
+    help = 'Boot the project in a fresh interpreter and report the slowest imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20, help='Number of imports to list')
+        parser.add_argument('--sort', choices=['cumulative', 'self'], default='cumulative', help='Rank imports by time including or excluding their own imports')
+
+    def handle(self, *args, **options):
+        try:
+            elapsed, imports, modules = profile_boot()
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        column = 2 if options['sort'] == 'cumulative' else 1
+        slowest = sorted(imports, key=lambda row: row[column], reverse=True)[:options['limit']]
+
+        self.stdout.write(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for module, self_us, cumulative_us in slowest:
+            self.stdout.write(f'{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {module}')
+
+        eager = [name for name in DEFERRED_MODULES if name in modules]
+        if eager:
+            self.stdout.write(self.style.WARNING(f"Imported at boot but meant to load lazily: {', '.join(eager)}"))
+        self.stdout.write(self.style.SUCCESS(f'Booted in {elapsed:.2f}s with {len(imports)} modules imported'))
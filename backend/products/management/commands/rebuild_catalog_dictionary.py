@@ -0,0 +1,11 @@
+# products/management/commands/rebuild_catalog_dictionary.py
+from django.core.management.base import BaseCommand
+from products.dictionary import rebuild_dictionary
+from products.models import CategoryBrand
+
+class Command(BaseCommand):
+    help = 'Recompute the category/brand dictionary from the product table'
+
+    def handle(self, *args, **kwargs):
+        rebuild_dictionary()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {CategoryBrand.objects.count()} category/brand pairs'))
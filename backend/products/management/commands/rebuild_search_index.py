@@ -0,0 +1,27 @@
+# products/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+from products.models import Product, SearchTerm
+from products.search import index_products
+
+class Command(BaseCommand):
+    help = 'Rebuild the product search index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Products indexed per transaction')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        SearchTerm.objects.all().delete()
+
+        batch = []
+        indexed_count = 0
+        for product in Product.objects.only('id', 'title', 'brand', 'category', 'description').iterator(chunk_size=batch_size):
+            batch.append(product)
+            if len(batch) >= batch_size:
+                index_products(batch)
+                indexed_count += len(batch)
+                batch = []
+        index_products(batch)
+        indexed_count += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully indexed {indexed_count} products'))
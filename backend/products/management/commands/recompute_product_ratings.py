@@ -0,0 +1,41 @@
+# products/management/commands/recompute_product_ratings.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from products.caching import invalidate_catalog
+from products.models import Product, Review
+
+class Command(BaseCommand):
+    help = 'Recompute review totals and average ratings from approved reviews to repair drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Products updated per query')
+
+    def handle(self, *args, **options):
+        totals = {
+            row['product_id']: (row['count'], row['total'])
+            for row in Review.objects.filter(status='approved').values('product_id')
+            .annotate(count=Count('id'), total=Sum('rating')).order_by()
+        }
+
+        drifted = []
+        for product in Product.objects.only('id', 'rating', 'review_count', 'rating_sum').iterator(chunk_size=options['batch_size']):
+            count, total = totals.get(product.id, (0, 0))
+            if count:
+                rating = round(total / count, 1)
+            elif product.review_count:
+                # Its approved reviews are gone; ratings.apply_rating_delta resets the average the same way
+                rating = 0.0
+            else:
+                # Products that never had approved reviews keep their imported feed rating
+                rating = product.rating
+            if (product.review_count, product.rating_sum, product.rating) != (count, total, rating):
+                product.review_count, product.rating_sum, product.rating = count, total, rating
+                drifted.append(product)
+
+        with transaction.atomic():
+            Product.objects.bulk_update(drifted, ['review_count', 'rating_sum', 'rating'], batch_size=options['batch_size'])
+        if drifted:
+            invalidate_catalog()
+
+        self.stdout.write(self.style.SUCCESS(f'Repaired {len(drifted)} products with drifted rating totals'))
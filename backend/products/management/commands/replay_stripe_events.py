@@ -0,0 +1,56 @@
+# products/management/commands/replay_stripe_events.py
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from products.models import StripeEvent
+from products.payments import stripe_api
+from products.stripe_events import process_pending, record_event, requeue_events
+
+class Command(BaseCommand):
+    help = 'Requeue stored Stripe events, or fetch events the webhook missed from the Stripe API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', help='Stripe event IDs to replay')
+        parser.add_argument('--failed', action='store_true', help='Replay every event that ran out of attempts')
+        parser.add_argument('--type', help='Only replay events of this type')
+        parser.add_argument('--since', help='Only events Stripe created on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--fetch', action='store_true', help='Pull events from the Stripe API and store the ones not yet received')
+        parser.add_argument('--process', action='store_true', help='Process the queue now instead of leaving it to the workers')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = int(datetime.strptime(options['since'], '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+            except ValueError:
+                raise CommandError('--since must be a date like 2025-01-31')
+
+        if options['fetch']:
+            if since is None:
+                raise CommandError('--fetch needs --since')
+            params = {'created': {'gte': since}}
+            if options['type']:
+                params['type'] = options['type']
+            fetched = stored = 0
+            for event in stripe_api().Event.list(**params).auto_paging_iter():
+                fetched += 1
+                stored += record_event(event.to_dict())
+            self.stdout.write(f'Fetched {fetched} events from Stripe, {stored} were missing')
+        else:
+            if not (options['event_ids'] or options['failed'] or since or options['type']):
+                raise CommandError('Name event IDs or pass --failed, --type or --since')
+            events = StripeEvent.objects.all()
+            if options['event_ids']:
+                events = events.filter(event_id__in=options['event_ids'])
+            if options['failed']:
+                events = events.filter(status='failed')
+            if options['type']:
+                events = events.filter(type=options['type'])
+            if since is not None:
+                events = events.filter(created__gte=since)
+            self.stdout.write(f'Requeued {requeue_events(events)} events')
+
+        if options['process']:
+            processed, failed = process_pending()
+            self.stdout.write(f'Processed {processed} events, {failed} failed')
+        self.stdout.write(self.style.SUCCESS('Replay complete'))
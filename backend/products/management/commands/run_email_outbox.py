@@ -0,0 +1,50 @@
+# products/management/commands/run_email_outbox.py
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from products.outbox import DELIVERY_BATCH_SIZE, deliver_pending, outbox_stats
+
+class Command(BaseCommand):
+    help = 'Deliver queued emails from the outbox, once or as a long-running worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Deliver what is due now and exit')
+        parser.add_argument('--workers', type=int, default=2, help='Delivery threads, each with its own SMTP connection')
+        parser.add_argument('--batch-size', type=int, default=DELIVERY_BATCH_SIZE, help='Messages claimed per batch')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            sent, failed = deliver_pending(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Sent {sent} emails, {failed} failed; queue: {outbox_stats()}'))
+            return
+
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self.work, args=(stop, options), name=f'email-outbox-{number}', daemon=True)
+            for number in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Delivering email with {options['workers']} workers; Ctrl+C to stop")
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(self.style.SUCCESS('Email outbox worker stopped'))
+
+    def work(self, stop, options):
+        try:
+            while not stop.is_set():
+                sent, failed = deliver_pending(options['batch_size'])
+                if sent or failed:
+                    self.stdout.write(f'Sent {sent} emails, {failed} failed')
+                else:
+                    stop.wait(options['interval'])
+        finally:
+            connections.close_all()
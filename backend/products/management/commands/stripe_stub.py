@@ -0,0 +1,82 @@
+# products/management/commands/stripe_stub.py
+import json
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+from django.core.management.base import BaseCommand
+
+class StubServer(ThreadingHTTPServer):
+    request_queue_size = 128  # room for a load test's burst of connections
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers POST /v1/payment_intents like Stripe, honouring Idempotency-Key"""
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        if self.path.rstrip('/') != '/v1/payment_intents':
+            return self.reply(404, {'error': {'type': 'invalid_request_error', 'message': f'Unknown path {self.path}'}})
+        params = dict(parse_qsl(body))
+
+        server = self.server
+        key = self.headers.get('Idempotency-Key')
+        with server.lock:
+            intent = server.intents.get(key) if key else None
+            if intent is None:
+                intent_id = f'pi_{secrets.token_hex(12)}'
+                intent = {
+                    'id': intent_id,
+                    'object': 'payment_intent',
+                    'amount': int(params.get('amount', 0)),
+                    'currency': params.get('currency', 'usd'),
+                    'client_secret': f'{intent_id}_secret_{secrets.token_hex(12)}',
+                    'status': 'requires_payment_method',
+                    'created': int(time.time()),
+                    'livemode': False,
+                }
+                if key:
+                    server.intents[key] = intent
+            server.created += 1
+
+        if server.latency:
+            time.sleep(server.latency)
+        self.reply(200, intent)
+
+    def reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Request-Id', f'req_{secrets.token_hex(8)}')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Run a local Stripe stand-in for offline load tests of the payment path (set STRIPE_API_BASE to its address)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=12111, help='Port to listen on')
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response, to mimic the real API')
+
+    def handle(self, *args, **options):
+        server = StubServer(('127.0.0.1', options['port']), StubHandler)
+        server.intents = {}
+        server.created = 0
+        server.lock = threading.Lock()
+        server.latency = options['latency']
+        self.stdout.write(self.style.SUCCESS(
+            f"Stripe stand-in on http://127.0.0.1:{options['port']}; run the app with STRIPE_API_BASE pointing there"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:26
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_category_brands(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    CategoryBrand = apps.get_model('products', 'CategoryBrand')
+    rows = Product.objects.values('category', 'brand').annotate(count=Count('id')).order_by()
+    CategoryBrand.objects.bulk_create([
+        CategoryBrand(category=row['category'], brand=row['brand'], product_count=row['count'])
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0016_product_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryBrand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=100)),
+                ('brand', models.CharField(max_length=100)),
+                ('product_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('category', 'brand'), name='unique_category_brand')],
+            },
+        ),
+        migrations.RunPython(populate_category_brands, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:27
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_review_totals(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('products', 'Review')
+    totals = (
+        Review.objects.filter(status='approved').values('product_id')
+        .annotate(count=Count('id'), total=Sum('rating')).order_by()
+    )
+    for row in totals:
+        Product.objects.filter(pk=row['product_id']).update(review_count=row['count'], rating_sum=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0017_categorybrand'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='review_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_review_totals, migrations.RunPython.noop),
+    ]
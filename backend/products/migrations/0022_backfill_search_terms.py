@@ -0,0 +1,68 @@
+# Generated by Django 5.2.3 on 2026-10-17 09:12
+
+import math
+import re
+from collections import Counter
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+# Frozen copy of the products.search indexing rules as of this migration, so later
+# changes to the live tokenizer or weights do not change what this migration writes
+FIELD_WEIGHTS = {
+    'title': 4.0,
+    'brand': 3.0,
+    'category': 2.0,
+    'description': 1.0,
+}
+
+MAX_TERM_LENGTH = 64
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall((text or '').lower())]
+
+
+def build_terms(SearchTerm, product):
+    terms = []
+    for field, field_weight in FIELD_WEIGHTS.items():
+        for term, count in Counter(tokenize(getattr(product, field))).items():
+            terms.append(SearchTerm(
+                product_id=product.id,
+                term=term,
+                field=field,
+                weight=field_weight * (1 + math.log(count)),
+            ))
+    return terms
+
+
+def backfill_search_terms(apps, schema_editor):
+    # Products saved since 0015 are indexed by the post_save signal; index the rest
+    Product = apps.get_model('products', 'Product')
+    SearchTerm = apps.get_model('products', 'SearchTerm')
+    products = (
+        Product.objects.filter(search_terms__isnull=True)
+        .only('id', *FIELD_WEIGHTS)
+        .order_by('id')
+    )
+    terms = []
+    for product in products.iterator(chunk_size=BATCH_SIZE):
+        terms.extend(build_terms(SearchTerm, product))
+        if len(terms) >= BATCH_SIZE * 20:
+            SearchTerm.objects.bulk_create(terms, batch_size=1000)
+            terms = []
+    SearchTerm.objects.bulk_create(terms, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0021_stripeevent'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-17 09:40
+
+from django.db import migrations
+
+SEQUENCE = 'products_product_bulk_id_seq'
+
+# Above the random 5-digit IDs Product.generate_unique_id hands out
+FIRST_ID = 100000
+
+
+def create_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'CREATE SEQUENCE IF NOT EXISTS {SEQUENCE} START WITH {FIRST_ID}')
+    schema_editor.execute(
+        f'SELECT setval(%s, GREATEST({FIRST_ID}, (SELECT COALESCE(MAX(id), 0) + 1 FROM products_product)), false)',
+        [SEQUENCE],
+    )
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP SEQUENCE IF EXISTS {SEQUENCE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0022_backfill_search_terms'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
@@ -12,6 +12,9 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, db_index=True)
     discount_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0)
     rating = models.FloatField(default=0.0, db_index=True)
+    # Running totals over approved reviews, kept in step by the Review signal handlers
+    review_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
     stock = models.IntegerField(default=0, db_index=True)
     brand = models.CharField(max_length=100, default='N/A')
     sku = models.CharField(max_length=50, default='N/A')
@@ -24,7 +27,11 @@ class Product(models.Model):
     thumbnail = models.URLField(default='XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX')
     images = models.JSONField(default=dict)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Fingerprint of the feed row the product was last imported from, so unchanged rows are skipped
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    # Products that drop out of the feed are retired rather than deleted, so their reviews survive a later return
+    is_active = models.BooleanField(default=True, db_index=True)
     
     class Meta:
         indexes = [
@@ -32,6 +39,11 @@ class Product(models.Model):
             models.Index(fields=['rating', 'price']),
             models.Index(fields=['stock', 'price']),
             models.Index(fields=['created_at']),
+            # Keyset pagination seeks on (sort key, id)
+            models.Index(fields=['price', 'id']),
+            models.Index(fields=['rating', 'id']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['title', 'id']),
         ]
     
     def __str__(self):
@@ -49,14 +61,14 @@ class Product(models.Model):
                 return random_id
     
     def update_average_rating(self):
-        """Update the product's average rating based on reviews"""
-        reviews = self.reviews.filter(status='approved')
-        if reviews.exists():
-            avg_rating = reviews.aggregate(avg=models.Avg('rating'))['avg']
-            self.rating = round(avg_rating, 1)
-        else:
-            self.rating = 0.0
-        self.save(update_fields=['rating'])
+        """Recompute the product's review totals and average rating from scratch"""
+        totals = self.reviews.filter(status='approved').aggregate(
+            count=models.Count('id'), total=models.Sum('rating')
+        )
+        self.review_count = totals['count']
+        self.rating_sum = totals['total'] or 0
+        self.rating = round(self.rating_sum / self.review_count, 1) if self.review_count else 0.0
+        self.save(update_fields=['rating', 'review_count', 'rating_sum'])
 
 class Review(models.Model):
     STATUS_CHOICES = [
@@ -89,17 +101,98 @@ class Review(models.Model):
     
     def __str__(self):
         return f"Review by {self.reviewer_name} for {self.product.title}"
-    
-    def save(self, *args, **kwargs):
-        is_new = self.pk is None
-        super().save(*args, **kwargs)
-        
-        # Update product rating if this is a new approved review
-        if is_new and self.status == 'approved':
-            self.product.update_average_rating()
 
 class Dimension(models.Model):
     product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='dimensions')
     width = models.FloatField()
     height = models.FloatField()
-    depth = models.FloatField()
\ No newline at end of file
+    depth = models.FloatField()
+
+class SearchTerm(models.Model):
+    """Inverted index entry: one token found in one searchable field of a product"""
+    FIELD_CHOICES = [
+        ('title', 'Title'),
+        ('brand', 'Brand'),
+        ('category', 'Category'),
+        ('description', 'Description'),
+    ]
+    
+    term = models.CharField(max_length=64, db_index=True)
+    product = models.ForeignKey(Product, related_name='search_terms', on_delete=models.CASCADE)
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES)
+    weight = models.FloatField()
+    
+    def __str__(self):
+        return f"{self.term} ({self.field}) -> {self.product_id}"
+
+class CategoryBrand(models.Model):
+    """Maintained dictionary of (category, brand) pairs in use, with how many products each has"""
+    category = models.CharField(max_length=100)
+    brand = models.CharField(max_length=100)
+    product_count = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'brand'], name='unique_category_brand'),
+        ]
+    
+    def __str__(self):
+        return f"{self.category} / {self.brand} ({self.product_count})"
+
+class OutboxEmail(models.Model):
+    """Email queued by a request and delivered later by the outbox workers"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    subject = models.CharField(max_length=255)
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField(default=list)
+    text_body = models.TextField(blank=True)
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    # When a worker may next pick the message up; also pushed ahead while one is sending it
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
+class StripeEvent(models.Model):
+    """Verified Stripe webhook event, stored on receipt and processed by the event workers"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    ]
+    
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    # Events of one payment intent are processed in the order Stripe created them
+    payment_intent_id = models.CharField(max_length=255, blank=True, db_index=True)
+    created = models.IntegerField()  # Stripe's unix timestamp
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_id} {self.type} ({self.status})"
@@ -0,0 +1,158 @@
+# backend/products/outbox.py
+
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .background import BackgroundWorker
+from .models import OutboxEmail
+
+# A message that keeps failing is given up on after this many tries
+MAX_ATTEMPTS = 8
+
+# Retry delays double from BACKOFF_BASE up to BACKOFF_MAX, with +/-10% jitter
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=1)
+
+# How long a claimed message stays invisible to other workers; a crashed worker's claims expire
+CLAIM_LEASE = timedelta(minutes=5)
+
+# Messages claimed, and sent over one SMTP connection, at a time
+DELIVERY_BATCH_SIZE = 50
+
+
+def enqueue_email(subject, recipients, html_body='', text_body='', from_email=None):
+    """Queue an email for delivery once the current transaction commits"""
+    message = OutboxEmail.objects.create(
+        subject=subject,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipients),
+        html_body=html_body,
+        text_body=text_body,
+    )
+    transaction.on_commit(kick_workers)
+    return message
+
+
+async def aenqueue_email(subject, recipients, html_body='', text_body='', from_email=None):
+    """Async version of enqueue_email, for callers outside a transaction"""
+    message = await OutboxEmail.objects.acreate(
+        subject=subject,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipients),
+        html_body=html_body,
+        text_body=text_body,
+    )
+    kick_workers()
+    return message
+
+
+def backoff(attempts):
+    """Delay before retry number `attempts`"""
+    delay = min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX)
+    return delay * random.uniform(0.9, 1.1)
+
+
+def claim_batch(limit=DELIVERY_BATCH_SIZE):
+    """Lease up to `limit` due messages to this worker"""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        OutboxEmail.objects.filter(id__in=ids).update(next_attempt_at=now + CLAIM_LEASE)
+    return list(OutboxEmail.objects.filter(id__in=ids).order_by('id'))
+
+
+def _record_failure(message, error):
+    attempts = message.attempts + 1
+    fields = {'attempts': attempts, 'last_error': str(error)[:2000]}
+    if attempts >= MAX_ATTEMPTS:
+        fields['status'] = 'failed'
+    else:
+        fields['next_attempt_at'] = timezone.now() + backoff(attempts)
+    OutboxEmail.objects.filter(pk=message.pk).update(**fields)
+
+
+def deliver(messages):
+    """Send claimed messages over one SMTP connection; returns (sent, failed)"""
+    if not messages:
+        return 0, 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        for message in messages:
+            _record_failure(message, e)
+        return 0, len(messages)
+
+    sent = failed = 0
+    try:
+        for message in messages:
+            email = EmailMultiAlternatives(
+                subject=message.subject,
+                body=message.text_body,
+                from_email=message.from_email,
+                to=message.recipients,
+                connection=connection,
+            )
+            if message.html_body:
+                email.attach_alternative(message.html_body, 'text/html')
+            try:
+                email.send()
+            except Exception as e:
+                _record_failure(message, e)
+                failed += 1
+            else:
+                OutboxEmail.objects.filter(pk=message.pk).update(
+                    status='sent', sent_at=timezone.now(), attempts=F('attempts') + 1, last_error=''
+                )
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def deliver_pending(batch_size=DELIVERY_BATCH_SIZE):
+    """Drain every due message; returns (sent, failed)"""
+    sent = failed = 0
+    while True:
+        batch = claim_batch(batch_size)
+        if not batch:
+            return sent, failed
+        batch_sent, batch_failed = deliver(batch)
+        sent += batch_sent
+        failed += batch_failed
+
+
+def outbox_stats():
+    """Queue depth and delivery counters"""
+    by_status = dict(OutboxEmail.objects.values_list('status').annotate(count=Count('id')).order_by())
+    pending = OutboxEmail.objects.filter(status='pending')
+    oldest = pending.aggregate(oldest=Min('created_at'))['oldest']
+    return {
+        'pending': by_status.get('pending', 0),
+        'due': pending.filter(next_attempt_at__lte=timezone.now()).count(),
+        'retrying': pending.filter(attempts__gt=0).count(),
+        'sent': by_status.get('sent', 0),
+        'failed': by_status.get('failed', 0),
+        'oldest_pending_seconds': round((timezone.now() - oldest).total_seconds(), 1) if oldest else None,
+    }
+
+
+def _drain():
+    deliver_pending()
+    return OutboxEmail.objects.filter(status='pending').aggregate(at=Min('next_attempt_at'))['at']
+
+
+# In-process delivery, for deployments without a run_email_outbox worker
+worker = BackgroundWorker('email-outbox', _drain, 'EMAIL_OUTBOX_THREADS')
+kick_workers = worker.kick
@@ -0,0 +1,149 @@
+# backend/products/pagination.py
+
+import base64
+import binascii
+import json
+import math
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# Sort keys that can back a keyset cursor; each one is paired with `id` as a tiebreak
+CURSOR_SORT_FIELDS = ('id', 'price', 'rating', 'created_at', 'title')
+
+MAX_CURSOR_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token is malformed or does not match the requested ordering"""
+
+
+def _dump_value(field, value):
+    if field == 'price':
+        return str(value)
+    if field == 'created_at':
+        return value.isoformat()
+    return value
+
+
+def _load_value(field, raw):
+    try:
+        if field == 'price':
+            value = Decimal(raw)
+            if not value.is_finite():
+                raise InvalidCursor('Invalid cursor')
+            return value
+        if field == 'created_at':
+            value = parse_datetime(raw)
+            if value is None:
+                raise InvalidCursor('Invalid cursor')
+            return value
+        if field == 'id':
+            return int(raw)
+        if field == 'rating':
+            value = float(raw)
+            if not math.isfinite(value):
+                raise InvalidCursor('Invalid cursor')
+            return value
+        return str(raw)
+    except (TypeError, ValueError, OverflowError, InvalidOperation):
+        raise InvalidCursor('Invalid cursor')
+
+
+def encode_cursor(sort_field, descending, row, backwards=False):
+    """Build an opaque cursor pointing at `row` (a product values() row) in the given ordering"""
+    payload = {
+        's': sort_field,
+        'd': descending,
+        'v': _dump_value(sort_field, row[sort_field]),
+        'id': row['id'],
+        'b': backwards,
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, sort_field, descending):
+    """Decode a cursor token, checking it was issued for the same ordering"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise InvalidCursor('Invalid cursor')
+
+    if not isinstance(payload, dict) or payload.get('s') != sort_field or payload.get('d') != descending:
+        raise InvalidCursor('Cursor does not match the requested ordering')
+
+    try:
+        last_id = int(payload['id'])
+    except (KeyError, TypeError, ValueError, OverflowError):
+        raise InvalidCursor('Invalid cursor')
+
+    return _load_value(sort_field, payload.get('v')), last_id, bool(payload.get('b'))
+
+
+def _cursor_window(queryset, sort_field, descending, cursor, page_size):
+    """The ordered slice holding one keyset page plus a look-ahead row: (queryset, sort_field, backwards)"""
+    if sort_field not in CURSOR_SORT_FIELDS:
+        # Relevance is computed per query, so there is no column to seek on
+        raise InvalidCursor('Cursor pagination is not available for this sort order; use page numbers')
+
+    backwards = False
+    if cursor:
+        value, last_id, backwards = decode_cursor(cursor, sort_field, descending)
+        # Walking backwards means scanning the opposite direction and flipping the rows afterwards
+        walk_descending = descending != backwards
+        op = 'lt' if walk_descending else 'gt'
+        if sort_field == 'id':
+            queryset = queryset.filter(**{f'id__{op}': last_id})
+        else:
+            queryset = queryset.filter(
+                Q(**{f'{sort_field}__{op}': value}) |
+                Q(**{sort_field: value, f'id__{op}': last_id})
+            )
+    else:
+        walk_descending = descending
+
+    prefix = '-' if walk_descending else ''
+    ordering = [f'{prefix}id'] if sort_field == 'id' else [f'{prefix}{sort_field}', f'{prefix}id']
+
+    # One extra row tells us whether another page exists without a count()
+    return queryset.order_by(*ordering)[:page_size + 1], sort_field, backwards
+
+
+def _cursor_page(rows, sort_field, descending, cursor, backwards, page_size):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+
+    if backwards:
+        next_cursor = encode_cursor(sort_field, descending, rows[-1])
+        previous_cursor = encode_cursor(sort_field, descending, rows[0], backwards=True) if has_more else None
+    else:
+        next_cursor = encode_cursor(sort_field, descending, rows[-1]) if has_more else None
+        previous_cursor = encode_cursor(sort_field, descending, rows[0], backwards=True) if cursor else None
+
+    return rows, next_cursor, previous_cursor
+
+
+def paginate_by_cursor(queryset, sort_field, descending, cursor, page_size):
+    """
+    Fetch one keyset page of `queryset`, a values() queryset holding `sort_field`.
+
+    Rows are located with a `(sort_field, id)` range predicate instead of an
+    OFFSET, so every page costs the same index seek regardless of depth.
+    Returns `(rows, next_cursor, previous_cursor)`.
+    """
+    window, sort_field, backwards = _cursor_window(queryset, sort_field, descending, cursor, page_size)
+    return _cursor_page(list(window), sort_field, descending, cursor, backwards, page_size)
+
+
+async def apaginate_by_cursor(queryset, sort_field, descending, cursor, page_size):
+    """Async version of paginate_by_cursor"""
+    window, sort_field, backwards = _cursor_window(queryset, sort_field, descending, cursor, page_size)
+    return _cursor_page([row async for row in window], sort_field, descending, cursor, backwards, page_size)
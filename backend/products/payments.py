@@ -0,0 +1,109 @@
+# backend/products/payments.py
+
+import hashlib
+import json
+import os
+from functools import cache
+
+from django.conf import settings
+from django.core.cache import cache as django_cache
+
+# How long a created intent is handed back for a repeated checkout request
+PAYMENT_INTENT_CACHE_TTL = 60 * 30
+
+
+@cache
+def stripe_api():
+    """The stripe module, imported and given the API key on first use"""
+    import stripe
+    stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+    return stripe
+
+
+@cache
+def stripe_client():
+    """
+    Per-process StripeClient sharing one pooled requests session.
+
+    Connections to the Stripe API stay open between calls, so a payment
+    request does not pay for a TLS handshake. The `*_async` methods go
+    through an httpx client with its own connection pool, which belongs to
+    the event loop that first uses it (one per ASGI worker). STRIPE_API_BASE
+    points the client at a local stand-in such as stripe-mock or
+    `manage.py stripe_stub`.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    stripe = stripe_api()
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.STRIPE_HTTP_POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return stripe.StripeClient(
+        os.getenv('STRIPE_SECRET_KEY') or 'sk_test_local',
+        http_client=stripe.RequestsClient(
+            session=session, timeout=30, async_fallback_client=stripe.HTTPXClient(timeout=30)
+        ),
+        base_addresses={'api': settings.STRIPE_API_BASE} if settings.STRIPE_API_BASE else {},
+        max_network_retries=2,
+    )
+
+
+def checkout_key(checkout_id, amount, currency, cart_items=()):
+    """Idempotency key for one checkout: the same cart and amount map to the same payment intent"""
+    items = sorted(
+        (str(item.get('id', item.get('name', ''))), int(item.get('quantity', 1)))
+        for item in cart_items
+    )
+    raw = json.dumps([checkout_id, amount, currency, items])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _intent_params(amount, currency):
+    return {'amount': amount, 'currency': currency, 'automatic_payment_methods': {'enabled': True}}
+
+
+def _intent_result(intent):
+    return {'id': intent.id, 'client_secret': intent.client_secret}
+
+
+def create_payment_intent(amount, currency='usd', checkout_id=None, cart_items=()):
+    """
+    Create a payment intent, returning {'id', 'client_secret'}.
+
+    With a `checkout_id` the request is idempotent: Stripe is given a key
+    derived from the checkout and cart, and the result is cached so a
+    double-click or retry gets the same intent without a remote call.
+    """
+    params = _intent_params(amount, currency)
+    if checkout_id is None:
+        return _intent_result(stripe_client().payment_intents.create(params=params))
+
+    key = checkout_key(checkout_id, amount, currency, cart_items)
+    cached = django_cache.get(f'payment_intent:{key}')
+    if cached is not None:
+        return cached
+
+    result = _intent_result(stripe_client().payment_intents.create(params=params, options={'idempotency_key': key}))
+    django_cache.set(f'payment_intent:{key}', result, PAYMENT_INTENT_CACHE_TTL)
+    return result
+
+
+async def acreate_payment_intent(amount, currency='usd', checkout_id=None, cart_items=()):
+    """Async version of create_payment_intent; the Stripe call holds no thread while it waits"""
+    params = _intent_params(amount, currency)
+    client = stripe_client()
+    if checkout_id is None:
+        return _intent_result(await client.payment_intents.create_async(params=params))
+
+    key = checkout_key(checkout_id, amount, currency, cart_items)
+    cached = await django_cache.aget(f'payment_intent:{key}')
+    if cached is not None:
+        return cached
+
+    result = _intent_result(
+        await client.payment_intents.create_async(params=params, options={'idempotency_key': key})
+    )
+    await django_cache.aset(f'payment_intent:{key}', result, PAYMENT_INTENT_CACHE_TTL)
+    return result
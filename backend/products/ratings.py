@@ -0,0 +1,37 @@
+# backend/products/ratings.py
+
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast, Round
+from django.db.models.lookups import GreaterThan
+
+from .models import Product
+
+
+def review_contribution(status, rating):
+    """(count, sum) a review adds to its product's totals; only approved reviews count"""
+    return (1, rating) if status == 'approved' else (0, 0)
+
+
+def apply_rating_delta(product_id, count_delta, sum_delta):
+    """
+    Shift a product's approved-review totals and re-derive its average rating.
+
+    A single UPDATE with F() expressions, so the cost does not depend on how
+    many reviews the product has and concurrent reviews cannot lose updates.
+    """
+    if not count_delta and not sum_delta:
+        return
+    new_count = F('review_count') + count_delta
+    new_sum = F('rating_sum') + sum_delta
+    Product.objects.filter(pk=product_id).update(
+        review_count=new_count,
+        rating_sum=new_sum,
+        rating=Case(
+            When(
+                GreaterThan(new_count, 0),
+                then=Round(Cast(new_sum, FloatField()) / Cast(new_count, FloatField()), 1),
+            ),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+    )
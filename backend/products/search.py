@@ -0,0 +1,104 @@
+# backend/products/search.py
+
+import math
+import re
+from collections import Counter
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+
+from .models import SearchTerm
+
+# Relative importance of a hit in each indexed field
+FIELD_WEIGHTS = {
+    'title': 4.0,
+    'brand': 3.0,
+    'category': 2.0,
+    'description': 1.0,
+}
+
+SEARCH_FIELDS = tuple(FIELD_WEIGHTS)
+
+# Longer queries are truncated; each token adds a conditional aggregate to the lookup
+MAX_QUERY_TOKENS = 8
+
+MAX_TERM_LENGTH = SearchTerm._meta.get_field('term').max_length
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens"""
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall((text or '').lower())]
+
+
+def _query_tokens(query):
+    # Deduplicate while keeping the order the user typed
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TOKENS]
+
+
+def build_terms(product):
+    """Index entries for one product, with log-damped term frequency per field"""
+    terms = []
+    for field, field_weight in FIELD_WEIGHTS.items():
+        for term, count in Counter(tokenize(getattr(product, field))).items():
+            terms.append(SearchTerm(
+                product_id=product.id,
+                term=term,
+                field=field,
+                weight=field_weight * (1 + math.log(count)),
+            ))
+    return terms
+
+
+def index_products(products):
+    """Replace the index entries of the given products"""
+    products = list(products)
+    if not products:
+        return
+    with transaction.atomic():
+        SearchTerm.objects.filter(product_id__in=[product.id for product in products]).delete()
+        SearchTerm.objects.bulk_create(
+            [term for product in products for term in build_terms(product)],
+            batch_size=1000,
+        )
+
+
+def index_product(product):
+    """Replace the index entries of a single product"""
+    index_products([product])
+
+
+def _matching_terms(tokens, fields):
+    """Per-product groups of index rows in which every token prefixes some indexed term"""
+    hits = {
+        f'hit_{i}': Max(Case(When(term__startswith=token, then=Value(1)), default=Value(0), output_field=IntegerField()))
+        for i, token in enumerate(tokens)
+    }
+    return (
+        SearchTerm.objects
+        .filter(field__in=fields)
+        .filter(reduce(or_, (Q(term__startswith=token) for token in tokens)))
+        .values('product_id')
+        .annotate(rank=Sum('weight'), **hits)
+        .filter(**{name: 1 for name in hits})
+    )
+
+
+def search_products(products, query, fields=SEARCH_FIELDS):
+    """Restrict `products` to those matching every token of `query` in `fields`"""
+    tokens = _query_tokens(query)
+    if not tokens:
+        return products.none()
+    return products.filter(id__in=_matching_terms(tokens, fields).values('product_id'))
+
+
+def search_rank(query, fields=SEARCH_FIELDS):
+    """Relevance score expression for annotating a Product queryset already restricted by search_products()"""
+    tokens = _query_tokens(query)
+    if not tokens:
+        return Value(0.0)
+    ranked = _matching_terms(tokens, fields).filter(product_id=OuterRef('id')).values('rank')
+    return Subquery(ranked[:1])
@@ -29,7 +29,9 @@ class ProductSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Product
-        fields = '__all__'
+        # Feed fingerprint and the approved-review totals behind rating are internal bookkeeping
+        exclude = ['content_hash', 'review_count', 'rating_sum']
+        read_only_fields = ['is_active']
         
     def create(self, validated_data):
         # Handle dimensions and reviews
@@ -69,4 +71,46 @@ class ProductSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
 
         instance.save()
-        return instance
\ No newline at end of file
+        return instance
+
+# Nested relations a list client has to ask for explicitly with ?expand=
+PRODUCT_RELATIONS = ('reviews', 'dimensions')
+
+# Columns left out of the lean card projection unless named in ?fields=
+HEAVY_PRODUCT_FIELDS = ('description',)
+
+
+def sparse_fields(params):
+    """
+    Resolve ?fields= and ?expand= into the set of Product fields to render.
+
+    Returns None when neither parameter is given, meaning the full
+    ProductSerializer representation.
+    """
+    fields_param = params.get('fields')
+    expand_param = params.get('expand')
+    if fields_param is None and expand_param is None:
+        return None
+
+    scalar_fields = [f.name for f in Product._meta.concrete_fields if f.name not in ProductSerializer.Meta.exclude]
+    if fields_param:
+        requested = {name.strip() for name in fields_param.split(',')}
+        selected = {name for name in scalar_fields + list(PRODUCT_RELATIONS) if name in requested}
+    else:
+        selected = {name for name in scalar_fields if name not in HEAVY_PRODUCT_FIELDS}
+
+    if expand_param:
+        selected.update(name.strip() for name in expand_param.split(',') if name.strip() in PRODUCT_RELATIONS)
+
+    selected.add('id')
+    return selected
+
+
+class ProductListSerializer(ProductSerializer):
+    """ProductSerializer limited to the fields chosen by sparse_fields()"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
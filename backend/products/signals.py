@@ -0,0 +1,111 @@
+# backend/products/signals.py
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .caching import CATALOG_NAMESPACE, DICTIONARY_NAMESPACE, bump_namespaces, product_namespace
+from .counts import invalidate_product_counts
+from .dictionary import DICTIONARY_TRIGGER_FIELDS, adjust_category_brand
+from .ratings import apply_rating_delta, review_contribution
+from .models import Dimension, Product, Review
+from .search import SEARCH_FIELDS, index_product
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_written(sender, instance, **kwargs):
+    """Invalidate cached listing counts and responses whenever a product changes"""
+    invalidate_product_counts()
+    bump_namespaces(CATALOG_NAMESPACE, DICTIONARY_NAMESPACE, product_namespace(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Review)
+@receiver([post_save, post_delete], sender=Dimension)
+def product_relation_written(sender, instance, **kwargs):
+    """Reviews and dimensions are nested in product responses, so they invalidate them too"""
+    bump_namespaces(CATALOG_NAMESPACE, product_namespace(instance.product_id))
+
+
+@receiver(post_save, sender=Product)
+def reindex_product(sender, instance, update_fields=None, **kwargs):
+    """Keep the search index in step with the product's searchable fields"""
+    if update_fields is not None and not set(update_fields) & set(SEARCH_FIELDS):
+        return
+    index_product(instance)
+
+
+@receiver(pre_save, sender=Product)
+def remember_dictionary_pair(sender, instance, update_fields=None, **kwargs):
+    """Look up the stored (category, brand) so post_save can move the product between pairs"""
+    if update_fields is not None and not set(update_fields) & set(DICTIONARY_TRIGGER_FIELDS):
+        instance._dictionary_previous = False
+        return
+    stored = (
+        Product.objects.filter(pk=instance.pk).values_list(*DICTIONARY_TRIGGER_FIELDS).first()
+        if instance.pk else None
+    )
+    # Retired products count towards no pair
+    instance._dictionary_previous = stored[:-1] if stored and stored[-1] else None
+
+
+@receiver(post_save, sender=Product)
+def update_dictionary_on_save(sender, instance, **kwargs):
+    previous = getattr(instance, '_dictionary_previous', None)
+    if previous is False:
+        return
+    current = (instance.category, instance.brand) if instance.is_active else None
+    if previous == current:
+        return
+    if previous is not None:
+        adjust_category_brand(*previous, -1)
+    if current is not None:
+        adjust_category_brand(*current, 1)
+
+
+@receiver(post_delete, sender=Product)
+def update_dictionary_on_delete(sender, instance, **kwargs):
+    if instance.is_active:
+        adjust_category_brand(instance.category, instance.brand, -1)
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_contribution(sender, instance, **kwargs):
+    """Look up what the stored review contributed so post_save only applies the difference"""
+    instance._rating_previous = (
+        Review.objects.filter(pk=instance.pk).values_list('product_id', 'status', 'rating').first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_review_save(sender, instance, **kwargs):
+    count, total = review_contribution(instance.status, instance.rating)
+    previous = getattr(instance, '_rating_previous', None)
+    if previous is None:
+        changed = [(instance.product_id, count, total)]
+    else:
+        previous_product_id, previous_status, previous_rating = previous
+        previous_count, previous_total = review_contribution(previous_status, previous_rating)
+        if previous_product_id == instance.product_id:
+            changed = [(instance.product_id, count - previous_count, total - previous_total)]
+        else:
+            changed = [
+                (previous_product_id, -previous_count, -previous_total),
+                (instance.product_id, count, total),
+            ]
+
+    changed = [(product_id, dc, ds) for product_id, dc, ds in changed if dc or ds]
+    for product_id, count_delta, sum_delta in changed:
+        apply_rating_delta(product_id, count_delta, sum_delta)
+        bump_namespaces(CATALOG_NAMESPACE, product_namespace(product_id))
+    if changed:
+        # Ratings feed the min_rating/max_rating filters
+        invalidate_product_counts()
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_review_delete(sender, instance, **kwargs):
+    count, total = review_contribution(instance.status, instance.rating)
+    if count:
+        apply_rating_delta(instance.product_id, -count, -total)
+        bump_namespaces(CATALOG_NAMESPACE, product_namespace(instance.product_id))
+        invalidate_product_counts()
@@ -0,0 +1,167 @@
+# backend/products/stripe_events.py
+
+import logging
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .background import BackgroundWorker
+from .models import StripeEvent
+from .outbox import backoff
+
+logger = logging.getLogger(__name__)
+
+# An event that keeps failing is parked as failed after this many tries; replay_stripe_events requeues it
+MAX_ATTEMPTS = 8
+
+# How long claimed events stay invisible to other workers
+CLAIM_LEASE = timedelta(minutes=5)
+
+EVENT_BATCH_SIZE = 100
+
+
+def handle_payment_succeeded(payment_intent):
+    logger.info('Payment succeeded: %s', payment_intent['id'])
+
+
+def handle_payment_failed(payment_intent):
+    logger.info('Payment failed: %s', payment_intent['id'])
+
+
+# Event type -> handler receiving the event's data.object; other types are stored and marked processed
+HANDLERS = {
+    'payment_intent.succeeded': handle_payment_succeeded,
+    'payment_intent.payment_failed': handle_payment_failed,
+}
+
+
+def payment_intent_of(event):
+    """ID of the payment intent an event concerns, or '' when it concerns none"""
+    obj = event.get('data', {}).get('object', {})
+    if obj.get('object') == 'payment_intent':
+        return obj.get('id', '')
+    payment_intent = obj.get('payment_intent') or ''
+    return payment_intent if isinstance(payment_intent, str) else payment_intent.get('id', '')
+
+
+def record_event(event):
+    """Store a verified event once; returns False when Stripe already delivered it"""
+    try:
+        with transaction.atomic():
+            StripeEvent.objects.create(
+                event_id=event['id'],
+                type=event['type'],
+                payment_intent_id=payment_intent_of(event),
+                created=event.get('created', 0),
+                payload=event,
+            )
+    except IntegrityError:
+        return False
+    transaction.on_commit(kick_workers)
+    return True
+
+
+def claim_events(limit=EVENT_BATCH_SIZE):
+    """
+    Lease up to `limit` due events, oldest first.
+
+    A payment intent with an earlier event waiting on a retry (or leased by
+    another worker) is skipped entirely, so its events never run out of order.
+    """
+    now = timezone.now()
+    pending = StripeEvent.objects.filter(status='pending')
+    with transaction.atomic():
+        busy_intents = (
+            pending.filter(next_attempt_at__gt=now).exclude(payment_intent_id='')
+            .values('payment_intent_id')
+        )
+        ids = list(
+            pending.select_for_update(skip_locked=True)
+            .filter(next_attempt_at__lte=now)
+            .exclude(payment_intent_id__in=busy_intents)
+            .order_by('created', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        StripeEvent.objects.filter(id__in=ids).update(next_attempt_at=now + CLAIM_LEASE)
+    return list(StripeEvent.objects.filter(id__in=ids).order_by('created', 'id'))
+
+
+def process_event(event):
+    """Run an event's handler and mark it processed; raises if the handler fails"""
+    handler = HANDLERS.get(event.type)
+    with transaction.atomic():
+        # Re-check under the row lock so a replayed or double-claimed event is handled once
+        locked = StripeEvent.objects.select_for_update().filter(pk=event.pk, status='pending').first()
+        if locked is None:
+            return
+        if handler is not None:
+            handler(event.payload['data']['object'])
+        StripeEvent.objects.filter(pk=event.pk).update(
+            status='processed', processed_at=timezone.now(), attempts=event.attempts + 1, last_error=''
+        )
+
+
+def _record_failure(event, error):
+    attempts = event.attempts + 1
+    fields = {'attempts': attempts, 'last_error': str(error)[:2000]}
+    if attempts >= MAX_ATTEMPTS:
+        fields['status'] = 'failed'
+    else:
+        fields['next_attempt_at'] = timezone.now() + backoff(attempts)
+    StripeEvent.objects.filter(pk=event.pk).update(**fields)
+
+
+def process_events(events):
+    """Process claimed events in order; returns (processed, failed)"""
+    processed = failed = 0
+    blocked = set()
+    held_back = []
+    for event in events:
+        if event.payment_intent_id and event.payment_intent_id in blocked:
+            # An earlier event of this intent failed; wait for it
+            held_back.append(event.pk)
+            continue
+        try:
+            process_event(event)
+        except Exception as e:
+            logger.exception('Stripe event %s failed', event.event_id)
+            _record_failure(event, e)
+            failed += 1
+            if event.payment_intent_id:
+                blocked.add(event.payment_intent_id)
+        else:
+            processed += 1
+
+    # Release held-back events; the failed event's pending retry keeps their intent skipped until it succeeds
+    if held_back:
+        StripeEvent.objects.filter(pk__in=held_back).update(next_attempt_at=timezone.now())
+    return processed, failed
+
+
+def process_pending(batch_size=EVENT_BATCH_SIZE):
+    """Drain every due event; returns (processed, failed)"""
+    processed = failed = 0
+    while True:
+        events = claim_events(batch_size)
+        if not events:
+            return processed, failed
+        batch_processed, batch_failed = process_events(events)
+        processed += batch_processed
+        failed += batch_failed
+
+
+def requeue_events(events):
+    """Put stored events back in the queue with a fresh attempt budget; returns how many"""
+    return events.update(status='pending', attempts=0, next_attempt_at=timezone.now(), last_error='')
+
+
+def _drain():
+    process_pending()
+    return StripeEvent.objects.filter(status='pending').aggregate(at=Min('next_attempt_at'))['at']
+
+
+# In-process processing, for deployments without a separate worker
+worker = BackgroundWorker('stripe-events', _drain, 'STRIPE_EVENT_THREADS')
+kick_workers = worker.kick
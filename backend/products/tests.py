@@ -1,3 +1,1184 @@
-from django.test import TestCase
+import asyncio
+import base64
+import contextlib
+import csv
+import gzip
+import hashlib
+import hmac
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from cachetools import TTLCache
+from django.apps import apps as django_apps
+from django.core import mail
+from django.core.management import call_command
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.http import Http404, QueryDict
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+
+from backend import counters, firebase_tokens, urls
+from backend.compression import compression_stats
+from backend.frontend import PrecompressedStaticFilesStorage, spa_shell, static_file
+from backend.middleware import resolve_user_role
+from backend.shared_cache import SharedMemoryCache, default_location
+from backend.startup import DEFERRED_MODULES, profile_boot
+from . import async_views, payments, stripe_events, views, warmup
+from .bulk import BulkWrite
+from .caching import CATALOG_NAMESPACE, bump_namespaces, cache_stats
+from .counts import count_products
+from .fast_serializers import product_values, serialize_products
+from .filters import filter_products, filter_signature
+from .dictionary import rebuild_dictionary
+from .management.commands.stripe_stub import StubHandler, StubServer
+from .models import CategoryBrand, Dimension, OutboxEmail, Product, Review, SearchTerm, StripeEvent
+from .outbox import deliver_pending, enqueue_email, outbox_stats
+from .renderers import render_json
+from .serializers import ProductListSerializer, sparse_fields
+
+# Generous enough for a loaded CI box; the Google client stack alone used to blow through it
+STARTUP_BUDGET_SECONDS = 3.0
+
+
+class StartupTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.elapsed, cls.imports, cls.modules = profile_boot()
+
+    def test_integrations_load_lazily(self):
+        for name in DEFERRED_MODULES:
+            self.assertNotIn(name, self.modules)
+
+    def test_boot_within_budget(self):
+        self.assertLess(self.elapsed, STARTUP_BUDGET_SECONDS)
+
+
+def feed_item(product_id, **overrides):
+    item = {
+        'id': product_id, 'title': f'Feed product {product_id}', 'category': 'phones', 'price': 9.99,
+        'thumbnail': 'https://cdn.example.com/t.png', 'images': [], 'description': 'From the feed',
+        'availabilityStatus': 'In Stock', 'discountPercentage': 1.5, 'warrantyInformation': '1 year', 'stock': 3,
+        'weight': 1.0, 'rating': 4.9, 'brand': 'Acme', 'sku': f'SKU-{product_id}', 'shippingInformation': 'Ships fast',
+        'minimumOrderQuantity': 1, 'returnPolicy': '30 days', 'dimensions': {'width': 1, 'height': 2, 'depth': 3},
+        'reviews': [],
+    }
+    item.update(overrides)
+    return item
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Repeated prices and ratings, so pages break inside runs of equal sort keys
+        for number in range(25):
+            Product.objects.create(
+                title=f'Product {number % 7}', description='', category='phones',
+                price=Decimal(number % 5), rating=number % 3,
+            )
+
+    def walk(self, params):
+        """Every page forwards, then backwards from the last, as lists of ids"""
+        pages = []
+        response = self.client.get('/api/products/', {**params, 'pagination': 'cursor', 'page_size': 4}).json()
+        pages.append([product['id'] for product in response['results']])
+        while response['next']:
+            response = self.client.get('/api/products/', {**params, 'cursor': response['next'], 'page_size': 4}).json()
+            pages.append([product['id'] for product in response['results']])
+        backwards = [pages[-1]]
+        while response['previous']:
+            response = self.client.get('/api/products/', {**params, 'cursor': response['previous'], 'page_size': 4}).json()
+            backwards.append([product['id'] for product in response['results']])
+        return pages, backwards[::-1]
+
+    def test_cursor_round_trip(self):
+        for sort in ('id', 'price', 'rating', 'title', 'created_at'):
+            for order in ('asc', 'desc'):
+                params = {'sort': sort, 'order': order}
+                pages, backwards = self.walk(params)
+                expected = [product['id'] for product in self.client.get('/api/products/', {**params, 'page_size': 25}).json()['results']]
+                self.assertEqual(sum(pages, []), expected, params)
+                self.assertEqual(backwards, pages, params)
+
+    def test_bad_cursors_are_rejected(self):
+        def token(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+        
+        bad = {
+            'price': ['not base64!', token([1]), token({'s': 'price', 'd': True, 'v': 'NaN', 'id': 1}),
+                      token({'s': 'price', 'd': True, 'v': 'Infinity', 'id': 1}),
+                      token({'s': 'price', 'd': True, 'v': '1.00', 'id': 1e400}),
+                      token({'s': 'rating', 'd': True, 'v': 1.0, 'id': 1})],
+            'rating': ['eyJzIjoicmF0aW5nIiwiZCI6dHJ1ZSwidiI6TmFOLCJpZCI6MX0',  # {"s":"rating","d":true,"v":NaN,"id":1}
+                       token({'s': 'rating', 'd': True, 'v': float('inf'), 'id': 1}),
+                       token({'s': 'rating', 'd': True, 'v': [], 'id': 1})],
+            'created_at': [token({'s': 'created_at', 'd': True, 'v': 'yesterday', 'id': 1})],
+        }
+        for sort, cursors in bad.items():
+            for cursor in cursors:
+                response = self.client.get('/api/products/', {'sort': sort, 'cursor': cursor})
+                self.assertEqual(response.status_code, 400, (sort, cursor))
+
+
+class ProductCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for number in range(5):
+            Product.objects.create(title=f'Phone {number}', description='', category='phones', price=Decimal('9.99'), stock=number)
+
+    def count(self, query, **kwargs):
+        params = QueryDict(query)
+        return count_products(filter_products(params), filter_signature(params), **kwargs)
+
+    def test_counts_are_cached_per_filter_set_until_a_write(self):
+        self.assertEqual(self.count('category=phones&in_stock=true'), (4, False))
+        # Same filters in another order, with paging: no query
+        with self.assertNumQueries(0):
+            self.assertEqual(self.count('page=3&in_stock=true&category=phones&in_stock=true'), (4, False))
+        
+        Product.objects.create(title='Phone 5', description='', category='phones', price=Decimal('9.99'), stock=1)
+        self.assertEqual(self.count('category=phones&in_stock=true'), (5, False))
+
+    @override_settings(PRODUCT_COUNT_ESTIMATE_THRESHOLD=1000)
+    def test_large_results_can_use_the_planner_estimate(self):
+        with mock.patch('products.counts.estimate_count', return_value=25000):
+            self.assertEqual(self.count('category=phones', estimate=True), (25000, True))
+            # Not cached: the next exact count scans
+            self.assertEqual(self.count('category=phones'), (5, False))
+        with mock.patch('products.counts.estimate_count', return_value=400):
+            self.assertEqual(self.count('category=laptops', estimate=True), (0, False))
+        
+        response = self.client.get('/api/products/', {'count': 'estimated'}).json()
+        # SQLite has no planner estimate, so this is exact
+        self.assertEqual((response['count'], response['count_is_estimate']), (5, False))
+
+
+class ProductFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for title, category, brand, price, rating, stock, discount in (
+            ('Phone A', 'phones', 'Acme', '99.00', 4.5, 3, '0'),
+            ('Phone B', 'phones', 'Bolt', '149.00', 3.2, 0, '10'),
+            ('Phone C', 'phones', 'Acme', '310.00', 4.9, 1, '0'),
+            ('Laptop', 'laptops', 'Acme', '999.00', 2.0, 5, '5'),
+        ):
+            Product.objects.create(
+                title=title, description='', category=category, brand=brand, price=Decimal(price),
+                rating=rating, stock=stock, discount_percentage=Decimal(discount),
+            )
+
+    def test_facets_follow_the_listing_filters(self):
+        facets = self.client.get('/api/products/facets/', {'category': 'phones'}).json()
+        self.assertEqual(facets['count'], 3)
+        self.assertEqual(facets['categories'], [{'value': 'phones', 'count': 3}])
+        self.assertEqual(facets['brands'], [{'value': 'Acme', 'count': 2}, {'value': 'Bolt', 'count': 1}])
+        self.assertEqual((facets['price']['min'], facets['price']['max']), ('99.00', '310.00'))
+        buckets = facets['price']['buckets']
+        self.assertEqual(sum(bucket['count'] for bucket in buckets), 3)
+        self.assertLessEqual(Decimal(buckets[0]['min']), Decimal('99.00'))
+        self.assertGreater(Decimal(buckets[-1]['max']), Decimal('310.00'))
+        self.assertEqual({row['rating']: row['count'] for row in facets['ratings']}, {0: 0, 1: 0, 2: 0, 3: 1, 4: 2, 5: 0})
+        self.assertEqual((facets['in_stock'], facets['discounted']), (2, 1))
+
+    def test_facets_are_cached_until_a_product_changes(self):
+        self.client.get('/api/products/facets/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/products/facets/').json()['count'], 4)
+        Product.objects.get(title='Laptop').delete()
+        self.assertEqual(self.client.get('/api/products/facets/').json()['count'], 3)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        counters.flush()
+        cache.clear()
+        self.phone = Product.objects.create(title='Phone', description='', category='phones', price=Decimal('9.99'))
+        self.laptop = Product.objects.create(title='Laptop', description='', category='laptops', price=Decimal('999.00'))
+
+    def test_list_is_served_from_cache_until_a_product_changes(self):
+        self.client.get('/api/products/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/products/')
+        
+        self.phone.price = Decimal('5.00')
+        self.phone.save()
+        prices = {product['id']: product['price'] for product in self.client.get('/api/products/').json()['results']}
+        self.assertEqual(prices[self.phone.id], '5.00')
+        self.assertEqual(cache_stats()['product_list'], {'hits': 1, 'misses': 2, 'not_modified': 0, 'hit_rate': 0.3333})
+
+    def test_detail_is_only_invalidated_by_its_own_product(self):
+        phone_url, laptop_url = f'/api/products/{self.phone.id}/', f'/api/products/{self.laptop.id}/'
+        self.client.get(phone_url)
+        self.client.get(laptop_url)
+        
+        Review.objects.create(product=self.phone, rating=5, comment='', reviewer_name='Sam', reviewer_email='sam@example.com', status='approved')
+        with self.assertNumQueries(0):
+            self.client.get(laptop_url)
+        self.assertEqual(len(self.client.get(phone_url).json()['reviews']), 1)
+
+    def test_dictionaries_and_bulk_writes_invalidate(self):
+        self.assertEqual(self.client.get('/api/categories/').json(), ['laptops', 'phones'])
+        Product.objects.create(title='Cable', description='', category='accessories', price=Decimal('1.00'))
+        self.assertEqual(self.client.get('/api/categories/').json(), ['accessories', 'laptops', 'phones'])
+        
+        url = f'/api/products/{self.laptop.id}/'
+        self.client.get(url)
+        # Bulk writes skip model signals
+        BulkWrite(update=[{'id': self.laptop.id, 'title': 'Notebook'}]).run()
+        self.assertEqual(self.client.get(url).json()['title'], 'Notebook')
+
+
+class ConditionalRequestTests(TestCase):
+    def setUp(self):
+        counters.flush()
+        cache.clear()
+        self.phone = Product.objects.create(title='Phone', description='', category='phones', price=Decimal('9.99'))
+
+    @mock.patch('products.caching.time.time', return_value=time.time() + 2)
+    def test_unchanged_data_is_answered_with_304(self, now):
+        response = self.client.get('/api/products/')
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertIn('no-cache', response['Cache-Control'])
+        
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/products/', headers={'If-None-Match': etag}).status_code, 304)
+        self.assertEqual(self.client.get('/api/products/', headers={'If-Modified-Since': last_modified}).status_code, 304)
+        # Other parameters are another representation
+        self.assertEqual(self.client.get('/api/products/', {'page_size': 5}, headers={'If-None-Match': etag}).status_code, 200)
+        self.assertEqual(cache_stats()['product_list']['not_modified'], 2)
+
+    def test_last_modified_waits_for_its_second_to_end(self):
+        def get(at, since=None):
+            headers = {'If-Modified-Since': http_date(since)} if since else {}
+            with mock.patch('products.caching.time.time', return_value=at):
+                return self.client.get('/api/products/', headers=headers)
+        
+        with mock.patch('products.caching.time.time', return_value=1000.2):
+            bump_namespaces(CATALOG_NAMESPACE)
+        # Another write could still land in second 1000
+        response = get(1000.5)
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertTrue(response.has_header('ETag'))
+        
+        # Rounded up, never before the write
+        self.assertEqual(get(1002.0)['Last-Modified'], http_date(1001))
+        self.assertEqual(get(1002.0, since=1001).status_code, 304)
+        
+        with mock.patch('products.caching.time.time', return_value=1002.5):
+            bump_namespaces(CATALOG_NAMESPACE)
+        response = get(1004.0, since=1001)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Last-Modified'], http_date(1003))
+
+    def test_writes_change_the_etag(self):
+        url = f'/api/products/{self.phone.id}/'
+        etag = self.client.get(url)['ETag']
+        self.phone.title = 'Phone 2'
+        self.phone.save()
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['title'], 'Phone 2')
+
+
+class CatalogDictionaryTests(TestCase):
+    def pairs(self):
+        return sorted(CategoryBrand.objects.values_list('category', 'brand', 'product_count'))
+
+    def test_pairs_follow_product_writes(self):
+        phone = Product.objects.create(title='Phone', description='', category='phones', brand='Acme', price=Decimal('9.99'))
+        Product.objects.create(title='Phone 2', description='', category='phones', brand='Acme', price=Decimal('9.99'))
+        laptop = Product.objects.create(title='Laptop', description='', category='laptops', brand='Bolt', price=Decimal('9.99'))
+        self.assertEqual(self.pairs(), [('laptops', 'Bolt', 1), ('phones', 'Acme', 2)])
+        
+        phone.brand = 'Bolt'
+        phone.save()
+        self.assertEqual(self.pairs(), [('laptops', 'Bolt', 1), ('phones', 'Acme', 1), ('phones', 'Bolt', 1)])
+        
+        # Retired products leave the dictionary; saves that touch no dictionary field leave it alone
+        laptop.is_active = False
+        laptop.save()
+        phone.price = Decimal('1.00')
+        phone.save(update_fields=['price'])
+        phone.delete()
+        self.assertEqual(self.pairs(), [('phones', 'Acme', 1)])
+        
+        expected = self.pairs()
+        rebuild_dictionary()
+        self.assertEqual(self.pairs(), expected)
+
+    def test_endpoints_read_the_dictionary(self):
+        cache.clear()
+        for category, brand in (('phones', 'Acme'), ('phones', 'Bolt'), ('phones', 'Acme'), ('laptops', 'Bolt'), ('cables', '')):
+            Product.objects.create(title='Item', description='', category=category, brand=brand, price=Decimal('9.99'))
+        
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/categories/').json(), ['cables', 'laptops', 'phones'])
+        self.assertEqual(self.client.get('/api/brands/', {'category': 'phones'}).json(), ['Acme', 'Bolt'])
+        self.assertEqual(
+            self.client.get('/api/brands/', {'counts': 'true'}).json(),
+            [{'value': 'Acme', 'count': 2}, {'value': 'Bolt', 'count': 2}],
+        )
+        self.assertEqual(
+            self.client.get('/api/categories/', {'counts': 'true'}).json(),
+            [{'value': 'cables', 'count': 1}, {'value': 'laptops', 'count': 1}, {'value': 'phones', 'count': 3}],
+        )
+
+
+class ProductExportTests(TestCase):
+    def setUp(self):
+        phone = Product.objects.create(id=1, title='Phone', description='Line one\nline "two"', category='phones', price=Decimal('9.99'), images=['a.png'])
+        Dimension.objects.create(product=phone, width=1.5, height=2, depth=3)
+        for rating in (4, 5):
+            Review.objects.create(product=phone, rating=rating, comment='', reviewer_name='Sam', reviewer_email=f'{rating}@example.com', status='approved')
+        Product.objects.create(id=2, title='Cable', description='', category='accessories', price=Decimal('1.00'))
+        Product.objects.create(id=3, title='Retired', description='', category='phones', price=Decimal('1.00'), is_active=False)
+
+    def export(self, **params):
+        request = RequestFactory().get('/api/products/export/', params)
+        request.user_role = 'admin'
+        response = views.product_export(request)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson_streams_active_products_with_dimensions(self):
+        response, body = self.export(reviews='summary')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['Phone', 'Cable'])
+        phone, cable = rows
+        self.assertEqual((phone['price'], phone['images'], phone['dimensions_width']), ('9.99', ['a.png'], 1.5))
+        self.assertEqual((phone['review_count'], phone['average_rating']), (2, 4.5))
+        self.assertEqual((cable['dimensions_width'], cable['average_rating']), (None, None))
+        self.assertNotIn('content_hash', phone)
+        
+        _, body = self.export(inactive='true')
+        self.assertEqual(len(body.splitlines()), 3)
+
+    def test_csv_matches_the_management_command(self):
+        response, body = self.export(format='csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="products.csv"')
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(rows[0]['description'], 'Line one\nline "two"')
+        self.assertEqual(rows[0]['images'], '["a.png"]')
+        self.assertEqual(rows[1]['dimensions_depth'], '')
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'products.csv')
+            call_command('export_products', '--format', 'csv', '--output', path, '--chunk-size', '1', stderr=io.StringIO())
+            with open(path, newline='') as f:
+                self.assertEqual(f.read(), body)
+        
+        self.assertEqual(self.client.get('/api/products/export/', {'format': 'xml'}).status_code, 403)
+        request = RequestFactory().get('/api/products/export/', {'format': 'xml'})
+        request.user_role = 'admin'
+        self.assertEqual(views.product_export(request).status_code, 400)
+
+
+class ProductBatchTests(TestCase):
+    def setUp(self):
+        for product_id in (1, 2, 3):
+            Product.objects.create(id=product_id, title=f'Product {product_id}', description='', category='phones', price=Decimal('9.99'))
+        Product.objects.filter(id=3).update(is_active=False)
+
+    def test_results_keep_the_requested_order(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/batch/', {'ids': '2,9,1,2,3', 'fields': 'id,title'}).json()
+        self.assertEqual(response['results'], [
+            {'id': 2, 'title': 'Product 2'},
+            {'id': 9, 'error': 'Product not found'},
+            {'id': 1, 'title': 'Product 1'},
+            {'id': 2, 'title': 'Product 2'},
+            # Retired products are not served
+            {'id': 3, 'error': 'Product not found'},
+        ])
+        self.assertEqual(response['not_found'], [9, 3])
+
+    def test_bad_id_lists_are_rejected(self):
+        for ids in ('', '1,x', ','.join(str(number) for number in range(101))):
+            self.assertEqual(self.client.get('/api/products/batch/', {'ids': ids}).status_code, 400, ids)
+
+
+@mock.patch.dict(os.environ, {'STRIPE_WEBHOOK_SECRET': 'whsec_test'})
+class StripeWebhookTests(TestCase):
+    def deliver(self, event, secret='whsec_test'):
+        payload = json.dumps(event)
+        timestamp = int(time.time())
+        signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+        return self.client.post(
+            '/api/webhook/', payload, content_type='application/json',
+            headers={'Stripe-Signature': f't={timestamp},v1={signature}'},
+        )
+
+    def event(self, event_id, event_type='payment_intent.succeeded', created=100):
+        return {
+            'id': event_id, 'object': 'event', 'type': event_type, 'created': created,
+            'data': {'object': {'id': 'pi_1', 'object': 'payment_intent'}},
+        }
+
+    def test_redelivered_events_are_handled_once(self):
+        handler = mock.Mock()
+        self.assertEqual(self.deliver(self.event('evt_1')).json(), {'success': True, 'duplicate': False})
+        self.assertEqual(self.deliver(self.event('evt_1')).json(), {'success': True, 'duplicate': True})
+        self.assertEqual(StripeEvent.objects.count(), 1)
+        
+        with mock.patch.dict(stripe_events.HANDLERS, {'payment_intent.succeeded': handler}):
+            self.assertEqual(stripe_events.process_pending(), (1, 0))
+            self.deliver(self.event('evt_1'))
+            self.assertEqual(stripe_events.process_pending(), (0, 0))
+        handler.assert_called_once_with({'id': 'pi_1', 'object': 'payment_intent'})
+
+    def test_events_of_one_intent_run_in_stripe_order(self):
+        seen = []
+        self.deliver(self.event('evt_late', 'payment_intent.payment_failed', created=200))
+        self.deliver(self.event('evt_early', created=100))
+        handlers = {
+            'payment_intent.succeeded': lambda obj: seen.append('succeeded'),
+            'payment_intent.payment_failed': lambda obj: seen.append('failed'),
+        }
+        with mock.patch.dict(stripe_events.HANDLERS, handlers):
+            stripe_events.process_pending()
+        self.assertEqual(seen, ['succeeded', 'failed'])
+
+    def test_bad_signatures_are_rejected(self):
+        self.assertEqual(self.deliver(self.event('evt_1'), secret='whsec_other').status_code, 400)
+        self.assertFalse(StripeEvent.objects.exists())
+
+
+class PaymentIntentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client_mock = mock.Mock()
+        self.client_mock.payment_intents.create.side_effect = lambda params, options=None: mock.Mock(
+            id=f'pi_{self.client_mock.payment_intents.create.call_count}',
+            client_secret=f'secret_{self.client_mock.payment_intents.create.call_count}',
+        )
+        patcher = mock.patch('products.payments.stripe_client', return_value=self.client_mock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def pay(self, cart, key=None):
+        headers = {'Idempotency-Key': key} if key else {}
+        response = self.client.post(
+            '/api/create-payment-intent/', {'amount': 1998, 'cartItems': cart}, content_type='application/json', headers=headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['client_secret']
+
+    def test_repeated_checkout_gets_the_same_intent(self):
+        cart = [{'id': 1, 'quantity': 2}]
+        first = self.pay(cart, key='checkout-1')
+        self.assertEqual(self.pay(list(cart), key='checkout-1'), first)
+        self.assertEqual(self.client_mock.payment_intents.create.call_count, 1)
+        stripe_key = self.client_mock.payment_intents.create.call_args.kwargs['options']['idempotency_key']
+        
+        # A changed cart is a new intent, under a new Stripe idempotency key
+        self.assertNotEqual(self.pay([{'id': 1, 'quantity': 3}], key='checkout-1'), first)
+        self.assertNotEqual(self.client_mock.payment_intents.create.call_args.kwargs['options']['idempotency_key'], stripe_key)
+        
+        # Without a checkout key every request creates an intent
+        self.pay(cart)
+        self.pay(cart)
+        self.assertEqual(self.client_mock.payment_intents.create.call_count, 4)
+
+    def test_idempotency_key_survives_a_lost_cache_entry(self):
+        self.pay([{'id': 1}], key='checkout-2')
+        cache.clear()
+        self.pay([{'id': 1}], key='checkout-2')
+        keys = {call.kwargs['options']['idempotency_key'] for call in self.client_mock.payment_intents.create.call_args_list}
+        # Stripe itself hands back the first intent for a reused key
+        self.assertEqual(len(keys), 1)
+
+
+
+class StripeClientTests(TestCase):
+    """The real pooled client (sync and async) against the stripe_stub stand-in, with the pinned stripe"""
+
+    def setUp(self):
+        cache.clear()
+        server = StubServer(('127.0.0.1', 0), StubHandler)
+        server.intents, server.created, server.lock, server.latency = {}, 0, threading.Lock(), 0.0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.server = server
+        payments.stripe_client.cache_clear()
+        self.addCleanup(payments.stripe_client.cache_clear)
+
+    def test_sync_and_async_intents_share_the_idempotency_key(self):
+        async def pay_async():
+            # One event loop, as under ASGI; the async connection pool belongs to it
+            checkout = await payments.acreate_payment_intent(1998, checkout_id='checkout-1', cart_items=[{'id': 1}])
+            await payments.acreate_payment_intent(1998)
+            return checkout
+        
+        with override_settings(STRIPE_API_BASE=f'http://127.0.0.1:{self.server.server_port}'):
+            first = payments.create_payment_intent(1998, checkout_id='checkout-1', cart_items=[{'id': 1}])
+            cache.clear()
+            second = async_to_sync(pay_async)()
+        self.assertEqual(first, second)
+        self.assertTrue(first['client_secret'].startswith(first['id']))
+        # The stripe library gives the intent without a checkout its own retry key
+        self.assertEqual((len(self.server.intents), self.server.created), (2, 3))
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        counters.flush()
+        cache.clear()
+        for number in range(15):
+            product = Product.objects.create(
+                id=number + 1, title=f'Phone {number}', description='Long description', category='phones' if number % 2 else 'laptops',
+                brand='Acme', price=Decimal(number), rating=number % 5,
+            )
+            Dimension.objects.create(product=product, width=1, height=2, depth=number)
+        Review.objects.create(product_id=1, rating=5, comment='ok', reviewer_name='Sam', reviewer_email='sam@example.com', status='approved')
+
+    async def test_async_views_send_what_the_sync_views_send(self):
+        cases = [
+            ('product_list', '/api/products/', {}, {}),
+            ('product_list', '/api/products/', {'category': 'phones', 'sort': 'price', 'order': 'asc', 'page': '2', 'page_size': '3'}, {}),
+            ('product_list', '/api/products/', {'fields': 'id,title', 'expand': 'reviews', 'pagination': 'cursor', 'sort': 'rating'}, {}),
+            ('product_list', '/api/products/', {'search': 'phone', 'sort': 'relevance'}, {}),
+            ('product_list', '/api/products/', {'cursor': 'garbage'}, {}),
+            ('product_detail', '/api/products/1/', {}, {'pk': 1}),
+            ('product_detail', '/api/products/99/', {}, {'pk': 99}),
+            ('categories', '/api/categories/', {'counts': 'true'}, {}),
+            ('brands', '/api/brands/', {'category': 'phones'}, {}),
+        ]
+        for name, path, params, kwargs in cases:
+            with self.subTest(name=name, params=params):
+                cache.clear()
+                async_response = await getattr(async_views, name)(AsyncRequestFactory().get(path, params), **kwargs)
+                cache.clear()
+                sync_response = await sync_to_async(getattr(views, name))(RequestFactory().get(path, params), **kwargs)
+                if hasattr(sync_response, 'render'):
+                    sync_response.render()
+                self.assertEqual(async_response.status_code, sync_response.status_code)
+                self.assertEqual(async_response.content, sync_response.content)
+
+    async def test_async_views_share_the_response_cache(self):
+        await sync_to_async(views.product_list)(RequestFactory().get('/api/products/'))
+        # A hit never reaches the view
+        with mock.patch.object(async_views, 'aserialize_products', side_effect=AssertionError):
+            response = await async_views.product_list(AsyncRequestFactory().get('/api/products/', headers={'Accept-Encoding': 'gzip'}))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(cache_stats()['product_list']['hits'], 1)
+
+    async def test_async_views_keep_cache_calls_off_the_event_loop(self):
+        # The shared cache can block on another worker's write lock for seconds
+        backend = caches['default']
+        on_loop = []
+        
+        def spy(name, method):
+            def call(*args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    on_loop.append(name)
+                except RuntimeError:
+                    pass
+                return method(*args, **kwargs)
+            return call
+        
+        with contextlib.ExitStack() as stack:
+            for name in ('get', 'get_many', 'set', 'add', 'incr'):
+                stack.enter_context(mock.patch.object(backend, name, spy(name, getattr(backend, name))))
+            for _ in range(2):
+                await async_views.product_list(AsyncRequestFactory().get('/api/products/', {'category': 'phones'}))
+                await async_views.product_detail(AsyncRequestFactory().get('/api/products/1/'), pk=1)
+        self.assertEqual(on_loop, [])
+
+    def test_async_views_setting_routes_to_async_views(self):
+        try:
+            with override_settings(ASYNC_VIEWS=True):
+                clear_url_caches()
+                importlib.reload(urls)
+                self.assertIs(resolve('/api/products/').func, async_views.product_list)
+                self.assertIs(resolve('/api/webhook/').func, async_views.webhook)
+                # Admin endpoints stay synchronous
+                self.assertIs(resolve('/api/products/bulk/').func.cls, views.product_bulk.cls)
+        finally:
+            clear_url_caches()
+            importlib.reload(urls)
+        self.assertIsNot(resolve('/api/products/').func, async_views.product_list)
+
+
+def feed_review(email, rating, **overrides):
+    review = {
+        'rating': rating, 'comment': 'Fine', 'date': '2025-01-02T03:04:05.000Z',
+        'reviewerName': email.split('@')[0], 'reviewerEmail': email,
+    }
+    review.update(overrides)
+    return review
+
+
+class ProductImportTests(TestCase):
+    def import_feed(self, items, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as feed:
+            json.dump({'products': items}, feed)
+        self.addCleanup(os.remove, feed.name)
+        call_command('populate_products', '--file', feed.name, *args, stdout=io.StringIO())
+
+    def import_file(self, suffix, body, *args):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, newline='', delete=False) as feed:
+            feed.write(body)
+        self.addCleanup(os.remove, feed.name)
+        stdout = io.StringIO()
+        call_command('populate_products', '--file', feed.name, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_reimport_matches_reviews_and_moves_only_approved_totals(self):
+        reviews = [feed_review('ann@example.com', 4), feed_review('bob@example.com', 2)]
+        self.import_feed([feed_item(1, reviews=reviews)])
+        self.import_feed([feed_item(1, reviews=reviews)])
+        self.assertEqual(Review.objects.filter(product_id=1).count(), 2)
+        
+        approved = Review.objects.get(reviewer_email='ann@example.com')
+        approved.status = 'approved'
+        approved.save()
+        product = Product.objects.get(id=1)
+        self.assertEqual((product.review_count, product.rating_sum, product.rating), (1, 4, 4.0))
+        
+        changed = [feed_review('ann@example.com', 5), feed_review('bob@example.com', 1)]
+        self.import_feed([feed_item(1, reviews=changed)])
+        self.assertEqual(
+            dict(Review.objects.filter(product_id=1).values_list('reviewer_email', 'rating')),
+            {'ann@example.com': 5, 'bob@example.com': 1},
+        )
+        product.refresh_from_db()
+        self.assertEqual((product.review_count, product.rating_sum, product.rating), (1, 5, 5.0))
+
+    def test_jsonl_feed_is_written_in_batches(self):
+        body = ''.join(json.dumps(feed_item(product_id)) + '\n' for product_id in (1, 2, 3))
+        output = self.import_file('.jsonl', body, '--batch-size', '2')
+        self.assertIn('Processed 2 products', output)
+        self.assertIn('Processed 3 products', output)
+        self.assertEqual(sorted(Product.objects.values_list('id', flat=True)), [1, 2, 3])
+
+    def test_csv_feed(self):
+        items = [feed_item(1, reviews=[feed_review('ann@example.com', 4)]), feed_item(2, price=19.5)]
+        body = io.StringIO()
+        writer = csv.DictWriter(body, fieldnames=list(items[0]))
+        writer.writeheader()
+        for item in items:
+            writer.writerow({
+                key: json.dumps(value) if key in ('images', 'dimensions', 'reviews') else value
+                for key, value in item.items()
+            })
+        self.import_file('.csv', body.getvalue())
+        self.assertEqual(Product.objects.get(id=2).price, Decimal('19.50'))
+        self.assertEqual(Dimension.objects.get(product_id=1).depth, 3)
+        self.assertEqual(Review.objects.get(product_id=1).reviewer_email, 'ann@example.com')
+
+    def test_feed_from_stdin(self):
+        body = ''.join(json.dumps(feed_item(product_id)) + '\n' for product_id in (1, 2))
+        with mock.patch('sys.stdin', io.StringIO(body)):
+            call_command('populate_products', '--file', '-', '--format', 'jsonl', stdout=io.StringIO())
+        self.assertEqual(sorted(Product.objects.values_list('id', flat=True)), [1, 2])
+
+    def test_delta_retires_only_feed_products(self):
+        self.import_feed([feed_item(1), feed_item(2)])
+        Product.objects.create(id=55555, title='Merchant product', description='', category='phones', price=Decimal('5.00'))
+        
+        self.import_feed([feed_item(1)], '--delta')
+        active = dict(Product.objects.values_list('id', 'is_active'))
+        self.assertEqual(active, {1: True, 2: False, 55555: True})
+
+    def test_feed_rating_is_kept_until_reviews_are_approved(self):
+        self.import_feed([feed_item(1)])
+        self.assertEqual(Product.objects.get(id=1).rating, 4.9)
+        
+        self.import_feed([feed_item(1, rating=4.2)])
+        self.assertEqual(Product.objects.get(id=1).rating, 4.2)
+        
+        Product.objects.filter(id=1).update(review_count=2, rating_sum=7, rating=3.5)
+        self.import_feed([feed_item(1, rating=1.0, price=19.99)])
+        self.assertEqual(Product.objects.get(id=1).rating, 3.5)
+
+
+class ProductSchemaTests(TestCase):
+    def test_rating_totals_are_internal_and_read_only(self):
+        product = Product.objects.create(title='Phone', description='', category='phones', price=Decimal('9.99'))
+        Review.objects.create(product=product, rating=4, comment='', reviewer_name='Sam', reviewer_email='sam@example.com', status='approved')
+        
+        results = BulkWrite(update=[
+            {'id': product.id, 'rating_sum': 1000, 'review_count': 0, 'is_active': False, 'price': '5.00'},
+        ]).run()
+        self.assertEqual(results['update'][0]['status'], 'updated')
+        product.refresh_from_db()
+        self.assertEqual((product.review_count, product.rating_sum, product.rating, product.is_active), (1, 4, 4.0, True))
+        self.assertEqual(product.price, Decimal('5.00'))
+        
+        payload = self.client.get(f'/api/products/{product.id}/').json()
+        self.assertNotIn('rating_sum', payload)
+        self.assertNotIn('review_count', payload)
+        self.assertTrue(payload['is_active'])
+
+
+    def test_recompute_resets_rating_when_approved_reviews_are_gone(self):
+        product = Product.objects.create(title='Phone', description='', category='phones', price=Decimal('9.99'))
+        imported = Product.objects.create(title='Case', description='', category='phones', price=Decimal('1.99'), rating=4.7)
+        Review.objects.create(product=product, rating=4, comment='', reviewer_name='Sam', reviewer_email='sam@example.com', status='approved')
+        # A queryset update skips the signals that keep the totals in step
+        Review.objects.filter(product=product).update(status='rejected')
+        product.refresh_from_db()
+        self.assertEqual((product.review_count, product.rating), (1, 4.0))
+        
+        call_command('recompute_product_ratings', stdout=io.StringIO())
+        product.refresh_from_db()
+        self.assertEqual((product.review_count, product.rating_sum, product.rating), (0, 0, 0.0))
+        imported.refresh_from_db()
+        self.assertEqual(imported.rating, 4.7)
+
+
+class ProductBulkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(title='Phone', description='', category='phones', price=Decimal('9.99'))
+        Dimension.objects.create(product=self.product, width=1, height=2, depth=3)
+
+    def post(self, body, role='admin'):
+        request = RequestFactory().post('/api/products/bulk/', body, content_type='application/json')
+        request.user_role = role
+        return views.product_bulk(request)
+
+    @override_settings(DEBUG=True)
+    def test_admin_endpoints_require_admin_even_in_debug(self):
+        self.assertEqual(self.post({'delete': [self.product.id]}, role='user').status_code, 403)
+        self.assertTrue(Product.objects.filter(id=self.product.id).exists())
+        for path in ('/api/cache-stats/', '/api/compression-stats/', '/api/products/export/'):
+            self.assertEqual(self.client.get(path).status_code, 403)
+
+    def test_update_ids_must_be_integers(self):
+        for product_id in ([self.product.id], {'id': 1}, '1', True, None):
+            self.assertEqual(self.post({'update': [{'id': product_id, 'price': '1.00'}]}).status_code, 400)
+        # BulkWrite used directly reports them as not found
+        results = BulkWrite(update=[{'id': [1]}, {'id': {'a': 1}}]).run()
+        self.assertEqual([result['status'] for result in results['update']], ['not_found', 'not_found'])
+
+    def test_partial_dimensions_merge_with_stored_row(self):
+        response = self.post({'update': [{'id': self.product.id, 'dimensions': {'width': 5}}]})
+        self.assertEqual(response.data['update'][0]['status'], 'updated')
+        dimensions = Dimension.objects.get(product=self.product)
+        self.assertEqual((dimensions.width, dimensions.height, dimensions.depth), (5, 2, 3))
+        
+        bare = Product.objects.create(title='Case', description='', category='phones', price=Decimal('1.00'))
+        results = BulkWrite(update=[{'id': bare.id, 'dimensions': {'width': 5}}]).run()
+        self.assertEqual(results['update'][0]['status'], 'invalid')
+        self.assertEqual(set(results['update'][0]['errors']['dimensions']), {'height', 'depth'})
+
+    def test_updates_write_only_their_own_fields(self):
+        other = Product.objects.create(title='Case', description='', category='phones', price=Decimal('1.00'))
+        with mock.patch.object(Product.objects, 'select_for_update', return_value=Product.objects.all()) as lock:
+            with CaptureQueriesContext(connection) as queries:
+                BulkWrite(update=[
+                    {'id': self.product.id, 'price': '5.00'},
+                    {'id': other.id, 'title': 'Case XL'},
+                ]).run()
+        lock.assert_called_once_with()
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "products_product" SET')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(sorted('"title"' in sql for sql in updates), [False, True])
+        self.assertEqual(sorted('"price"' in sql for sql in updates), [False, True])
+        
+        self.product.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.product.title, self.product.price), ('Phone', Decimal('5.00')))
+        self.assertEqual((other.title, other.price), ('Case XL', Decimal('1.00')))
+
+    def test_created_ids_come_from_one_sequence(self):
+        item = {'title': 'New', 'description': 'Boxed', 'category': 'phones', 'price': '1.00'}
+        first = BulkWrite(create=[item, item]).run()['create']
+        second = BulkWrite(create=[item]).run()['create']
+        ids = [result['id'] for result in first + second]
+        self.assertEqual(len(set(ids)), 3)
+        self.assertEqual(ids, sorted(ids))
+        self.assertGreaterEqual(ids[0], 100000)
+
+
+def _incr_shared(location, times):
+    shared = SharedMemoryCache(location, {})
+    for _ in range(times):
+        shared.incr('hits')
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Product.objects.create(id=1, title='Smartphone X', description='', category='mobile', brand='Acme', price=Decimal('9.99'))
+        Product.objects.create(id=2, title='Phone case', description='Fits the Smartphone X', category='accessories', price=Decimal('1.99'))
+
+    def ids(self, params):
+        response = self.client.get('/api/products/', params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(product['id'] for product in response.json()['results'])
+
+    def test_title_matches_substrings(self):
+        self.assertEqual(self.ids({'title': 'phone'}), [1, 2])
+        self.assertEqual(self.ids({'title': 'TPHO'}), [1])
+
+    def test_search_matches_word_prefixes(self):
+        self.assertEqual(self.ids({'search': 'phon'}), [2])
+        self.assertEqual(self.ids({'q': 'smart acme'}), [1])
+        ranked = self.client.get('/api/products/', {'q': 'smartphone', 'sort': 'relevance'}).json()['results']
+        self.assertEqual([product['id'] for product in ranked], [1, 2])
+
+    def test_relevance_rejects_cursor_pagination(self):
+        response = self.client.get('/api/products/', {'search': 'phone', 'sort': 'relevance', 'pagination': 'cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_migration_indexes_existing_products(self):
+        SearchTerm.objects.filter(product_id=1).delete()
+        backfill = importlib.import_module('products.migrations.0022_backfill_search_terms')
+        backfill.backfill_search_terms(django_apps, None)
+        self.assertEqual(self.ids({'search': 'acme'}), [1])
+        # Products that were already indexed are left alone
+        self.assertEqual(SearchTerm.objects.filter(product_id=2, term='case').count(), 1)
+
+
+class SharedCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, 'cache.sqlite3')
+
+    def shared_cache(self, **options):
+        return SharedMemoryCache(self.location, {'OPTIONS': options})
+
+    def test_entries_expire(self):
+        shared = self.shared_cache()
+        shared.set('short', 1, timeout=10)
+        shared.set('forever', 2, timeout=None)
+        with mock.patch('backend.shared_cache.time.time', return_value=time.time() + 11):
+            self.assertIsNone(shared.get('short'))
+            self.assertEqual(shared.get('forever'), 2)
+            self.assertTrue(shared.add('short', 3))
+
+    def test_least_recently_used_entries_are_culled(self):
+        shared = self.shared_cache(MAX_ENTRIES=10, CULL_FREQUENCY=2, CULL_INTERVAL=1)
+        for number in range(10):
+            with mock.patch('backend.shared_cache.time.time', return_value=1000.0 + number * 60):
+                shared.set(f'key{number}', number, timeout=None)
+        with mock.patch('backend.shared_cache.time.time', return_value=2000.0):
+            shared.get('key0')
+            shared.set('key10', 10, timeout=None)
+        remaining = shared.get_many([f'key{number}' for number in range(11)])
+        self.assertEqual(sorted(remaining), ['key0', 'key10', 'key6', 'key7', 'key8', 'key9'])
+
+    def test_incr_is_atomic_across_processes(self):
+        shared = self.shared_cache()
+        shared.set('hits', 0, timeout=None)
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_incr_shared, args=(self.location, 50)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(shared.get('hits'), 200)
+
+    def test_writes_are_skipped_while_another_worker_holds_the_lock(self):
+        shared = self.shared_cache(BUSY_TIMEOUT=0.05)
+        shared.set('hits', 1, timeout=None)
+        holder = sqlite3.connect(self.location, isolation_level=None)
+        self.addCleanup(holder.close)
+        holder.execute('BEGIN IMMEDIATE')
+        
+        with self.assertLogs('backend.shared_cache', 'WARNING') as logs:
+            shared.set('key', 2)
+            self.assertFalse(shared.add('new', 3))
+            self.assertEqual(shared.incr('hits'), 2)
+            self.assertFalse(shared.touch('hits'))
+            self.assertEqual(shared.set_many({'a': 1}), ['a'])
+        self.assertEqual(len(logs.records), 5)
+        # Reads still answer, skipping their access-time refresh
+        with mock.patch('backend.shared_cache.time.time', return_value=time.time() + 60):
+            self.assertEqual(shared.get('hits'), 1)
+        self.assertIsNone(shared.get('key'))
+        
+        holder.execute('ROLLBACK')
+        self.assertEqual(shared.incr('hits'), 2)
+
+    def test_files_of_other_users_are_refused(self):
+        self.shared_cache().set('key', 1)
+        with mock.patch('backend.shared_cache.os.getuid', return_value=os.getuid() + 1):
+            with self.assertRaises(ImproperlyConfigured):
+                self.shared_cache().get('key')
+
+    def test_default_location_is_private(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with mock.patch('backend.shared_cache.tempfile.gettempdir', return_value=directory.name), \
+                mock.patch('backend.shared_cache.os.path.isdir', return_value=False):
+            location = default_location()
+            SharedMemoryCache('', {}).set('key', 1)
+        self.assertEqual(os.stat(os.path.dirname(location)).st_mode & 0o777, 0o700)
+        
+        os.chmod(os.path.dirname(location), 0o777)
+        with mock.patch('backend.shared_cache.tempfile.gettempdir', return_value=directory.name), \
+                mock.patch('backend.shared_cache.os.path.isdir', return_value=False):
+            with self.assertRaises(ImproperlyConfigured):
+                SharedMemoryCache('', {}).get('key')
+
+
+class EmailOutboxTests(TestCase):
+    def test_confirmation_is_queued_then_delivered(self):
+        response = self.client.post('/api/send-order-confirmation/', {
+            'orderId': 'A1',
+            'userEmail': 'buyer@example.com',
+            'orderData': {'cartItems': [{'name': '<b>Mug</b>', 'price': '10.00', 'quantity': 2}]},
+        }, content_type='application/json')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        message = OutboxEmail.objects.get()
+        self.assertIn('&lt;b&gt;Mug&lt;/b&gt;', message.html_body)
+        self.assertIn('$22.60', message.html_body)
+        
+        self.assertEqual(deliver_pending(), (1, 0))
+        self.assertEqual(mail.outbox[0].to, ['buyer@example.com'])
+        self.assertEqual(OutboxEmail.objects.get().status, 'sent')
+
+    def test_failed_send_is_retried_with_backoff(self):
+        enqueue_email('Hello', ['buyer@example.com'], text_body='Hi')
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            self.assertEqual(deliver_pending(), (0, 1))
+        
+        message = OutboxEmail.objects.get()
+        self.assertEqual((message.status, message.attempts), ('pending', 1))
+        self.assertGreater(message.next_attempt_at, timezone.now())
+        self.assertEqual(outbox_stats()['retrying'], 1)
+        
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_pending(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class UserRoleTests(SimpleTestCase):
+    def request(self):
+        return RequestFactory().get('/', headers={'Authorization': 'Bearer token'})
+
+    @mock.patch.object(firebase_tokens, '_user_roles', TTLCache(maxsize=10, ttl=60))
+    @mock.patch('backend.middleware.verify_id_token', return_value={'uid': 'alice'})
+    def test_failed_role_lookup_is_not_cached(self, verify):
+        roles = mock.MagicMock()
+        roles.collection.return_value.document.return_value.get.side_effect = [
+            RuntimeError('Firestore unavailable'),
+            mock.Mock(exists=True, to_dict=lambda: {'role': 'admin'}),
+        ]
+        with mock.patch('backend.middleware.get_db', return_value=roles):
+            with self.assertLogs('backend.middleware', 'WARNING'):
+                self.assertEqual(resolve_user_role(self.request()), 'user')
+            self.assertEqual(resolve_user_role(self.request()), 'admin')
+            # Cached from here on
+            self.assertEqual(resolve_user_role(self.request()), 'admin')
+        self.assertEqual(roles.collection.return_value.document.return_value.get.call_count, 2)
+
+    @mock.patch.object(firebase_tokens, '_user_roles', TTLCache(maxsize=10, ttl=60))
+    def test_invalidated_role_is_loaded_again(self):
+        load = mock.Mock(side_effect=['admin', 'user', 'user', 'user'])
+        self.assertEqual(firebase_tokens.cached_user_role('alice', load), 'admin')
+        self.assertEqual(firebase_tokens.cached_user_role('alice', load), 'admin')
+        
+        firebase_tokens.invalidate_user_role('alice')
+        self.assertEqual(firebase_tokens.cached_user_role('alice', load), 'user')
+        self.assertEqual(load.call_count, 2)
+        
+        firebase_tokens.cached_user_role('bob', load)
+        firebase_tokens.invalidate_user_role()
+        firebase_tokens.cached_user_role('alice', load)
+        self.assertEqual(load.call_count, 4)
+
+
+class WarmupTests(TestCase):
+    def setUp(self):
+        # Counts still pending from earlier tests are cleared along with the cache
+        counters.flush()
+        cache.clear()
+        for category, rating in (('phones', 4.5), ('laptops', 3.0)):
+            Product.objects.create(title=f'A {category}', description='', category=category, price=Decimal('9.99'), rating=rating)
+
+    @mock.patch.dict(warmup._state, {'status': 'pending', 'steps': {}})
+    def test_warmup_prefills_hot_responses(self):
+        with mock.patch('products.views.ensure_warmup'):
+            self.assertEqual(self.client.get('/server-status/').status_code, 503)
+        
+        warmup.run_warmup()
+        stats = cache_stats()
+        self.assertEqual(stats['categories']['misses'], 1)
+        # Home page variants plus the first page of each category
+        self.assertEqual(stats['product_list']['misses'], len(warmup.HOME_PAGE_PARAMS) + 2)
+        self.assertEqual(stats['product_detail']['misses'], 2)
+        
+        self.client.get('/api/products/', {'category': 'phones'})
+        self.assertEqual(cache_stats()['product_list']['hits'], 1)
+        
+        response = self.client.get('/server-status/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ready', 'database': 'ok'})
+        self.assertEqual(warmup.warmup_state()['steps']['responses']['count'], len(warmup.HOME_PAGE_PARAMS) + 8)
+
+    @mock.patch.dict(warmup._state, {'status': 'pending', 'steps': {}})
+    def test_failed_required_step_keeps_worker_unready(self):
+        def broken():
+            raise RuntimeError('secret path /srv/app/build')
+        
+        steps = [(name, broken if name == 'frontend' else step, required) for name, step, required in warmup.WARMUP_STEPS]
+        with mock.patch.object(warmup, 'WARMUP_STEPS', steps), self.assertLogs('products.warmup', 'WARNING'):
+            warmup.run_warmup()
+        response = self.client.get('/server-status/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {'status': 'failed', 'database': 'ok'})
+        self.assertNotIn(b'secret', response.content)
+
+    @mock.patch.dict(warmup._state, {'status': 'pending', 'steps': {}})
+    def test_failed_optional_step_still_ready(self):
+        steps = [(name, mock.Mock(side_effect=RuntimeError('offline')) if name == 'signing_keys' else step, required)
+                 for name, step, required in warmup.WARMUP_STEPS]
+        with mock.patch.object(warmup, 'WARMUP_STEPS', steps), self.assertLogs('products.warmup', 'WARNING'):
+            warmup.run_warmup()
+        self.assertEqual(self.client.get('/server-status/').status_code, 200)
+
+
+class ResponseCompressionTests(TestCase):
+    def setUp(self):
+        # Counts still pending from earlier tests are cleared along with the cache
+        counters.flush()
+        cache.clear()
+        for number in range(12):
+            Product.objects.create(title=f'Product {number}', description='Long description. ' * 20, category='phones', price=Decimal('9.99'))
+
+    def test_cached_pages_are_stored_compressed(self):
+        plain = self.client.get('/api/products/')
+        self.assertNotIn('Content-Encoding', plain)
+        
+        compressed = self.client.get('/api/products/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        # Compressed once, when the page was cached
+        self.assertEqual(compression_stats()['cached']['gzip']['responses'], 1)
+        self.assertEqual(compression_stats()['live']['gzip']['responses'], 0)
+        
+        revalidated = self.client.get('/api/products/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': compressed['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+
+    @override_settings(COUNTER_FLUSH_INTERVAL=3600)
+    def test_counters_stay_in_process_until_read(self):
+        with mock.patch.object(counters, '_flushed_at', time.monotonic()):
+            self.client.get('/api/products/', headers={'Accept-Encoding': 'gzip'})
+            self.client.get('/api/products/')
+            self.assertIsNone(cache.get('response_cache:product_list:misses'))
+            self.assertIsNone(cache.get('compression:cached:gzip:responses'))
+            
+            self.assertEqual(cache_stats()['product_list'], {'hits': 1, 'misses': 1, 'not_modified': 0, 'hit_rate': 0.5})
+            self.assertEqual(compression_stats()['cached']['gzip']['responses'], 1)
+            self.assertEqual(cache.get('response_cache:product_list:misses'), 1)
+
+
+class FastSerializerTests(TestCase):
+    def setUp(self):
+        phone = Product.objects.create(
+            title='Phone \u2028 “Pro”', description='Ünïcode', category='phones', price=Decimal('1299.50'),
+            discount_percentage=Decimal('7.1'), rating=4.25, images=['a.png', {'alt': None}],
+        )
+        Dimension.objects.create(product=phone, width=7.5, height=15.0, depth=0.8)
+        now = timezone.now()
+        for days, reviewer_id in ((1, None), (3, 'uid-1'), (2, '')):
+            Review.objects.create(
+                product=phone, rating=days, comment='ok', reviewer_name='Sam', reviewer_email='sam@example.com',
+                reviewer_id=reviewer_id, status='approved', date=now - timedelta(days=days, microseconds=days),
+            )
+        # No dimensions and no reviews
+        Product.objects.create(title='Cable', description='', category='accessories', price=Decimal('0.10'))
+
+    def test_output_matches_product_serializer(self):
+        products = Product.objects.order_by('id')
+        for query in ('', 'fields=title,price', 'expand=reviews,dimensions', 'fields=reviews,created_at,images&expand=dimensions'):
+            fields = sparse_fields(QueryDict(query))
+            for zone in ('UTC', 'America/New_York'):
+                with self.subTest(query=query, zone=zone), timezone.override(zone):
+                    serializer = ProductListSerializer(products, many=True, fields=fields)
+                    self.assertEqual(
+                        render_json(serialize_products(product_values(products, fields), fields)),
+                        JSONRenderer().render(serializer.data),
+                    )
+
+    def test_sparse_fields_load_only_what_they_render(self):
+        for query, queries, keys in (
+            ('fields=id,title,price', 1, {'id', 'title', 'price'}),
+            ('fields=title&expand=dimensions', 1, {'id', 'title', 'dimensions'}),
+            ('fields=title&expand=reviews', 2, {'id', 'title', 'reviews'}),
+            ('', 2, None),
+        ):
+            fields = sparse_fields(QueryDict(query))
+            with self.subTest(query=query), CaptureQueriesContext(connection) as captured:
+                results = serialize_products(product_values(Product.objects.order_by('id'), fields), fields)
+            self.assertEqual(len(captured), queries)
+            if keys is not None:
+                self.assertEqual(set(results[0]), keys)
+                self.assertNotIn('description', captured[0]['sql'])
+        
+        # ?expand= alone is the lean card plus the relation
+        cards = self.client.get('/api/products/', {'expand': 'dimensions'}).json()['results']
+        self.assertNotIn('description', cards[0])
+        self.assertIn('dimensions', cards[0])
+
+
+class FrontendTests(SimpleTestCase):
+    def setUp(self):
+        self.build_dir = tempfile.TemporaryDirectory()
+        self.static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.build_dir.cleanup)
+        self.addCleanup(self.static_root.cleanup)
+        with open(os.path.join(self.build_dir.name, 'index.html'), 'w') as f:
+            f.write('<!doctype html><div id="root"></div>' + '<script></script>' * 100)
+        os.makedirs(os.path.join(self.static_root.name, 'js'))
+        with open(os.path.join(self.static_root.name, 'js', 'main.8c2b0c1e.js'), 'w') as f:
+            f.write('console.log("storefront");' * 100)
+        self.settings = override_settings(FRONTEND_BUILD_DIR=self.build_dir.name, STATIC_ROOT=self.static_root.name)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.factory = RequestFactory()
+
+    def test_app_routes_get_the_shell_from_memory(self):
+        response = spa_shell(self.factory.get('/orders/42', HTTP_ACCEPT_ENCODING='gzip, br'), path='orders/42')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        
+        revalidated = spa_shell(self.factory.get('/', HTTP_ACCEPT_ENCODING='br', HTTP_IF_NONE_MATCH=response['ETag']))
+        self.assertEqual(revalidated.status_code, 304)
+        
+        plain = spa_shell(self.factory.get('/cart'), path='cart')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertTrue(plain.content.startswith(b'<!doctype html>'))
+
+    def test_hashed_assets_are_precompressed_and_immutable(self):
+        storage = PrecompressedStaticFilesStorage(location=self.static_root.name)
+        list(storage.post_process({'js/main.8c2b0c1e.js': (storage, 'js/main.8c2b0c1e.js')}))
+        
+        response = static_file(self.factory.get('/static/js/main.8c2b0c1e.js', HTTP_ACCEPT_ENCODING='gzip'), path='js/main.8c2b0c1e.js')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(response['Content-Length']), os.path.getsize(os.path.join(self.static_root.name, 'js', 'main.8c2b0c1e.js.gz')))
+        response.close()
+        
+        with self.assertRaises(Http404):
+            spa_shell(self.factory.get('/static/js/missing.js'), path='static/js/missing.js')
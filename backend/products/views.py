@@ -1,173 +1,219 @@
 # backend/products/views.py
 
-import stripe
 import os
+from functools import wraps
 from django.conf import settings
-from django.http import JsonResponse
+from django.db import DatabaseError, connection
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from backend.compression import compression_stats
 from .models import Product
-from .serializers import ProductSerializer, ReviewSerializer
+from .serializers import ReviewSerializer, sparse_fields
+from .fast_serializers import product_values, serialize_products
+from .filters import filter_products, filter_signature
+from .bulk import BulkWrite, MAX_BULK_ITEMS, is_product_id
+from .caching import CATALOG_NAMESPACE, DICTIONARY_NAMESPACE, cache_response, cache_stats, product_namespaces
+from .counts import count_products
+from .dictionary import brand_list, category_list
+from .exports import EXPORT_CONTENT_TYPES, EXPORT_FORMATS, iter_export
+from .facets import get_facets
+from .listing import listing_page, listing_sort_field, order_listing, page_bounds, page_links, wants_cursor
+from .outbox import enqueue_email, outbox_stats
+from .payments import create_payment_intent as create_stripe_payment_intent, stripe_api
+from .pagination import InvalidCursor, MAX_CURSOR_PAGE_SIZE, paginate_by_cursor
+from .stripe_events import record_event
+from .warmup import ensure_warmup, warmup_state
 import json
 
-# Configure Stripe
-stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+def admin_required(view):
+    """Answer 403 unless the caller's Firebase role is admin"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if getattr(request, 'user_role', None) != 'admin':
+            return JsonResponse({'error': 'Admin access required'}, status=403)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+# Upper bound on ?ids= for product_batch; a cart or favorites list fits comfortably
+MAX_BATCH_PRODUCTS = 100
 
 @api_view(['GET'])
+@cache_response('product_list', (CATALOG_NAMESPACE,))
 def product_list(request):
     """Get all products with optional filtering"""
-    products = Product.objects.all()
-    
-    # Apply filters
-    category = request.GET.get('category')
-    if category:
-        products = products.filter(category=category)
-    
-    # Add title filter
-    title = request.GET.get('title')
-    if title:
-        products = products.filter(title__icontains=title)
-    
-    # Add brand filter
-    brand = request.GET.get('brand')
-    if brand:
-        products = products.filter(brand=brand)
-    
-    min_price = request.GET.get('min_price')
-    if min_price:
-        products = products.filter(price__gte=min_price)
-    
-    max_price = request.GET.get('max_price')
-    if max_price:
-        products = products.filter(price__lte=max_price)
-    
-    # Add rating filters
-    min_rating = request.GET.get('min_rating')
-    if min_rating:
-        products = products.filter(rating__gte=min_rating)
-    
-    max_rating = request.GET.get('max_rating')
-    if max_rating:
-        products = products.filter(rating__lte=max_rating)
+    products = filter_products(request.GET)
+    sort_field = listing_sort_field(request.GET)
     
-    # Add stock filter
-    in_stock = request.GET.get('in_stock')
-    if in_stock == 'true':
-        products = products.filter(stock__gt=0)
+    # Sparse fieldsets: load only the columns and relations the client renders, as plain rows
+    fields = sparse_fields(request.GET)
+    products = product_values(products, fields, extra_columns=(sort_field,))
+    page, page_size = listing_page(request.GET)
     
-    # Add discount filter
-    has_discount = request.GET.get('has_discount')
-    if has_discount == 'true':
-        products = products.filter(discount_percentage__gt=0)
-    
-    search = request.GET.get('search')
-    if search:
-        products = products.filter(title__icontains=search)
-    
-    # Apply ordering
-    sort_by = request.GET.get('sort', 'id')
-    order = request.GET.get('order', 'desc')
-    
-    # Handle sort field mapping
-    if sort_by == 'id':
-        sort_field = 'id'
-    elif sort_by == 'price':
-        sort_field = 'price'
-    elif sort_by == 'rating':
-        sort_field = 'rating'
-    elif sort_by == 'created_at':
-        sort_field = 'created_at'
-    elif sort_by == 'title':
-        sort_field = 'title'
-    else:
-        sort_field = 'id'
-    
-    # Apply order
-    if order == 'desc':
-        sort_field = f'-{sort_field}'
-    
-    products = products.order_by(sort_field)
-    
-    # Apply pagination
-    page = request.GET.get('page', '1')
-    page_size = request.GET.get('page_size', '12')
+    # Cursor mode: keyset pagination on (sort_field, id), no OFFSET and no count()
+    if wants_cursor(request.GET):
+        page_size = max(1, min(page_size, MAX_CURSOR_PAGE_SIZE))
+        try:
+            page_products, next_cursor, previous_cursor = paginate_by_cursor(
+                products, sort_field, request.GET.get('order', 'desc') == 'desc', request.GET.get('cursor'), page_size
+            )
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'next': next_cursor,
+            'previous': previous_cursor,
+            'results': serialize_products(page_products, fields)
+        })
     
-    try:
-        page = int(page)
-        page_size = int(page_size)
-    except ValueError:
-        page = 1
-        page_size = 12
+    products = order_listing(products, sort_field, request.GET)
     
     # Calculate pagination
-    total_count = products.count()
-    start = (page - 1) * page_size
-    end = start + page_size
-    
-    # Apply pagination
-    products = products[start:end]
+    total_count, count_is_estimate = count_products(
+        products, filter_signature(request.GET), estimate=request.GET.get('count') == 'estimated'
+    )
+    start, end = page_bounds(page, page_size)
     
     # Prepare response with pagination info
-    response_data = {
+    return Response({
         'count': total_count,
-        'next': f'?page={page + 1}&page_size={page_size}' if end < total_count else None,
-        'previous': f'?page={page - 1}&page_size={page_size}' if page > 1 else None,
-        'results': ProductSerializer(products, many=True).data
-    }
+        'count_is_estimate': count_is_estimate,
+        **page_links(page, page_size, end, total_count),
+        'results': serialize_products(products[start:end], fields)
+    })
+
+@api_view(['GET'])
+def product_facets(request):
+    """Get filter sidebar counts for the same filters product_list accepts"""
+    return Response(get_facets(request.GET))
+
+@api_view(['GET'])
+def product_batch(request):
+    """Get several products by ID in one request, in the order asked for"""
+    try:
+        ids = [int(value) for value in request.GET.get('ids', '').split(',') if value.strip()]
+    except ValueError:
+        return Response({'error': 'ids must be a comma-separated list of product IDs'}, status=status.HTTP_400_BAD_REQUEST)
+    if not ids:
+        return Response({'error': 'ids is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) > MAX_BATCH_PRODUCTS:
+        return Response({'error': f'At most {MAX_BATCH_PRODUCTS} ids per request'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    fields = sparse_fields(request.GET)
+    products = product_values(Product.objects.filter(id__in=ids, is_active=True), fields)
+    found = {product['id']: product for product in serialize_products(products, fields)}
     
-    return Response(response_data)
+    # Missing products keep their slot so the client can line results up with its own list
+    results = [found.get(product_id, {'id': product_id, 'error': 'Product not found'}) for product_id in ids]
+    return Response({
+        'results': results,
+        'not_found': [product_id for product_id in dict.fromkeys(ids) if product_id not in found],
+    })
 
 @api_view(['GET'])
+@cache_response('product_detail', product_namespaces)
 def product_detail(request, pk):
     """Get a specific product by ID"""
-    try:
-        product = Product.objects.get(pk=pk)
-        serializer = ProductSerializer(product)
-        return Response(serializer.data)
-    except Product.DoesNotExist:
+    products = serialize_products(product_values(Product.objects.filter(pk=pk, is_active=True)))
+    if not products:
         return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(products[0])
 
 @api_view(['GET'])
+@cache_response('categories', (DICTIONARY_NAMESPACE,))
 def categories(request):
     """Get all available categories"""
-    categories = Product.objects.values_list('category', flat=True).distinct()
-    return Response(list(categories))
+    return Response(category_list(with_counts=request.GET.get('counts') == 'true'))
 
 @api_view(['GET'])
+@cache_response('brands', (DICTIONARY_NAMESPACE,))
 def brands(request):
     """Get all available brands, optionally filtered by category"""
-    category = request.GET.get('category')
+    return Response(brand_list(request.GET.get('category'), with_counts=request.GET.get('counts') == 'true'))
+
+@api_view(['GET'])
+@admin_required
+def response_cache_stats(request):
+    """Get response cache hit and miss counters"""
+    return Response(cache_stats())
+
+@api_view(['GET'])
+@admin_required
+def response_compression_stats(request):
+    """Get how much API compression saves and what it costs in CPU"""
+    return Response(compression_stats())
+
+@api_view(['GET'])
+def server_status(request):
+    """Readiness probe: 200 once this worker is warmed up and reaches the database, 503 until then or if warm-up failed"""
+    ensure_warmup()
+    state = warmup_state()
+    try:
+        connection.ensure_connection()
+        database = 'ok'
+    except DatabaseError:
+        database = 'unavailable'
     
-    if category:
-        # Filter brands by category
-        brands = Product.objects.filter(category=category).values_list('brand', flat=True).distinct()
-    else:
-        # Get all brands
-        brands = Product.objects.values_list('brand', flat=True).distinct()
+    ready = state['status'] == 'ready' and database == 'ok'
+    body = {'status': state['status'], 'database': database}
+    # Step timings and errors are for operators only
+    if getattr(request, 'user_role', None) == 'admin':
+        body['warmup'] = state
+    return Response(body, status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+@api_view(['POST'])
+@admin_required
+def product_bulk(request):
+    """Create, update and delete many products in one transaction"""
+    payload = request.data
+    if not isinstance(payload, dict):
+        return Response({'error': 'Expected an object with create, update and/or delete lists'}, status=status.HTTP_400_BAD_REQUEST)
+    create = payload.get('create', [])
+    update = payload.get('update', [])
+    delete = payload.get('delete', [])
+    if not all(isinstance(items, list) for items in (create, update, delete)):
+        return Response({'error': 'create, update and delete must be lists'}, status=status.HTTP_400_BAD_REQUEST)
+    if not all(is_product_id(product_id) for product_id in delete):
+        return Response({'error': 'delete must be a list of product IDs'}, status=status.HTTP_400_BAD_REQUEST)
+    if not all(isinstance(item, dict) and is_product_id(item.get('id')) for item in update):
+        return Response({'error': 'Every update needs an integer id'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(create) + len(update) + len(delete) > MAX_BULK_ITEMS:
+        return Response({'error': f'At most {MAX_BULK_ITEMS} items per request'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Filter out None/empty values and sort
-    brands = sorted([brand for brand in brands if brand])
+    return Response(BulkWrite(create, update, delete).run())
+
+@require_http_methods(["GET"])
+@admin_required
+def product_export(request):
+    """Stream the whole catalog as NDJSON or CSV"""
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}, status=400)
     
-    return Response(brands)
+    lines = iter_export(
+        fmt,
+        include_reviews=request.GET.get('reviews') == 'summary',
+        include_inactive=request.GET.get('inactive') == 'true',
+    )
+    response = StreamingHttpResponse(lines, content_type=EXPORT_CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="products.{fmt}"'
+    return response
 
 @api_view(['POST'])
 def add_review(request, product_id):
     """Add a review to a product"""
     try:
-        product = Product.objects.get(pk=product_id)
+        product = Product.objects.get(pk=product_id, is_active=True)
         serializer = ReviewSerializer(data=request.data)
         
         if serializer.is_valid():
+            # Product rating totals are updated incrementally by the Review signal handlers
             serializer.save(product=product)
             
-            # Update product rating
-            product.update_average_rating()
-            
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -188,116 +234,83 @@ def create_payment_intent(request):
         if not amount:
             return JsonResponse({'error': 'Amount is required'}, status=400)
         
-        # Create payment intent
-        intent = stripe.PaymentIntent.create(
-            amount=amount,
-            currency=currency,
-            automatic_payment_methods={
-                'enabled': True,
-            },
+        # A per-checkout key from the client makes retries and double-clicks return the same intent
+        intent = create_stripe_payment_intent(
+            amount,
+            currency,
+            checkout_id=request.headers.get('Idempotency-Key') or data.get('checkoutId'),
+            cart_items=data.get('cartItems') or [],
         )
         
         return JsonResponse({
-            'client_secret': intent.client_secret
+            'client_secret': intent['client_secret']
         })
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+def render_order_confirmation(order_id, order_data):
+    """HTML body of the order confirmation email"""
+    # Calculate total
+    items = order_data.get('cartItems', [])
+    total = 0
+    for item in items:
+        price = float(item.get('price', 0))
+        quantity = int(item.get('quantity', 1))
+        total += price * quantity
+    
+    # Add tax
+    tax = total * 0.13
+    
+    return render_to_string('emails/order_confirmation.html', {
+        'order_id': order_id,
+        'order': order_data,
+        'items': items,
+        'billing': order_data.get('billingInfo', {}),
+        'shipping': order_data.get('shippingInfo', {}),
+        'subtotal': total,
+        'tax': tax,
+        'total': total + tax,
+    })
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def send_order_confirmation(request):
-    """Send order confirmation email"""
+    """Queue the order confirmation email; the outbox workers send it"""
     try:
         data = json.loads(request.body)
         order_id = data.get('orderId')
-        order_data = data.get('orderData')
+        order_data = data.get('orderData') or {}
         user_email = data.get('userEmail')
         
         if not user_email:
             return JsonResponse({'error': 'User email is required'}, status=400)
         
-        # Create email content
-        subject = f'Order Confirmation - Order #{order_id}'
-        
-        # Calculate total
-        total = 0
-        for item in order_data.get('cartItems', []):
-            price = float(item.get('price', 0))
-            quantity = int(item.get('quantity', 1))
-            total += price * quantity
-        
-        # Add tax
-        tax = total * 0.13
-        total_with_tax = total + tax
-        
-        # Email template
-        html_message = f"""
-        <html>
-        <body>
-            <h2>Order Confirmation</h2>
-            <p>Thank you for your order! Your order has been confirmed and is being processed.</p>
-            
-            <h3>Order Details:</h3>
-            <p><strong>Order ID:</strong> {order_id}</p>
-            <p><strong>Order Date:</strong> {order_data.get('orderDate', 'N/A')}</p>
-            
-            <h3>Items Ordered:</h3>
-            <ul>
-        """
-        
-        for item in order_data.get('cartItems', []):
-            html_message += f"""
-                <li>{item.get('name', 'N/A')} - Quantity: {item.get('quantity', 1)} - ${item.get('price', 0)}</li>
-            """
-        
-        html_message += f"""
-            </ul>
-            
-            <h3>Billing Address:</h3>
-            <p>{order_data.get('billingInfo', {}).get('line1', 'N/A')}</p>
-            <p>{order_data.get('billingInfo', {}).get('line2', '')}</p>
-            <p>{order_data.get('billingInfo', {}).get('city', 'N/A')}, {order_data.get('billingInfo', {}).get('state', 'N/A')} {order_data.get('billingInfo', {}).get('zip', 'N/A')}</p>
-            
-            <h3>Shipping Address:</h3>
-            <p>{order_data.get('shippingInfo', {}).get('line1', 'N/A')}</p>
-            <p>{order_data.get('shippingInfo', {}).get('line2', '')}</p>
-            <p>{order_data.get('shippingInfo', {}).get('city', 'N/A')}, {order_data.get('shippingInfo', {}).get('state', 'N/A')} {order_data.get('shippingInfo', {}).get('zip', 'N/A')}</p>
-            
-            <h3>Order Summary:</h3>
-            <p><strong>Subtotal:</strong> ${total:.2f}</p>
-            <p><strong>Tax (13%):</strong> ${tax:.2f}</p>
-            <p><strong>Total:</strong> ${total_with_tax:.2f}</p>
-            
-            <p>We'll send you tracking information once your order ships.</p>
-            
-            <p>Thank you for shopping with us!</p>
-        </body>
-        </html>
-        """
-        
-        # Send email
-        send_mail(
-            subject=subject,
-            message='',  # Plain text version
-            from_email=os.getenv('DEFAULT_FROM_EMAIL', 'noreply@yourstore.com'),
-            recipient_list=[user_email],
-            html_message=html_message,
-            fail_silently=False,
+        enqueue_email(
+            subject=f'Order Confirmation - Order #{order_id}',
+            recipients=[user_email],
+            html_body=render_order_confirmation(order_id, order_data),
         )
         
         return JsonResponse({'success': True})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+@api_view(['GET'])
+@admin_required
+def email_outbox_stats(request):
+    """Get email outbox queue depth and delivery counters"""
+    return Response(outbox_stats())
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def webhook(request):
-    """Handle Stripe webhooks"""
+    """Verify and store a Stripe event; the event workers process it after we acknowledge"""
+    stripe = stripe_api()
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
     
     try:
-        event = stripe.Webhook.construct_event(
+        stripe.Webhook.construct_event(
             payload, sig_header, os.getenv('STRIPE_WEBHOOK_SECRET')
         )
     except ValueError as e:
@@ -305,14 +318,7 @@ def webhook(request):
     except stripe.error.SignatureVerificationError as e:
         return JsonResponse({'error': 'Invalid signature'}, status=400)
     
-    # Handle the event
-    if event['type'] == 'payment_intent.succeeded':
-        payment_intent = event['data']['object']
-        # Handle successful payment
-        print(f"Payment succeeded: {payment_intent['id']}")
-    elif event['type'] == 'payment_intent.payment_failed':
-        payment_intent = event['data']['object']
-        # Handle failed payment
-        print(f"Payment failed: {payment_intent['id']}")
+    # Stripe retries deliver the same event id again; those are acknowledged without reprocessing
+    created = record_event(json.loads(payload))
     
-    return JsonResponse({'success': True})
+    return JsonResponse({'success': True, 'duplicate': not created})
@@ -0,0 +1,176 @@
+# backend/products/warmup.py
+"""
+Boot-time warm-up, run once before a server takes traffic.
+
+Under gunicorn (see gunicorn.conf.py) the app is preloaded in the master and
+warmed there before any worker is forked, so workers inherit the imported
+modules, compiled templates, signing keys and the in-memory React build
+copy-on-write and find the hottest responses already in the cache. Each
+worker then opens its database connection before accepting requests.
+Servers started another way warm up in the background on their first
+readiness probe.
+"""
+import gc
+import logging
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, QueryDict
+from django.template.loader import get_template
+from django.urls import get_resolver
+from django.utils import timezone
+
+from .models import CategoryBrand, Product
+
+logger = logging.getLogger(__name__)
+
+# Product detail pages prefilled, best rated first
+WARMUP_TOP_PRODUCTS = 24
+
+# First listing pages as the storefront asks for them (home page, search page, category pages)
+HOME_PAGE_PARAMS = (
+    {'page': '1', 'page_size': '12'},
+    {'page': '1', 'page_size': '8'},
+    {'page': '1', 'page_size': '12', 'sort': 'id', 'order': 'desc'},
+    {'page': '1', 'page_size': '12', 'sort': 'rating', 'order': 'desc'},
+)
+
+TEMPLATES = ('emails/order_confirmation.html',)
+
+_state = {
+    'status': 'pending',  # pending -> warming -> ready, or failed when a required step raised
+    'started_at': None,
+    'finished_at': None,
+    'seconds': None,
+    'steps': {},
+}
+_lock = threading.Lock()
+
+
+def warmup_state():
+    """Progress of this process's warm-up"""
+    return dict(_state, steps=dict(_state['steps']))
+
+
+def _get(path, params=None):
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.GET = QueryDict(urlencode(params or {}))
+    request.META.update({'SERVER_NAME': 'warmup', 'SERVER_PORT': '80', 'REMOTE_ADDR': '127.0.0.1'})
+    return request
+
+
+def warm_imports():
+    """Import every view and integration and compile templates; returns the number of templates"""
+    from .payments import stripe_api
+    get_resolver().url_patterns
+    stripe_api()
+    for name in TEMPLATES:
+        get_template(name)
+    return len(TEMPLATES)
+
+
+def warm_signing_keys():
+    """Fetch Google's token signing keys, so the first authenticated request skips the round trip"""
+    from backend.firebase_tokens import signing_keys
+    if not settings.FIREBASE_PROJECT_ID:
+        return 0
+    signing_keys.get(None)
+    return len(signing_keys)
+
+
+def warm_responses():
+    """Render the hottest catalog responses into the response cache; returns how many"""
+    # The sync views fill the same cache entries the async views read
+    from .views import brands, categories, product_detail, product_list
+
+    category_names = list(CategoryBrand.objects.values_list('category', flat=True).distinct().order_by('category'))
+    requests = [(categories, _get('/api/categories/'), {}), (brands, _get('/api/brands/'), {})]
+    requests += [(product_list, _get('/api/products/', params), {}) for params in HOME_PAGE_PARAMS]
+    for category in category_names:
+        requests.append((product_list, _get('/api/products/', {'category': category}), {}))
+        requests.append((brands, _get('/api/brands/', {'category': category}), {}))
+
+    top_rated = Product.objects.filter(is_active=True).order_by('-rating', '-id').values_list('id', flat=True)
+    for product_id in top_rated[:WARMUP_TOP_PRODUCTS]:
+        requests.append((product_detail, _get(f'/api/products/{product_id}/'), {'pk': product_id}))
+
+    for view, request, kwargs in requests:
+        view(request, **kwargs)
+    return len(requests)
+
+
+def warm_frontend():
+    """Load the React build's root files and static file index; returns how many files"""
+    from backend.frontend import root_files, static_files
+    return len(root_files()) + len(static_files())
+
+
+def warm_connections():
+    """Open this process's database connections ahead of its first request"""
+    for connection in connections.all():
+        connection.ensure_connection()
+    return len(connections.all())
+
+
+# (name, step, required): a worker whose required step failed never reports ready. The others only
+# save the first requests some work, and the probe checks the database itself
+WARMUP_STEPS = (
+    ('imports', warm_imports, True),
+    ('signing_keys', warm_signing_keys, False),
+    ('frontend', warm_frontend, True),
+    ('responses', warm_responses, False),
+)
+
+
+def run_warmup():
+    """Run every warm-up step once per process; a failing step is logged and skipped"""
+    with _lock:
+        if _state['status'] != 'pending':
+            return
+        _state['status'] = 'warming'
+        _state['started_at'] = timezone.now().isoformat()
+
+    started = time.perf_counter()
+    failed = False
+    for name, step, required in WARMUP_STEPS:
+        step_started = time.perf_counter()
+        try:
+            count = step()
+        except Exception as e:
+            logger.warning('Warm-up step %s failed: %s', name, e)
+            _state['steps'][name] = {'error': str(e), 'required': required}
+            failed = failed or required
+        else:
+            _state['steps'][name] = {'count': count, 'seconds': round(time.perf_counter() - step_started, 3)}
+
+    _state['seconds'] = round(time.perf_counter() - started, 3)
+    _state['finished_at'] = timezone.now().isoformat()
+    _state['status'] = 'failed' if failed else 'ready'
+    logger.info('Warm-up %s in %.2fs', _state['status'], _state['seconds'])
+
+
+def prepare_fork():
+    """Leave the warmed master safe and cheap to fork"""
+    # Sockets must not be shared with the workers
+    connections.close_all()
+    # Keep the collector from touching (and so copying) the objects workers inherit
+    gc.collect()
+    gc.freeze()
+
+
+def ensure_warmup():
+    """Start warming in the background if this process was not warmed at boot"""
+    if _state['status'] == 'pending':
+        threading.Thread(target=_run_in_thread, name='warmup', daemon=True).start()
+
+
+def _run_in_thread():
+    try:
+        run_warmup()
+    finally:
+        connections.close_all()
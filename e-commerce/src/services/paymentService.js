@@ -11,9 +11,18 @@ const stripePromise = process.env.REACT_APP_STRIPE_PUBLISHABLE_KEY
 class PaymentService {
   constructor() {
     this.stripe = null;
+    this.checkoutId = null;
     this.initializeStripe();
   }
 
+  // One key per checkout, so a retried or repeated request gets the same payment intent
+  getCheckoutId() {
+    if (!this.checkoutId) {
+      this.checkoutId = crypto.randomUUID();
+    }
+    return this.checkoutId;
+  }
+
   async initializeStripe() {
     try {
       if (!stripePromise) {
@@ -29,16 +38,18 @@ class PaymentService {
   }
 
   // Create payment intent on the backend
-  async createPaymentIntent(amount, currency = 'usd') {
+  async createPaymentIntent(amount, currency = 'usd', cartItems = []) {
     try {
       const response = await fetch('/api/create-payment-intent/', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'Idempotency-Key': this.getCheckoutId(),
         },
         body: JSON.stringify({
           amount: Math.round(amount * 100), // Convert to cents
           currency,
+          cartItems: cartItems.map(({ id, quantity }) => ({ id, quantity })),
         }),
       });
 
@@ -62,7 +73,7 @@ class PaymentService {
       }
 
       // Create payment intent
-      const clientSecret = await this.createPaymentIntent(amount);
+      const clientSecret = await this.createPaymentIntent(amount, 'usd', orderData?.cartItems || []);
 
       // Confirm payment
       const { error, paymentIntent } = await this.stripe.confirmCardPayment(clientSecret, {
@@ -74,6 +85,8 @@ class PaymentService {
       }
 
       if (paymentIntent.status === 'succeeded') {
+        // The next checkout needs a fresh payment intent
+        this.checkoutId = null;
         // Create order in Firestore
         await this.createOrder(orderData, paymentIntent.id);
         return { success: true, paymentIntent };
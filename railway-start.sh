@@ -15,4 +15,10 @@ echo "📡 Server will run on port: $PORT"
 pip install gunicorn
 
 # Start Django server with gunicorn for production
-gunicorn backend.wsgi:application --bind 0.0.0.0:$PORT --workers 2 --timeout 120 
\ No newline at end of file
+# SERVER_MODE=asgi runs uvicorn workers and the async catalog and payment views
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    echo "⚡ Serving ASGI with uvicorn workers"
+    gunicorn backend.asgi:application -k uvicorn_worker.UvicornWorker --bind 0.0.0.0:$PORT --workers 2 --timeout 120
+else
+    gunicorn backend.wsgi:application --bind 0.0.0.0:$PORT --workers 2 --timeout 120
+fi 
\ No newline at end of file